@@ -1,14 +1,56 @@
 # astar_modified.py
 
+import bisect
+import heapq
 import math
+import time
 import numpy as np
-from find_intersect_line import *
+from collision import SegmentCollisionChecker
+from instrumentation import current_stats, emit, stage
+from path_smoothing import VisibilityCache, prune_path
+
+class PlanningTimeout(Exception):
+    """Raised when a search runs past its deadline."""
+
+def check_deadline(deadline):
+    """Raises PlanningTimeout once `deadline` (a time.monotonic() value, or None) has passed."""
+    if deadline is not None and time.monotonic() > deadline:
+        raise PlanningTimeout("Path planning exceeded its time budget")
 
 class AStarPlanner:
-    def __init__(self, start, goal, obstacles, boundary):
+    """
+    Grid A* between two points of a rectangular boundary.
+
+    `resolution` is the grid step in meters (2% of the boundary's shorter side
+    by default). With levels > 1, planning() searches coarse to fine: each
+    level doubles the resolution of the previous one and only expands nodes
+    inside a corridor around the path found at the coarser level.
+
+    The levels of a coarse-to-fine search read their occupancy off the
+    finest grid (see sample_occupancy_grid) instead of rasterizing the map
+    again, and only the finest path is pruned.
+
+    `deadline` is an optional time.monotonic() value; the search raises
+    PlanningTimeout once it is passed.
+
+    With epsilon > 0 the search is weighted A*: the heuristic is inflated by
+    (1 + epsilon), which expands fewer nodes and returns a path at most
+    (1 + epsilon) times longer than the shortest one on the grid.
+    """
+    def __init__(self, start, goal, obstacles, boundary, visibility_cache=None,
+                 resolution=None, levels=1, corridor_path=None, deadline=None, epsilon=0.0, fine_planner=None):
         self.start = start
         self.goal = goal
         self.obstacles = obstacles
+        self.boundary = boundary
+        self.levels = max(1, int(levels))
+        # Nodes expanded by the last planning() call (all levels included)
+        self.expansions = 0
+        # Proven ratio of the last path's cost to the shortest grid path, None
+        # without a path or a guarantee (coarse-to-fine planning)
+        self.cost_bound = None
+        self.deadline = deadline
+        self.epsilon = max(0.0, float(epsilon))
         
         x_min, y_min = boundary['bottom_left']
         x_max, y_max = boundary['top_right']
@@ -17,7 +59,7 @@ class AStarPlanner:
         height = y_max - y_min
         min_side = min(width, height) if min(width, height) > 0 else 100
         
-        self.resolution = min_side * 0.02
+        self.resolution = resolution if resolution else min_side * 0.02
         self.min_x = x_min
         self.min_y = y_min
         self.max_x = x_max
@@ -26,199 +68,404 @@ class AStarPlanner:
         self.y_width = round((self.max_y - self.min_y) / self.resolution)
         
         self.motion = self.get_motion_model()
-
-    class Node:
-        def __init__(self, x, y, cost, parent_index):
-            self.x = x
-            self.y = y
-            self.cost = cost
-            self.parent_index = parent_index
+        if fine_planner is None:
+            with stage('rasterize'):
+                self.occupancy_grid = self.calc_occupancy_grid()
+            self.collision_checker = SegmentCollisionChecker(obstacles, self.resolution * 0.5)
+        else:
+            self.occupancy_grid = self.sample_occupancy_grid(fine_planner)
+            self.collision_checker = fine_planner.collision_checker
+        # Planners on the same map and boundary may share one cache
+        self.visibility_cache = visibility_cache or VisibilityCache(self.collision_checker)
+        # Search restricted to a corridor around a coarser path, if given
+        self.search_grid = self.occupancy_grid
+        if corridor_path is not None:
+            self.search_grid = self.occupancy_grid & self.calc_corridor(corridor_path)
 
     def planning(self):
-        start_node = self.Node(self.start[0], self.start[1], 0.0, -1)
-        goal_node = self.Node(self.goal[0], self.goal[1], 0.0, -1)
+        if self.levels > 1:
+            return self.hierarchical_planning()
+
+        path = self.grid_path()
+        p_path = self.prune_path(path)
+        
+        return [path, p_path]
 
-        open_set, closed_set = dict(), dict()
-        open_set[self.calc_grid_index(start_node)] = start_node
+    def grid_path(self):
+        """Searches the grid and returns the (unpruned) path, only the goal without one."""
+        stats = current_stats()
+        search_started = time.perf_counter()
+        # Search state lives in flat arrays over the search grid, padded with a
+        # blocked border so that neighbours are plain offsets on the flat index
+        rows, cols = self.search_grid.shape
+        stride = cols + 2
+        free = np.zeros((rows + 2, stride), dtype=bool)
+        free[1:-1, 1:-1] = self.search_grid
+        free = free.ravel()
 
-        while True:
-            if len(open_set) == 0:
-                print("Open set is empty..")
-                break
+        xs = self.start[0] + np.arange(self.grid_x0 - 1, self.grid_x0 + cols + 1) * self.resolution
+        ys = self.start[1] + np.arange(self.grid_y0 - 1, self.grid_y0 + rows + 1) * self.resolution
+        xs, ys = xs.tolist(), ys.tolist()
+        start_index = (1 - self.grid_y0) * stride + (1 - self.grid_x0)
 
-            c_id = min(
-                open_set,
-                key=lambda o: open_set[o].cost + self.calc_heuristic(goal_node, open_set[o]),
-            )
-            current = open_set[c_id]
+        goal_index, parent, expanded, pushed = self.search(free, stride, start_index, xs, ys)
+        emit("Goal is reached!" if goal_index != -1 else "Open set is empty..")
+        if goal_index == -1:
+            self.cost_bound = None
+
+        self.expansions = expanded
+        path = self.calc_final_path(goal_index, parent, xs, ys, stride)
+        if stats is not None:
+            # Counted locally and reported once, the loop stays free of hooks
+            stats.add_time('search', time.perf_counter() - search_started)
+            stats.add('nodes_expanded', expanded)
+            stats.add('nodes_pushed', pushed)
+        return path
+
+    def search(self, free, stride, start_index, xs, ys):
+        """
+        A* over the padded, flattened free grid `free` (row length `stride`,
+        lattice coordinates xs and ys per column and row) from start_index
+        until a point within one resolution of the goal is taken from the
+        open set. Returns (goal_index, parent, expanded, pushed), with
+        goal_index -1 when the goal cannot be reached, and sets cost_bound.
+
+        Weighted searches do not reopen closed nodes. A cheaper way found to
+        a closed node still updates it, and is remembered (as in ARA*) so
+        that the bound reported can be tighter than 1 + epsilon: the path
+        cost over the least g + h among the open and updated closed nodes.
+        """
+        size = free.size
+        g_cost = np.full(size, np.inf)
+        parent = np.full(size, -1, dtype=np.int64)
+        # 0: unvisited, 1: open, 2: closed
+        state = np.zeros(size, dtype=np.int8)
+        # Position at which each index first entered the open set; ties on f
+        # are broken by it, as the open set always has been
+        open_order = np.zeros(size, dtype=np.int64)
+        goal_x, goal_y = self.goal
+        weight = 1.0 + self.epsilon
+        # Closed nodes reached again at a lower cost (weighted searches only)
+        improved_closed = set()
+
+        offsets = [(dx + dy * stride, cost * self.resolution) for dx, dy, cost in self.motion]
+
+        g_cost[start_index] = 0.0
+        state[start_index] = 1
+        open_count, entered = 1, 1
+        open_heap = [(weight * math.hypot(xs[start_index % stride] - goal_x, ys[start_index // stride] - goal_y), 0, start_index)]
+        goal_index = -1
+        expanded, pushed = 0, 1
+
+        while open_count:
+            if self.deadline is not None and expanded % 1024 == 0 and time.monotonic() > self.deadline:
+                raise PlanningTimeout("Path planning exceeded its time budget")
+
+            f, _, c_id = heapq.heappop(open_heap)
+            if state[c_id] != 1:
+                continue  # stale entry
+            c_cost = g_cost[c_id]
+            dist_to_goal = math.hypot(xs[c_id % stride] - goal_x, ys[c_id // stride] - goal_y)
+            if f != c_cost + weight * dist_to_goal:
+                continue  # stale entry, the node has been improved since
 
-            dist_to_goal = self.calc_heuristic(goal_node, current)
             if dist_to_goal <= self.resolution:
-                print("Goal is reached!")
-                goal_node.parent_index = c_id
-                goal_node.cost = current.cost
-                # ================= FIX IS HERE =================
-                # The final node must be added to the closed set for backtracking
-                closed_set[c_id] = current
-                # ===============================================
+                goal_index = c_id
                 break
 
-            del open_set[c_id]
-            closed_set[c_id] = current
-
-            for i, _ in enumerate(self.motion):
-                node = self.Node(
-                    current.x + self.motion[i][0] * self.resolution,
-                    current.y + self.motion[i][1] * self.resolution,
-                    current.cost + self.motion[i][2] * self.resolution,
-                    c_id,
-                )
-                n_id = self.calc_grid_index(node)
+            state[c_id] = 2
+            open_count -= 1
+            expanded += 1
 
-                if not self.verify_node(node):
+            for offset, step_cost in offsets:
+                n_id = c_id + offset
+                if not free[n_id]:
                     continue
-                if n_id in closed_set:
+                n_cost = c_cost + step_cost
+                if state[n_id] == 2:
+                    if weight > 1.0 and n_cost < g_cost[n_id]:
+                        g_cost[n_id] = n_cost
+                        parent[n_id] = c_id
+                        improved_closed.add(n_id)
                     continue
-                if n_id not in open_set:
-                    open_set[n_id] = node
-                else:
-                    if open_set[n_id].cost > node.cost:
-                        open_set[n_id] = node
+                if state[n_id] == 0:
+                    state[n_id] = 1
+                    open_count += 1
+                    open_order[n_id] = entered
+                    entered += 1
+                elif g_cost[n_id] <= n_cost:
+                    continue
+                g_cost[n_id] = n_cost
+                parent[n_id] = c_id
+                n_x, n_y = xs[n_id % stride], ys[n_id // stride]
+                heapq.heappush(open_heap, (n_cost + weight * math.hypot(n_x - goal_x, n_y - goal_y), open_order[n_id], n_id))
+                pushed += 1
 
-        path = self.calc_final_path(goal_node, closed_set)
-        p_path = self.prune_path(path)
-        
-        return [path, p_path]
+        self.cost_bound = 1.0
+        if goal_index != -1 and self.epsilon > 0:
+            # Every path to the goal leaves the open or updated closed nodes
+            candidates = np.union1d(np.flatnonzero(state == 1), list(improved_closed)).astype(np.int64)
+            xs_array, ys_array = np.asarray(xs), np.asarray(ys)
+            lower_bound = np.min(g_cost[candidates] + np.hypot(xs_array[candidates % stride] - goal_x,
+                                                               ys_array[candidates // stride] - goal_y))
+            cost = g_cost[goal_index] + math.hypot(xs[goal_index % stride] - goal_x, ys[goal_index // stride] - goal_y)
+            self.cost_bound = min(weight, float(cost / lower_bound)) if lower_bound > 0 else 1.0
+        return goal_index, parent, expanded, pushed
 
-    def calc_final_path(self, goal_node, closed_set):
-        path = [[goal_node.x, goal_node.y]]
-        parent_index = goal_node.parent_index
-        while parent_index != -1:
-            n = closed_set[parent_index]
-            path.append([n.x, n.y])
-            parent_index = n.parent_index
+    def goal_targets(self, free, stride, start_index, xs, ys):
+        """
+        Flat indices within one resolution of the goal that the search can
+        stand on (free points and the start), the points A* stops on.
+        """
+        goal_x, goal_y = self.goal
+        columns = range(bisect.bisect_left(xs, goal_x - self.resolution), bisect.bisect_right(xs, goal_x + self.resolution))
+        rows = range(bisect.bisect_left(ys, goal_y - self.resolution), bisect.bisect_right(ys, goal_y + self.resolution))
+        return [
+            row * stride + column
+            for row in rows for column in columns
+            if (free[row * stride + column] or row * stride + column == start_index)
+            and math.hypot(xs[column] - goal_x, ys[row] - goal_y) <= self.resolution
+        ]
+
+    def hierarchical_planning(self):
+        """
+        Coarse-to-fine planning: the coarsest level searches the whole grid,
+        then each finer level searches the corridor around the previous path.
+        A level that finds no path inside its corridor (or after a failed
+        coarser level) searches its whole grid instead. Every level shares
+        this planner's occupancy grid and collision checker.
+        """
+        path = None
+        self.expansions = 0
+        for level in reversed(range(self.levels)):
+            planner = type(self)(
+                self.start, self.goal, self.obstacles, self.boundary,
+                visibility_cache=self.visibility_cache if level == 0 else None,
+                resolution=self.resolution * 2**level,
+                corridor_path=path,
+                deadline=self.deadline,
+                epsilon=self.epsilon,
+                fine_planner=self,
+            )
+            level_path = planner.grid_path()
+            if len(level_path) < 2 and path is not None:
+                planner.search_grid = planner.occupancy_grid
+                self.expansions += planner.expansions
+                level_path = planner.grid_path()
+            self.expansions += planner.expansions
+            path = level_path if len(level_path) > 1 else None
+        # The finest level only searched near the coarser paths
+        self.cost_bound = None
+        return [level_path, self.prune_path(level_path)]
+
+    def calc_corridor(self, path, width=2):
+        """
+        Marks the lattice points within `width` coarse steps (twice this
+        planner's resolution per step) of a coarse path.
+        """
+        points = np.asarray(path, dtype=float)
+        # Sample the polyline at half the lattice spacing
+        samples = [points[:1]]
+        for p, q in zip(points[:-1], points[1:]):
+            steps = max(1, math.ceil(2 * math.dist(p, q) / self.resolution))
+            samples.append(p + (q - p) * (np.arange(1, steps + 1) / steps)[:, None])
+        samples = np.concatenate(samples)
+
+        x_idx = np.round((samples[:, 0] - self.start[0]) / self.resolution).astype(int) - self.grid_x0
+        y_idx = np.round((samples[:, 1] - self.start[1]) / self.resolution).astype(int) - self.grid_y0
+        corridor = np.zeros(self.occupancy_grid.shape, dtype=bool)
+        inside = (0 <= x_idx) & (x_idx < corridor.shape[1]) & (0 <= y_idx) & (y_idx < corridor.shape[0])
+        corridor[y_idx[inside], x_idx[inside]] = True
+
+        # Square dilation by the corridor half-width
+        radius = 2 * width
+        for axis in (0, 1):
+            dilated = corridor.copy()
+            for shift in range(1, radius + 1):
+                if axis == 0:
+                    dilated[shift:, :] |= corridor[:-shift, :]
+                    dilated[:-shift, :] |= corridor[shift:, :]
+                else:
+                    dilated[:, shift:] |= corridor[:, :-shift]
+                    dilated[:, :-shift] |= corridor[:, shift:]
+            corridor = dilated
+        return corridor
+
+    def calc_final_path(self, goal_index, parent, xs, ys, stride):
+        """
+        Follows the parent links from the goal back to the start, in world
+        coordinates. A parent further than one step away (a jump point) is
+        joined by the lattice points of the straight or diagonal run between.
+        """
+        path = [[self.goal[0], self.goal[1]]]
+        index = goal_index
+        while index != -1:
+            path.append([xs[index % stride], ys[index // stride]])
+            previous = int(parent[index])
+            if previous != -1:
+                dx = (previous % stride > index % stride) - (previous % stride < index % stride)
+                dy = (previous // stride > index // stride) - (previous // stride < index // stride)
+                between = index + dx + dy * stride
+                while between != previous:
+                    path.append([xs[between % stride], ys[between // stride]])
+                    between += dx + dy * stride
+            index = previous
         return path[::-1]
 
     def prune_path(self, path):
-        if not path or len(path) < 3:
-            return path
-        
-        pruned_path = [path[0]]
-        current_index = 0
-
-        while current_index < len(path) - 1:
-            best_next_index = current_index + 1  # Default to the next point
-            
-            # Try to find the farthest point we can reach without collision
-            for next_index in range(len(path) - 1, current_index, -1):
-                p1 = self.Node(path[current_index][0], path[current_index][1], 0, -1)
-                p2 = self.Node(path[next_index][0], path[next_index][1], 0, -1)
-                
-                # Add intermediate checks to ensure the entire path is safe
-                if self.is_collision_free(p1, p2):
-                    # Additional check: verify that intermediate points don't get too close to obstacles
-                    is_safe = True
-                    for i in range(current_index + 1, next_index):
-                        intermediate_node = self.Node(path[i][0], path[i][1], 0, -1)
-                        if not self.verify_node(intermediate_node):
-                            is_safe = False
-                            break
-                    
-                    if is_safe:
-                        best_next_index = next_index
-                        break
-            
-            pruned_path.append(path[best_next_index])
-            current_index = best_next_index
-                    
-        return pruned_path
+        with stage('prune'):
+            return prune_path(
+                path,
+                self.visibility_cache,
+                self.verify_node,
+            )
     
-    def is_point_inside_rectangle(self, point, rect_points):
-        """Check if a point is inside a rectangle using the ray-casting algorithm."""
-        x, y = point.x, point.y
-        n = len(rect_points)
-        inside = False
-        p1x, p1y = rect_points[0]
-        for i in range(n + 1):
-            p2x, p2y = rect_points[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        return inside
-
-    def is_collision_free(self, start_node, end_node):
-        is_point_check = (start_node.x == end_node.x and start_node.y == end_node.y)
-        p1 = Point(start_node.x, start_node.y)
-        q1 = Point(end_node.x, end_node.y)
-
-        # Add a safety margin to avoid getting too close to obstacles
+    def calc_occupancy_grid(self):
+        """
+        Rasterizes the boundary and the obstacles, inflated by the safety margin,
+        onto the lattice of points the search reaches from the start node
+        (start + k * resolution). Returns a boolean grid indexed [y, x] where
+        True marks a free point, so verify_node becomes a single lookup.
+        """
+        x_count, y_count = self.calc_lattice_extent()
+        xs, ys = self.lattice_coordinates(x_count, y_count)
+        return self.rasterize(xs, ys, self.obstacles)
+
+    def lattice_coordinates(self, x_count, y_count):
+        """World coordinates of the grid's columns and rows."""
+        xs = self.start[0] + np.arange(self.grid_x0, self.grid_x0 + x_count) * self.resolution
+        ys = self.start[1] + np.arange(self.grid_y0, self.grid_y0 + y_count) * self.resolution
+        return xs, ys
+
+    def rasterize(self, xs, ys, obstacles):
+        """
+        Occupancy of the lattice points xs x ys (increasing coordinates): True
+        where a point is inside the boundary and clear of every obstacle,
+        inflated by the safety margin.
+        """
         safety_margin = self.resolution * 0.5
-        
-        for obs in self.obstacles:
+
+        grid = np.zeros((len(ys), len(xs)), dtype=bool)
+        x0, x1 = np.searchsorted(xs, self.min_x, 'left'), np.searchsorted(xs, self.max_x, 'right')
+        y0, y1 = np.searchsorted(ys, self.min_y, 'left'), np.searchsorted(ys, self.max_y, 'right')
+        grid[y0:y1, x0:x1] = True
+
+        for obs in obstacles:
+            min_x, max_x, min_y, max_y = self.obstacle_bounds(obs)
+            x0, x1 = np.searchsorted(xs, min_x, 'left'), np.searchsorted(xs, max_x, 'right')
+            y0, y1 = np.searchsorted(ys, min_y, 'left'), np.searchsorted(ys, max_y, 'right')
             if obs['type'] == 'rectangle':
-                if is_point_check:
-                    if self.is_point_inside_rectangle(p1, obs['points']):
-                        return False  # Point is inside a rectangle
-                else:
-                    rect_points = obs['points']
-                    # Check if the line segment intersects with any edge of the rectangle
-                    for i in range(4):
-                        p2 = Point(rect_points[i][0], rect_points[i][1])
-                        q2 = Point(rect_points[(i + 1) % 4][0], rect_points[(i + 1) % 4][1])
-                        if doIntersect(p1, q1, p2, q2):
-                            return False
-                    
-                    # Additional check: if the line is completely inside the obstacle
-                    if self.is_point_inside_rectangle(p1, obs['points']) and self.is_point_inside_rectangle(q1, obs['points']):
-                        return False
+                grid[y0:y1, x0:x1] = False
 
             elif obs['type'] == 'circle':
                 center_x, center_y = obs['center']
-                radius = obs['radius'] + safety_margin  # Add safety margin
-                
-                # Check if start point is inside the circle
-                if ((p1.x - center_x)**2 + (p1.y - center_y)**2) <= radius**2:
-                    return False
-                    
-                # Check if end point is inside the circle
-                if ((q1.x - center_x)**2 + (q1.y - center_y)**2) <= radius**2:
-                    return False
+                radius = obs['radius'] + safety_margin
+                dx2 = (xs[x0:x1] - center_x) ** 2
+                dy2 = (ys[y0:y1] - center_y) ** 2
+                grid[y0:y1, x0:x1] &= (dy2[:, None] + dx2[None, :]) > radius**2
 
-                if not is_point_check:
-                    # Check if the line segment intersects the circle
-                    dx = q1.x - p1.x
-                    dy = q1.y - p1.y
-                    fx = p1.x - center_x
-                    fy = p1.y - center_y
-                    a = dx*dx + dy*dy
-                    b = 2 * (fx*dx + fy*dy)
-                    c = fx*fx + fy*fy - radius*radius
-                    
-                    discriminant = b*b - 4*a*c
-                    if discriminant >= 0:
-                        discriminant = math.sqrt(discriminant)
-                        t1 = (-b - discriminant) / (2*a) if a != 0 else -1
-                        t2 = (-b + discriminant) / (2*a) if a != 0 else -1
-                        
-                        # Check if the intersection points are within the segment
-                        if (0 <= t1 <= 1) or (0 <= t2 <= 1):
-                            return False
-        return True
+        return grid
 
-    def verify_node(self, node):
-        # Check if node is within boundaries
-        if not (self.min_x <= node.x <= self.max_x and self.min_y <= node.y <= self.max_y):
+    def obstacle_bounds(self, obs):
+        """Bounding box (min_x, max_x, min_y, max_y) of an obstacle inflated by the safety margin."""
+        safety_margin = self.resolution * 0.5
+        if obs['type'] == 'rectangle':
+            rect_points = obs['points']
+            return (min(p[0] for p in rect_points) - safety_margin, max(p[0] for p in rect_points) + safety_margin,
+                    min(p[1] for p in rect_points) - safety_margin, max(p[1] for p in rect_points) + safety_margin)
+        if obs['type'] == 'circle':
+            center_x, center_y = obs['center']
+            radius = obs['radius'] + safety_margin
+            return center_x - radius, center_x + radius, center_y - radius, center_y + radius
+        return math.inf, -math.inf, math.inf, -math.inf
+
+    def replace_obstacles(self, obstacles, changed):
+        """
+        Replaces the obstacles after an edit, where `changed` are the added and
+        removed ones. Only the grid windows under the changed obstacles are
+        rasterized again. Returns those windows as (y0, y1, x0, x1) slices
+        of occupancy_grid.
+        """
+        rows, cols = self.occupancy_grid.shape
+        xs, ys = self.lattice_coordinates(cols, rows)
+        windows = []
+        for obs in changed:
+            min_x, max_x, min_y, max_y = self.obstacle_bounds(obs)
+            x0, x1 = int(np.searchsorted(xs, min_x, 'left')), int(np.searchsorted(xs, max_x, 'right'))
+            y0, y1 = int(np.searchsorted(ys, min_y, 'left')), int(np.searchsorted(ys, max_y, 'right'))
+            if x0 < x1 and y0 < y1:
+                windows.append((y0, y1, x0, x1))
+
+        self.obstacles = obstacles
+        self.collision_checker = SegmentCollisionChecker(obstacles, self.resolution * 0.5)
+        self.visibility_cache = VisibilityCache(self.collision_checker)
+        margin = self.resolution * 0.5
+        for y0, y1, x0, x1 in windows:
+            # Only the obstacles whose inflated box reaches the window
+            nearby = self.collision_checker.obstacles_in_box(xs[x0] - margin, ys[y0] - margin,
+                                                             xs[x1 - 1] + margin, ys[y1 - 1] + margin)
+            self.occupancy_grid[y0:y1, x0:x1] = self.rasterize(xs[x0:x1], ys[y0:y1], nearby)
+        return windows
+
+    def calc_lattice_extent(self):
+        """
+        Sets grid_x0 and grid_y0, the lattice indices (relative to the start
+        point) of the grid's first column and row, so that the grid spans
+        the boundary and the start point itself. Returns (x_count, y_count).
+        """
+        self.grid_x0 = min(math.floor((self.min_x - self.start[0]) / self.resolution), 0)
+        self.grid_y0 = min(math.floor((self.min_y - self.start[1]) / self.resolution), 0)
+        x_count = max(math.ceil((self.max_x - self.start[0]) / self.resolution), 0) - self.grid_x0 + 1
+        y_count = max(math.ceil((self.max_y - self.start[1]) / self.resolution), 0) - self.grid_y0 + 1
+        return x_count, y_count
+
+    def sample_occupancy_grid(self, fine_planner):
+        """
+        Reads this planner's occupancy grid off that of a planner with the
+        same start whose resolution divides this one's: every lattice point
+        here is one of the finer lattice, so nothing is rasterized. Obstacles
+        keep the finer planner's safety margin.
+        """
+        step = round(self.resolution / fine_planner.resolution)
+        x_count, y_count = self.calc_lattice_extent()
+        fine_grid = fine_planner.occupancy_grid
+        fine_x = np.arange(self.grid_x0, self.grid_x0 + x_count) * step - fine_planner.grid_x0
+        fine_y = np.arange(self.grid_y0, self.grid_y0 + y_count) * step - fine_planner.grid_y0
+        # Points past the finer grid are outside the boundary
+        x_inside = (0 <= fine_x) & (fine_x < fine_grid.shape[1])
+        y_inside = (0 <= fine_y) & (fine_y < fine_grid.shape[0])
+
+        grid = np.zeros((y_count, x_count), dtype=bool)
+        grid[np.ix_(y_inside, x_inside)] = fine_grid[np.ix_(fine_y[y_inside], fine_x[x_inside])]
+        return grid
+
+    def verify_node(self, x, y, grid=None):
+        if grid is None:
+            grid = self.occupancy_grid
+        x_idx = round((x - self.start[0]) / self.resolution)
+        y_idx = round((y - self.start[1]) / self.resolution)
+
+        # Points off the search lattice (e.g. the goal) use the exact test
+        tolerance = self.resolution * 1e-6
+        if (abs(self.start[0] + x_idx * self.resolution - x) > tolerance or
+                abs(self.start[1] + y_idx * self.resolution - y) > tolerance):
+            return self.verify_point(x, y)
+
+        x_idx -= self.grid_x0
+        y_idx -= self.grid_y0
+        if not (0 <= x_idx < grid.shape[1] and 0 <= y_idx < grid.shape[0]):
+            return False
+        return bool(grid[y_idx, x_idx])
+
+    def verify_point(self, x, y):
+        # Check if the point is within boundaries
+        if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
             return False
 
-        # Check if node is too close to any obstacle
+        # Check if the point is too close to any of the obstacles around it
         safety_margin = self.resolution * 0.5
         
-        for obs in self.obstacles:
+        for obs in self.collision_checker.obstacles_near(x, y, safety_margin):
             if obs['type'] == 'rectangle':
                 # Create a slightly expanded rectangle for safety check
                 rect_points = obs['points']
@@ -227,31 +474,30 @@ class AStarPlanner:
                 min_y = min(p[1] for p in rect_points) - safety_margin
                 max_y = max(p[1] for p in rect_points) + safety_margin
                 
-                if min_x <= node.x <= max_x and min_y <= node.y <= max_y:
+                if min_x <= x <= max_x and min_y <= y <= max_y:
                     return False
                     
             elif obs['type'] == 'circle':
                 center_x, center_y = obs['center']
                 radius = obs['radius'] + safety_margin
                 
-                if ((node.x - center_x)**2 + (node.y - center_y)**2) <= radius**2:
+                if ((x - center_x)**2 + (y - center_y)**2) <= radius**2:
                     return False
         
         return True
 
-    def calc_grid_index(self, node):
-        x_idx = round((node.x - self.min_x) / self.resolution)
-        y_idx = round((node.y - self.min_y) / self.resolution)
-        return y_idx * self.x_width + x_idx
-
-    @staticmethod
-    def calc_heuristic(n1, n2):
-        return math.hypot(n1.x - n2.x, n1.y - n2.y)
-    
     @staticmethod
     def get_motion_model():
         return [
             [1, 0, 1], [0, 1, 1], [-1, 0, 1], [0, -1, 1],
             [-1, -1, math.sqrt(2)], [-1, 1, math.sqrt(2)],
             [1, -1, math.sqrt(2)], [1, 1, math.sqrt(2)],
-        ]
\ No newline at end of file
+        ]
+
+
+def smooth_path(path, obstacles, boundary, visibility_cache=None):
+    """Prunes any path on the given map, using the planner's collision rules."""
+    if not path:
+        return path
+    planner = AStarPlanner(path[0], path[-1], obstacles, boundary, visibility_cache)
+    return planner.prune_path(path)
@@ -0,0 +1,143 @@
+# batch_planner.py
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from astar_modified import PlanningTimeout
+from dp_planner import DynamicProgrammingPlanner
+from instrumentation import collect
+from search_modes import SEARCH_PLANNERS
+from visibility_graph import VisibilityGraphPlanner
+from worker_pool import _warm_worker
+
+# Process pool of the batches planned without a PlanningPool, started on
+# first use and shared by every request of the process
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def plan_pair(start, goal, obstacles, boundary, options, planner='astar', deadline=None):
+    """
+    Plans one start/goal pair and reports its own status ('ok', 'no_path',
+    'timeout' or 'error') instead of raising, so a failing pair does not
+    abort the rest of a batch. `deadline` optionally bounds the search time
+    (a time.monotonic() value). Planned pairs report the nodes expanded
+    ('expansions') and the proven cost bound of the search ('cost_bound',
+    see AStarPlanner).
+
+    The stages and counters recorded while planning are returned in 'stats'
+    (see PlanningStats.as_dict), also when the pair ran in another process.
+    """
+    with collect() as stats:
+        result = _plan_pair(start, goal, obstacles, boundary, options, planner, deadline)
+    result['stats'] = stats.as_dict()
+    return result
+
+
+def _plan_pair(start, goal, obstacles, boundary, options, planner, deadline):
+    try:
+        if planner == 'dp':
+            pair_planner = DynamicProgrammingPlanner(
+                start, goal, obstacles, boundary,
+                roadmap=options.get('roadmap', False),
+                all_pairs=options.get('all_pairs', False),
+                resolution=options.get('resolution'),
+                levels=options.get('levels', 1),
+                deadline=deadline,
+                search=options.get('search', 'astar'),
+                epsilon=options.get('epsilon', 0.0),
+                raster_scale=options.get('raster_scale'),
+            )
+        elif planner == 'visibility':
+            pair_planner = VisibilityGraphPlanner(
+                start, goal, obstacles, boundary,
+                resolution=options.get('resolution'),
+                deadline=deadline,
+            )
+        else:
+            pair_planner = SEARCH_PLANNERS[options.get('search', 'astar')](
+                start, goal, obstacles, boundary,
+                resolution=options.get('resolution'),
+                levels=options.get('levels', 1),
+                deadline=deadline,
+                epsilon=options.get('epsilon', 0.0),
+            )
+        path, pruned_path = pair_planner.planning()
+    except PlanningTimeout as e:
+        return {'status': 'timeout', 'error': str(e)}
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
+
+    if len(path) < 2:
+        return {'status': 'no_path', 'error': 'No path found'}
+    return {'status': 'ok', 'path': path, 'pruned_path': pruned_path,
+            'expansions': pair_planner.expansions, 'cost_bound': pair_planner.cost_bound}
+
+
+def _plan_pairs(pairs, obstacles, boundary, options, planner, deadline):
+    """Plans a chunk of the pairs of a batch in one worker, which receives the map once."""
+    return [plan_pair(start, goal, obstacles, boundary, options, planner, deadline) for start, goal in pairs]
+
+
+def _executor():
+    """
+    The shared batch process pool. Its workers are started from a fork
+    server, as forking the threaded server itself is unsafe, and warmed up
+    like those of the PlanningPool.
+    """
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            _batch_executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context('forkserver' if 'forkserver' in methods else None),
+                initializer=_warm_worker,
+            )
+        return _batch_executor
+
+
+def plan_batch(pairs, obstacles, boundary, options, planner='astar', max_workers=None,
+               pool=None, time_budget=None):
+    """
+    Plans many (start, goal) pairs on one map and returns one result per pair,
+    in order (see plan_pair).
+
+    The pairs are split into up to `max_workers` chunks planned in the
+    process-wide batch pool (see _executor), so each worker receives the
+    map once per request. Structures shared by every pair (the decomposition
+    and cell roadmap of the DP planner, or the visibility graph) are built
+    by the first pair of a worker, within its deadline and error handling,
+    and stay in the worker's caches for the next pairs and requests.
+
+    With a PlanningPool (production serving), the pairs run on its
+    long-lived workers instead, within the pool's time budget; each worker
+    keeps the shared structures in its own caches between requests.
+    """
+    if not pairs:
+        return []
+    if pool is not None:
+        results = pool.map(
+            plan_pair,
+            [(start, goal, obstacles, boundary, options, planner) for start, goal in pairs],
+            time_budget=time_budget,
+        )
+        return [
+            result or {'status': 'timeout', 'error': 'Path planning exceeded its time budget'}
+            for result in results
+        ]
+    deadline = time.monotonic() + time_budget if time_budget else None
+    workers = min(len(pairs), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [plan_pair(start, goal, obstacles, boundary, options, planner, deadline) for start, goal in pairs]
+
+    # Interleaved chunks, so pairs listed by area spread over the workers
+    futures = [_executor().submit(_plan_pairs, pairs[i::workers], obstacles, boundary, options, planner, deadline)
+               for i in range(workers)]
+    results = [None] * len(pairs)
+    for i, future in enumerate(futures):
+        results[i::workers] = future.result()
+    return results
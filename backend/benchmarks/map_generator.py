@@ -0,0 +1,198 @@
+# map_generator.py
+
+import math
+import random
+
+from server import meters_to_latlng
+
+# Reference point of the generated maps (the bottom-left boundary corner)
+REF_LAT, REF_LON = 51.5, -0.12
+
+LAYOUTS = ('random', 'clustered', 'corridor', 'maze')
+
+# Default grid resolution of the planners, as a fraction of the map side
+DEFAULT_GRID_STEP = 0.02
+# Narrowest corridor passage, in default grid steps: the walls' safety
+# margins take one step, and the rest always holds a column of lattice points
+MIN_PASSAGE_STEPS = 2.5
+
+
+def _latlng(x, y):
+    lat, lon = meters_to_latlng(x, y, REF_LAT, REF_LON)
+    return {'latitude': float(lat), 'longitude': float(lon)}
+
+
+def _rectangle(x0, y0, x1, y1):
+    """Rectangle obstacle with its corners in the order the app draws them."""
+    corner1, corner2 = (x0, y0), (x1, y1)
+    return {
+        'type': 'rectangle',
+        'points': [
+            _latlng(*corner1),
+            _latlng(corner2[0], corner1[1]),
+            _latlng(*corner2),
+            _latlng(corner1[0], corner2[1]),
+        ],
+    }
+
+
+def _circle(x, y, radius):
+    return {'type': 'circle', 'center': _latlng(x, y), 'radius': radius}
+
+
+def _is_free(point, shapes, clearance):
+    """True when point is at least `clearance` away from every (metric) shape."""
+    x, y = point
+    for shape in shapes:
+        if shape[0] == 'rectangle':
+            _, x0, y0, x1, y1 = shape
+            if x0 - clearance <= x <= x1 + clearance and y0 - clearance <= y <= y1 + clearance:
+                return False
+        elif math.dist(point, shape[1:3]) <= shape[3] + clearance:
+            return False
+    return True
+
+
+def _free_point(rng, size, shapes, clearance, region=None):
+    """
+    Random point of the map (or of region x0, y0, x1, y1) clear of the
+    shapes; the clearance is relaxed on crowded maps.
+    """
+    x0, y0, x1, y1 = region or (0, 0, size, size)
+    clearance = min(clearance, (x1 - x0) / 4, (y1 - y0) / 4)
+    for attempt in range(10000):
+        point = (rng.uniform(x0, x1), rng.uniform(y0, y1))
+        if _is_free(point, shapes, clearance / 2 ** (attempt // 1000)):
+            return point
+    raise ValueError("Could not place a start or goal point, the map is too crowded")
+
+
+def _scattered_shapes(rng, size, count, clustered):
+    """
+    Rectangles and circles spread uniformly or around a few cluster centers.
+    Obstacles shrink as their number grows, so the covered area stays
+    comparable.
+    """
+    clusters = [(rng.uniform(0.2, 0.8) * size, rng.uniform(0.2, 0.8) * size) for _ in range(max(1, count // 8))]
+    scale = min(1.0, math.sqrt(20 / max(count, 1)))
+    shapes = []
+    for i in range(count):
+        extent = rng.uniform(0.01, 0.06) * size * scale
+        if clustered:
+            cx, cy = rng.choice(clusters)
+            x = min(max(rng.gauss(cx, size * 0.08), 0), size)
+            y = min(max(rng.gauss(cy, size * 0.08), 0), size)
+        else:
+            x, y = rng.uniform(0, size), rng.uniform(0, size)
+        if i % 3 == 2:
+            shapes.append(('circle', x, y, extent))
+        else:
+            w, h = extent * rng.uniform(0.5, 2.0), extent * rng.uniform(0.5, 2.0)
+            shapes.append(('rectangle', max(x - w, 0), max(y - h, 0), min(x + w, size), min(y + h, size)))
+    return shapes
+
+
+def _corridor_shapes(rng, size, count):
+    """
+    `count` vertical walls with a gap alternately at the top and bottom.
+    Neighbouring walls stay at least MIN_PASSAGE_STEPS default grid steps
+    apart, so that the corridor stays open at the planners' default
+    resolution once the walls are inflated by its safety margin; fewer
+    walls are placed when `count` of them do not fit.
+    """
+    min_passage = MIN_PASSAGE_STEPS * DEFAULT_GRID_STEP * size
+    max_thickness = size * 0.02
+    walls = max(1, min(count, int(size / (max_thickness + min_passage)) - 1))
+    spacing = size / (walls + 1)
+    thickness = min(spacing * 0.3, max_thickness)
+    # Two neighbouring walls moving towards each other keep the passage open
+    jitter = min(0.1 * spacing, (spacing - thickness - min_passage) / 2)
+    gap = size * 0.15
+    shapes = []
+    for i in range(walls):
+        x = spacing * (i + 1) + rng.uniform(-jitter, jitter)
+        if i % 2 == 0:
+            shapes.append(('rectangle', x, 0.0, x + thickness, size - gap))
+        else:
+            shapes.append(('rectangle', x, gap, x + thickness, size))
+    start_region = (0, 0, spacing * 0.5, size)
+    goal_region = (size - spacing * 0.5, 0, size, size)
+    return shapes, start_region, goal_region
+
+
+def _maze_shapes(rng, size, count):
+    """
+    Perfect maze on an n x n grid of rooms (n grows with `count`), carved by a
+    randomized depth-first search; the remaining walls are rectangles.
+    """
+    n = max(2, int(math.sqrt(max(count, 4))))
+    room = size / n
+    thickness = room * 0.1
+    # Walls between horizontally and vertically neighbouring rooms
+    open_walls = set()
+    visited = {(0, 0)}
+    stack = [(0, 0)]
+    while stack:
+        i, j = stack[-1]
+        neighbours = [(i + di, j + dj) for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                      if 0 <= i + di < n and 0 <= j + dj < n and (i + di, j + dj) not in visited]
+        if not neighbours:
+            stack.pop()
+            continue
+        nxt = rng.choice(neighbours)
+        open_walls.add(frozenset(((i, j), nxt)))
+        visited.add(nxt)
+        stack.append(nxt)
+
+    shapes = []
+    for i in range(n):
+        for j in range(n):
+            if i + 1 < n and frozenset(((i, j), (i + 1, j))) not in open_walls:
+                x = (i + 1) * room
+                shapes.append(('rectangle', x - thickness / 2, j * room, x + thickness / 2, (j + 1) * room))
+            if j + 1 < n and frozenset(((i, j), (i, j + 1))) not in open_walls:
+                y = (j + 1) * room
+                shapes.append(('rectangle', i * room, y - thickness / 2, (i + 1) * room, y + thickness / 2))
+    start_region = (room * 0.3, room * 0.3, room * 0.7, room * 0.7)
+    goal_region = (size - room * 0.7, size - room * 0.7, size - room * 0.3, size - room * 0.3)
+    return shapes, start_region, goal_region
+
+
+def generate_map(layout='random', size=200.0, obstacles=20, seed=0):
+    """
+    Generates a square map of `size` meters in the JSON shape sent by the
+    Flutter app (boundary, obstacles, start and goal as LatLng dicts).
+
+    Layouts:
+    - 'random': rectangles and circles spread uniformly
+    - 'clustered': rectangles and circles grouped around a few centers
+    - 'corridor': up to `obstacles` walls forming a serpentine corridor
+    - 'maze': a maze with about `obstacles` rooms
+
+    The same arguments always give the same map.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}'")
+    rng = random.Random(f"{layout}:{size}:{obstacles}:{seed}")
+    start_region = goal_region = None
+    if layout == 'corridor':
+        shapes, start_region, goal_region = _corridor_shapes(rng, size, obstacles)
+    elif layout == 'maze':
+        shapes, start_region, goal_region = _maze_shapes(rng, size, obstacles)
+    else:
+        shapes = _scattered_shapes(rng, size, obstacles, clustered=(layout == 'clustered'))
+
+    clearance = size * 0.03
+    start = _free_point(rng, size, shapes, clearance, start_region)
+    goal = _free_point(rng, size, shapes, clearance, goal_region)
+
+    return {
+        'name': f"{layout}-{int(size)}m-{obstacles}-{seed}",
+        'boundary': _rectangle(0.0, 0.0, size, size),
+        'obstacles': [
+            _rectangle(*shape[1:]) if shape[0] == 'rectangle' else _circle(*shape[1:])
+            for shape in shapes
+        ],
+        'start': _latlng(*start),
+        'goal': _latlng(*goal),
+    }
@@ -0,0 +1,319 @@
+# runner.py
+"""
+Planning benchmarks. Run from the backend directory:
+
+    python -m benchmarks.runner --profile quick --output results.json
+    python -m benchmarks.runner --compare benchmarks/baseline.json
+
+Every scenario is a generated map (see map_generator.generate_map) and
+every target is timed `repeats` times on it, with cold caches unless the
+target says otherwise. Results are written as JSON; --compare checks them
+against a stored run and exits with status 1 on a regression.
+
+Timings depend on the machine. Every run also times a fixed calibration
+workload (see calibrate), and --compare scales the stored timings by the
+ratio of the two calibrations. That only approximates the difference
+between two machines: record a baseline locally (--save-baseline) before
+relying on a comparison.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Keep the benchmark's path store away from the server's, whatever
+# PATH_STORE_PATH says: reset_caches() empties it
+BENCHMARK_PATH_STORE = os.path.join(tempfile.mkdtemp(), 'benchmark_paths.sqlite3')
+os.environ['PATH_STORE_PATH'] = BENCHMARK_PATH_STORE
+
+import numpy as np
+
+import map_cache
+from astar_modified import AStarPlanner
+from bidirectional_search import BidirectionalAStarPlanner
+from decomposition import Boustrophedon_Cellular_Decomposition
+from dp_planner import DynamicProgrammingPlanner, default_raster_scale, rasterize_obstacles
+from jump_point_search import JumpPointPlanner
+from path_store import path_store, path_table
+from server import app, process_request_data
+from visibility_graph import VisibilityGraphPlanner
+
+from benchmarks.map_generator import generate_map
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# (layout, map size in meters, obstacle count, grid resolution in meters or
+# None for the planners' default) per profile
+PROFILES = {
+    'quick': [
+        ('random', 200, 20, None),
+        ('random', 200, 20, 1.0),
+        ('clustered', 500, 40, None),
+        ('corridor', 200, 6, None),
+        ('maze', 300, 16, 2.0),
+    ],
+    'full': [
+        ('random', 200, 20, None),
+        ('random', 200, 20, 1.0),
+        ('random', 500, 80, None),
+        ('random', 1000, 200, 5.0),
+        ('random', 2000, 2000, 10.0),
+        ('clustered', 500, 40, None),
+        ('clustered', 1000, 200, 5.0),
+        ('corridor', 200, 6, None),
+        ('corridor', 1000, 12, 5.0),
+        ('maze', 300, 16, 2.0),
+        ('maze', 1000, 64, 5.0),
+    ],
+}
+
+
+def reset_caches():
+    """Empties every process-wide cache so that a run starts cold."""
+    if path_store.db_path != BENCHMARK_PATH_STORE:
+        # path_store was imported before this module and may be the server's
+        raise RuntimeError(f"Refusing to empty the path store at {path_store.db_path}")
+    for cache in (map_cache.decomposition_cache, map_cache.roadmap_cache, map_cache.visibility_graph_cache,
+                  map_cache.recent_maps, map_cache.map_lineage):
+        cache.clear()
+    path_store.clear()
+    path_table.clear()
+
+
+def _grid(planner_class, epsilon=0.0):
+    def run(data, prepared):
+        start, goal, obstacles, boundary, options = prepared
+        planner = planner_class(start, goal, obstacles, boundary, resolution=options['resolution'], epsilon=epsilon)
+        path, pruned_path = planner.planning()
+        return {'expansions': planner.expansions, 'cost_bound': planner.cost_bound,
+                'path_points': len(path), 'pruned_points': len(pruned_path)}
+    return run
+
+
+def _dp(data, prepared):
+    start, goal, obstacles, boundary, options = prepared
+    planner = DynamicProgrammingPlanner(start, goal, obstacles, boundary, resolution=options['resolution'])
+    path, pruned_path = planner.planning()
+    return {'cells': planner.total_cells_number, 'path_points': len(path), 'pruned_points': len(pruned_path)}
+
+
+def _visibility(data, prepared):
+    start, goal, obstacles, boundary, options = prepared
+    planner = VisibilityGraphPlanner(start, goal, obstacles, boundary, resolution=options['resolution'])
+    path, _ = planner.planning()
+    return {'expansions': planner.expansions, 'graph_nodes': len(planner.graph.nodes), 'path_points': len(path)}
+
+
+def _decomposition(data, prepared):
+    _, _, obstacles, boundary, _ = prepared
+    map_size = [boundary['bottom_left'][0], boundary['top_right'][0],
+                boundary['bottom_left'][1], boundary['top_right'][1]]
+    map_img = rasterize_obstacles(obstacles, map_size, default_raster_scale(map_size))
+    _, total_cells_number, _ = Boustrophedon_Cellular_Decomposition(map_img == 0)
+    return {'cells': total_cells_number, 'pixels': int(map_img.size)}
+
+
+def _endpoint(endpoint):
+    def run(data, prepared):
+        response = app.test_client().post(endpoint, json=data)
+        return {'status_code': response.status_code, 'response_bytes': len(response.data)}
+    return run
+
+
+# name -> (function, whether the caches are emptied before every run)
+TARGETS = {
+    'astar': (_grid(AStarPlanner), True),
+    'jps': (_grid(JumpPointPlanner), True),
+    'weighted': (_grid(AStarPlanner, epsilon=0.5), True),
+    'bidirectional': (_grid(BidirectionalAStarPlanner), True),
+    'dp': (_dp, True),
+    'dp_warm': (_dp, False),
+    'decomposition': (_decomposition, True),
+    'visibility': (_visibility, True),
+    'visibility_warm': (_visibility, False),
+    'endpoint_astar': (_endpoint('/plan-path'), True),
+    'endpoint_dp': (_endpoint('/plan-path-dp'), True),
+    'endpoint_visibility': (_endpoint('/plan-path-visibility'), True),
+}
+
+
+def latency_stats(samples):
+    samples = np.asarray(samples) * 1000.0
+    return {
+        'runs': len(samples),
+        'mean_ms': float(np.mean(samples)),
+        'min_ms': float(np.min(samples)),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p90_ms': float(np.percentile(samples, 90)),
+        'p99_ms': float(np.percentile(samples, 99)),
+    }
+
+
+def run_target(name, data, repeats):
+    """Times one target on one map and measures its peak traced memory."""
+    function, cold = TARGETS[name]
+    start, goal, obstacles, boundary, _, _, options = process_request_data(data)
+    prepared = (start, goal, obstacles, boundary, options)
+
+    reset_caches()
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(data, prepared)  # Warm-up, not measured
+        for _ in range(repeats):
+            if cold:
+                reset_caches()
+            begin = time.perf_counter()
+            extra = function(data, prepared)
+            samples.append(time.perf_counter() - begin)
+
+        # Separate run for memory, tracing slows everything down
+        if cold:
+            reset_caches()
+        tracemalloc.start()
+        try:
+            function(data, prepared)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {**latency_stats(samples), 'peak_memory_bytes': peak, **extra}
+
+
+def calibrate(repeats=20):
+    """
+    Fastest time, in ms, of a fixed workload: a fine grid A* on a generated
+    map, which exercises both the interpreter and NumPy.
+    """
+    data = generate_map('random', 200, 20, 0)
+    start, goal, obstacles, boundary, _, _, _ = process_request_data(data)
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats + 1):
+            begin = time.perf_counter()
+            AStarPlanner(start, goal, obstacles, boundary, resolution=1.0).planning()
+            samples.append(time.perf_counter() - begin)
+    return min(samples[1:]) * 1000.0
+
+
+def run_benchmarks(profile='quick', repeats=5, targets=None, seeds=(0,)):
+    targets = targets or list(TARGETS)
+    results = {}
+    for layout, size, obstacles, resolution in PROFILES[profile]:
+        for seed in seeds:
+            data = generate_map(layout, size, obstacles, seed)
+            if resolution:
+                data['resolution'] = resolution
+                data['name'] += f"-{resolution:g}m"
+            results[data['name']] = {name: run_target(name, data, repeats) for name in targets}
+            print(f"{data['name']}: " + ', '.join(
+                f"{name} {result['p50_ms']:.1f} ms" for name, result in results[data['name']].items()
+            ), file=sys.stderr)
+
+    return {
+        'meta': {
+            'profile': profile,
+            'repeats': repeats,
+            'seeds': list(seeds),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'calibration_ms': calibrate(),
+        },
+        'results': results,
+    }
+
+
+def machine_scale(current, baseline):
+    """
+    Ratio of the calibration times of two runs (see calibrate), 1.0 when
+    either run has none.
+    """
+    current_ms = current['meta'].get('calibration_ms')
+    baseline_ms = baseline['meta'].get('calibration_ms')
+    return current_ms / baseline_ms if current_ms and baseline_ms else 1.0
+
+
+def compare(current, baseline, metric='min_ms', tolerance=0.2, min_delta_ms=1.0):
+    """
+    Compares a latency statistic (the fastest run by default, which is the
+    least sensitive to scheduling noise) of two runs, with the baseline's
+    timings scaled to the current machine (see machine_scale). Returns
+    (rows, regressions): one row per scenario and target present in both,
+    and the rows that got slower by more than `tolerance` (relative) and
+    more than `min_delta_ms`, which keeps timer noise on tiny maps out.
+    """
+    scale = machine_scale(current, baseline)
+    rows, regressions = [], []
+    for scenario, targets in current['results'].items():
+        for name, result in targets.items():
+            reference = baseline['results'].get(scenario, {}).get(name)
+            if reference is None:
+                continue
+            reference = {**reference, metric: reference[metric] * scale}
+            ratio = result[metric] / reference[metric] if reference[metric] > 0 else 1.0
+            row = {
+                'scenario': scenario,
+                'target': name,
+                'baseline': reference[metric],
+                'current': result[metric],
+                'ratio': ratio,
+                'expansions_changed': result.get('expansions') != reference.get('expansions'),
+            }
+            rows.append(row)
+            if ratio > 1.0 + tolerance and result[metric] - reference[metric] > min_delta_ms:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Path planning benchmarks")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seeds', type=int, default=1, help="maps generated per scenario")
+    parser.add_argument('--targets', nargs='+', choices=sorted(TARGETS))
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare against a stored results file")
+    parser.add_argument('--metric', choices=['min_ms', 'p50_ms', 'p90_ms', 'mean_ms'], default='min_ms',
+                        help="latency statistic compared with --compare (default min_ms)")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed relative slowdown before failing (default 0.2)")
+    parser.add_argument('--save-baseline', action='store_true', help=f"store the results as {BASELINE_PATH}")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.profile, args.repeats, args.targets, range(args.seeds))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(results, f, indent=2)
+    if not args.output and not args.save_baseline:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.metric, args.tolerance)
+        print(f"Baseline timings scaled by x{machine_scale(results, baseline):.2f} (calibration)", file=sys.stderr)
+        for row in rows:
+            flag = 'REGRESSION' if row in regressions else ''
+            if row['expansions_changed']:
+                flag += ' (expansions changed)'
+            print(f"{row['scenario']:<28} {row['target']:<15} {row['baseline']:>10.1f} -> "
+                  f"{row['current']:>10.1f} ms  x{row['ratio']:.2f} {flag}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
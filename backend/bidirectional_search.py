@@ -0,0 +1,137 @@
+# bidirectional_search.py
+
+import heapq
+import math
+import time
+
+import numpy as np
+
+from astar_modified import AStarPlanner, PlanningTimeout
+
+
+def bidirectional_search(free, stride, start_index, targets, xs, ys, goal, offsets, deadline=None):
+    """
+    Bidirectional A* on the padded, flattened free grid of AStarPlanner.
+
+    The forward search grows from start_index towards the goal, the backward
+    one from the targets (the points within one resolution of the goal,
+    seeded with their distance to the goal) towards the start. The side
+    with the smaller open set expands next.
+
+    Both sides use the balanced heuristic of Ikeda et al. (half the
+    difference of the straight line distances to the goal and to the
+    start), which is consistent in both directions, so the search is a
+    bidirectional Dijkstra on reduced costs: it stops once the least keys of
+    the two open sets add up to the best meeting cost found, and the path
+    is as short as the A* one.
+
+    `offsets` are the (flat offset, cost) moves of the lattice. Returns
+    (goal_index, parent, expanded, pushed) like AStarPlanner.search: the
+    parent links of the backward half are turned around, so that they lead
+    from the target where the path ends back to the start.
+    """
+    size = free.size
+    goal_x, goal_y = goal
+    # Heuristics point at the goal (forward) and at the start (backward)
+    aims = [(goal_x, goal_y), (xs[start_index % stride], ys[start_index // stride])]
+
+    # Per side (0: forward, 1: backward)
+    g_cost = [np.full(size, np.inf), np.full(size, np.inf)]
+    parent = [np.full(size, -1, dtype=np.int64), np.full(size, -1, dtype=np.int64)]
+    # 0: unvisited, 1: open, 2: closed
+    state = [np.zeros(size, dtype=np.int8), np.zeros(size, dtype=np.int8)]
+    open_heaps = [[], []]
+    open_count = [0, 0]
+    entered = 0
+
+    def heuristic(side, index):
+        x, y = xs[index % stride], ys[index // stride]
+        to_aim = math.hypot(x - aims[side][0], y - aims[side][1])
+        to_origin = math.hypot(x - aims[1 - side][0], y - aims[1 - side][1])
+        return (to_aim - to_origin) / 2
+
+    def stale(side, entry):
+        f, _, index = entry
+        return state[side][index] != 1 or f != g_cost[side][index] + heuristic(side, index)
+
+    def seed(side, index, cost):
+        nonlocal entered
+        g_cost[side][index] = cost
+        state[side][index] = 1
+        open_count[side] += 1
+        heapq.heappush(open_heaps[side], (cost + heuristic(side, index), entered, index))
+        entered += 1
+
+    seed(0, start_index, 0.0)
+    for target in targets:
+        seed(1, target, math.hypot(xs[target % stride] - goal_x, ys[target // stride] - goal_y))
+    pushed = entered
+    best, meeting = math.inf, -1
+    if start_index in targets:
+        best, meeting = g_cost[1][start_index], start_index
+    expanded = 0
+
+    while open_count[0] and open_count[1]:
+        if deadline is not None and expanded % 1024 == 0 and time.monotonic() > deadline:
+            raise PlanningTimeout("Path planning exceeded its time budget")
+
+        for side in (0, 1):
+            while stale(side, open_heaps[side][0]):
+                heapq.heappop(open_heaps[side])
+        if best <= open_heaps[0][0][0] + open_heaps[1][0][0]:
+            break
+
+        side = 0 if open_count[0] <= open_count[1] else 1
+        other = 1 - side
+        _, _, c_id = heapq.heappop(open_heaps[side])
+        state[side][c_id] = 2
+        open_count[side] -= 1
+        expanded += 1
+        # Backward moves run the forward moves in reverse: the expanded point
+        # is their destination, which must be free (the start may not be)
+        if side == 1 and not free[c_id]:
+            continue
+
+        g, side_parent, side_state = g_cost[side], parent[side], state[side]
+        c_cost = g[c_id]
+        for offset, step_cost in offsets:
+            n_id = c_id + offset
+            if not (free[n_id] or (side == 1 and n_id == start_index)) or side_state[n_id] == 2:
+                continue
+            n_cost = c_cost + step_cost
+            if side_state[n_id] == 0:
+                side_state[n_id] = 1
+                open_count[side] += 1
+            elif g[n_id] <= n_cost:
+                continue
+            g[n_id] = n_cost
+            side_parent[n_id] = c_id
+            heapq.heappush(open_heaps[side], (n_cost + heuristic(side, n_id), entered, n_id))
+            entered += 1
+            pushed += 1
+            if n_cost + g_cost[other][n_id] < best:
+                best, meeting = n_cost + g_cost[other][n_id], n_id
+
+    if meeting == -1:
+        return -1, parent[0], expanded, pushed
+
+    # Hang the backward half below the meeting point
+    forward_parent, backward_parent = parent
+    index = meeting
+    while backward_parent[index] != -1:
+        forward_parent[backward_parent[index]] = index
+        index = backward_parent[index]
+    return int(index), forward_parent, expanded, pushed
+
+
+class BidirectionalAStarPlanner(AStarPlanner):
+    """
+    AStarPlanner searching from both ends at once (see bidirectional_search),
+    with the same grid, goal test and pruning, and paths of the same cost.
+    The search is exact, epsilon is not used.
+    """
+    def search(self, free, stride, start_index, xs, ys):
+        self.cost_bound = 1.0
+        offsets = [(dx + dy * stride, cost * self.resolution) for dx, dy, cost in self.motion]
+        return bidirectional_search(free, stride, start_index, self.goal_targets(free, stride, start_index, xs, ys),
+                                    xs, ys, self.goal, offsets, self.deadline)
@@ -0,0 +1,127 @@
+# cell_graph.py
+
+import heapq
+import math
+
+import numpy as np
+
+from decomposition import cell_adjacency
+
+
+class CellGraph:
+    """
+    Roadmap over a Boustrophedon decomposition.
+
+    Every cell center is a node, and so is the midpoint of every boundary
+    shared by two cells of neighbouring columns. Each boundary midpoint is
+    linked to the centers of the two cells it separates, with the edge length
+    as weight. Edges are straight lines when `segment_free` accepts them;
+    otherwise `plan_segment(p, q)` provides a detour (e.g. a grid A* path),
+    or the edge is dropped when it returns None.
+
+    Queries run A* on this small graph. Shortest-path trees from every cell
+    can optionally be precomputed with precompute_all_pairs().
+
+    `decomposed` has `scale` pixels per meter and its pixel (0, 0) is at
+    `origin`; cell centers are already in meters.
+    """
+    def __init__(self, decomposed, cells, origin, segment_free, plan_segment, scale=1.0):
+        min_x, min_y = origin
+        self.positions = dict()
+        self.edges = dict()
+        self.geometry = dict()
+        self.trees = None
+
+        for cell_id, cell in enumerate(cells):
+            if cell is not None:
+                self.positions[cell_id] = (float(cell.center[0]), float(cell.center[1]))
+                self.edges[cell_id] = []
+
+        left_cells, right_cells, columns, floors, ceilings = cell_adjacency(decomposed)
+        pairs = []
+        for k in range(len(columns)):
+            left_cell, right_cell = int(left_cells[k]), int(right_cells[k])
+            if left_cell not in self.positions or right_cell not in self.positions:
+                continue
+            node = ('boundary', k)
+            self.positions[node] = (float((columns[k] - 0.5) / scale + min_x),
+                                    float((floors[k] + ceilings[k]) / 2 / scale + min_y))
+            self.edges[node] = []
+            pairs.append((left_cell, node))
+            pairs.append((node, right_cell))
+        if not pairs:
+            return
+
+        starts = np.array([self.positions[u] for u, _ in pairs])
+        ends = np.array([self.positions[v] for _, v in pairs])
+        is_free = segment_free(starts, ends)
+        for (u, v), free, p, q in zip(pairs, is_free, starts.tolist(), ends.tolist()):
+            path = [p, q] if free else plan_segment(p, q)
+            if path is None:
+                continue
+            length = sum(math.dist(a, b) for a, b in zip(path[:-1], path[1:]))
+            self.edges[u].append((v, length))
+            self.edges[v].append((u, length))
+            self.geometry[(u, v)] = path
+            self.geometry[(v, u)] = path[::-1]
+
+    def _search(self, source, target=None):
+        """A* from source (Dijkstra over the whole graph when target is None)."""
+        if target is None:
+            heuristic = lambda node: 0.0
+        else:
+            target_position = self.positions[target]
+            heuristic = lambda node: math.dist(self.positions[node], target_position)
+
+        cost = {source: 0.0}
+        parent = {source: None}
+        closed = set()
+        open_heap = [(heuristic(source), 0, source)]
+        order = 1
+        while open_heap:
+            _, _, node = heapq.heappop(open_heap)
+            if node in closed:
+                continue
+            closed.add(node)
+            if node == target:
+                break
+            for neighbour, length in self.edges[node]:
+                new_cost = cost[node] + length
+                if neighbour not in cost or new_cost < cost[neighbour]:
+                    cost[neighbour] = new_cost
+                    parent[neighbour] = node
+                    heapq.heappush(open_heap, (new_cost + heuristic(neighbour), order, neighbour))
+                    order += 1
+        return parent
+
+    def precompute_all_pairs(self):
+        """Stores the shortest-path tree of every cell for constant-time lookups."""
+        if self.trees is None:
+            self.trees = {
+                node: self._search(node) for node in self.edges if not isinstance(node, tuple)
+            }
+
+    def shortest_path(self, start_cell, goal_cell):
+        """
+        Returns the shortest path between two cell centers as a list of [x, y]
+        points, or None when the cells are not connected.
+        """
+        start_cell, goal_cell = int(start_cell), int(goal_cell)
+        if start_cell not in self.edges or goal_cell not in self.edges:
+            return None
+        # Search from the goal so that parent links lead from the start to it
+        if self.trees is not None:
+            parent = self.trees[goal_cell]
+        else:
+            parent = self._search(goal_cell, start_cell)
+        if start_cell not in parent:
+            return None
+
+        nodes = [start_cell]
+        while parent[nodes[-1]] is not None:
+            nodes.append(parent[nodes[-1]])
+
+        path = [list(self.positions[start_cell])]
+        for u, v in zip(nodes[:-1], nodes[1:]):
+            path.extend(list(point) for point in self.geometry[(u, v)][1:])
+        return path
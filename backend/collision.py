@@ -0,0 +1,322 @@
+# collision.py
+
+import math
+
+import numpy as np
+
+from instrumentation import count
+
+
+def _expand_ranges(x0, x1, y0, y1, columns):
+    """
+    Enumerates the buckets of inclusive bucket ranges [x0, x1] x [y0, y1].
+    Returns (owner, bucket): the index of the range and the flat bucket id
+    (row * columns + column) of every bucket covered.
+    """
+    widths = x1 - x0 + 1
+    sizes = widths * (y1 - y0 + 1)
+    owner = np.repeat(np.arange(len(sizes)), sizes)
+    k = np.arange(owner.size) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    bucket_x = x0[owner] + k % widths[owner]
+    bucket_y = y0[owner] + k // widths[owner]
+    return owner, bucket_y * columns + bucket_x
+
+
+class ObstacleIndex:
+    """
+    Uniform bucket grid over axis-aligned boxes (min_x, min_y, max_x, max_y).
+
+    Every box is listed in each bucket it overlaps, and a query only looks at
+    the boxes of the buckets it covers, so its cost depends on the obstacles
+    nearby rather than on the total count. The bucket size follows the
+    median box size and the obstacle density, which keeps most boxes in a
+    handful of buckets.
+    """
+
+    # Segments whose bounding box covers more buckets than this are looked
+    # up along the segment instead
+    max_query_buckets = 16
+
+    def __init__(self, boxes):
+        self.boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        if len(self.boxes) == 0:
+            self.origin, self.bucket_size, self.columns, self.rows = np.zeros(2), 1.0, 1, 1
+            self.items = np.zeros(0, dtype=np.int64)
+            self.starts = np.zeros(2, dtype=np.int64)
+            return
+
+        low, high = self.boxes[:, :2].min(axis=0), self.boxes[:, 2:].max(axis=0)
+        extent = np.maximum(high - low, 1e-9)
+        sides = np.maximum(self.boxes[:, 2] - self.boxes[:, 0], self.boxes[:, 3] - self.boxes[:, 1])
+        self.bucket_size = max(
+            float(np.median(sides)),
+            math.sqrt(extent[0] * extent[1] / len(self.boxes)),
+            float(extent.max()) / 1024,  # At most 1024 buckets along an axis
+        )
+        self.origin = low
+        self.columns, self.rows = (np.floor(extent / self.bucket_size).astype(int) + 1).tolist()
+
+        x0, y0 = self._buckets(self.boxes[:, :2])
+        x1, y1 = self._buckets(self.boxes[:, 2:])
+        owner, bucket = _expand_ranges(x0, x1, y0, y1, self.columns)
+        order = np.argsort(bucket, kind='stable')
+        self.items = owner[order]
+        self.starts = np.searchsorted(bucket[order], np.arange(self.columns * self.rows + 1))
+
+    def _buckets(self, points):
+        """Bucket column and row of (N, 2) points, clamped to the grid."""
+        cells = np.floor((points - self.origin) / self.bucket_size)
+        return (np.clip(cells[:, 0], 0, self.columns - 1).astype(np.int64),
+                np.clip(cells[:, 1], 0, self.rows - 1).astype(np.int64))
+
+    def _candidates(self, owner, bucket, low, high):
+        """Distinct (owner, box) pairs of the given buckets whose box overlaps [low, high] of the owner."""
+        counts = self.starts[bucket + 1] - self.starts[bucket]
+        pair_owner = np.repeat(owner, counts)
+        k = np.arange(pair_owner.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_box = self.items[np.repeat(self.starts[bucket], counts) + k]
+
+        # Sorted distinct keys (np.unique is much slower on large inputs)
+        keys = np.sort(pair_owner * len(self.boxes) + pair_box)
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = keys[1:] != keys[:-1]
+        keys = keys[distinct]
+        pair_owner, pair_box = keys // len(self.boxes), keys % len(self.boxes)
+        boxes = self.boxes[pair_box]
+        overlap = ((boxes[:, 0] <= high[pair_owner, 0]) & (boxes[:, 2] >= low[pair_owner, 0]) &
+                   (boxes[:, 1] <= high[pair_owner, 1]) & (boxes[:, 3] >= low[pair_owner, 1]))
+        return pair_owner[overlap], pair_box[overlap]
+
+    def query_boxes(self, low, high):
+        """
+        Boxes overlapping each query box [low[i], high[i]] ((N, 2) arrays).
+        Returns (query, box) index arrays, one entry per overlapping pair.
+        """
+        low = np.asarray(low, dtype=float).reshape(-1, 2)
+        high = np.asarray(high, dtype=float).reshape(-1, 2)
+        if len(self.boxes) == 0 or len(low) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        x0, y0 = self._buckets(low)
+        x1, y1 = self._buckets(high)
+        owner, bucket = _expand_ranges(x0, x1, y0, y1, self.columns)
+        return self._candidates(owner, bucket, low, high)
+
+    def query_segments(self, starts, ends):
+        """
+        Boxes that segment starts[i] -> ends[i] may touch: those overlapping
+        the segment's bounding box and found in the buckets along the
+        segment. Returns (segment, box) index arrays.
+        """
+        low, high = np.minimum(starts, ends), np.maximum(starts, ends)
+        if len(self.boxes) == 0 or len(low) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        x0, y0 = self._buckets(low)
+        x1, y1 = self._buckets(high)
+        short = (x1 - x0 + 1) * (y1 - y0 + 1) <= self.max_query_buckets
+        owner, bucket = _expand_ranges(x0[short], x1[short], y0[short], y1[short], self.columns)
+        owners, buckets = [np.flatnonzero(short)[owner]], [bucket]
+
+        long_segments = np.flatnonzero(~short)
+        if len(long_segments):
+            # Samples at most one bucket apart: any point of the segment is
+            # within half a bucket of one, so in its bucket or a neighbour
+            p, q = starts[long_segments], ends[long_segments]
+            samples = np.ceil(np.max(np.abs(q - p), axis=1) / self.bucket_size).astype(np.int64) + 1
+            sample_owner = np.repeat(np.arange(len(long_segments)), samples)
+            step = np.arange(sample_owner.size) - np.repeat(np.cumsum(samples) - samples, samples)
+            t = (step / (samples[sample_owner] - 1))[:, None]
+            points = p[sample_owner] + (q[sample_owner] - p[sample_owner]) * t
+            sx, sy = self._buckets(points)
+            owner, bucket = _expand_ranges(np.maximum(sx - 1, 0), np.minimum(sx + 1, self.columns - 1),
+                                           np.maximum(sy - 1, 0), np.minimum(sy + 1, self.rows - 1), self.columns)
+            owners.append(long_segments[sample_owner[owner]])
+            buckets.append(bucket)
+
+        return self._candidates(np.concatenate(owners), np.concatenate(buckets), low, high)
+
+
+class SegmentCollisionChecker:
+    """
+    Vectorized segment-vs-obstacle collision tests.
+
+    The obstacles are packed once into NumPy arrays (rectangle edges and
+    inflated circles) and indexed by an ObstacleIndex of their bounding
+    boxes, so that N segments are tested in a single call against the
+    obstacles near them only. The planners' visibility caches test path
+    segments with it. The rules are:
+
+    - a rectangle blocks a segment when the segment crosses or touches one of
+      its edges, or when both end points lie inside it (a zero-length segment
+      is blocked when its point lies inside);
+    - a circle, inflated by the safety margin, blocks a segment when either
+      end point lies inside it or the segment crosses its outline.
+    """
+
+    # Upper bound on the number of segments whose candidates are gathered at once
+    max_segments_per_chunk = 1 << 16
+
+    def __init__(self, obstacles, safety_margin):
+        edge_p, edge_q, edge_count = [], [], []
+        circles = []
+        # Rectangles and circles in their original order, with their boxes
+        self.obstacles, kinds, boxes = [], [], []
+        for obs in obstacles:
+            if obs['type'] == 'rectangle':
+                points = [tuple(p) for p in obs['points']]
+                n = len(points)
+                edge_p.extend(points)
+                edge_q.extend(points[(i + 1) % n] for i in range(n))
+                edge_count.append(n)
+                xs, ys = [p[0] for p in points], [p[1] for p in points]
+                boxes.append((min(xs), min(ys), max(xs), max(ys)))
+                kinds.append((0, len(edge_count) - 1))
+            elif obs['type'] == 'circle':
+                center_x, center_y = obs['center']
+                radius = obs['radius'] + safety_margin
+                circles.append((center_x, center_y, radius))
+                boxes.append((center_x - radius, center_y - radius, center_x + radius, center_y + radius))
+                kinds.append((1, len(circles) - 1))
+            else:
+                continue
+            self.obstacles.append(obs)
+
+        self.edge_p = np.array(edge_p, dtype=float).reshape(-1, 2)
+        self.edge_q = np.array(edge_q, dtype=float).reshape(-1, 2)
+        # First edge and edge count of each rectangle
+        self.rect_offsets = np.concatenate(([0], np.cumsum(edge_count)[:-1])).astype(int)
+        self.rect_edges = np.array(edge_count, dtype=int)
+        self.circles = np.array(circles, dtype=float).reshape(-1, 3)
+        kinds = np.array(kinds, dtype=int).reshape(-1, 2)
+        self.is_circle = kinds[:, 0] == 1
+        self.kind_index = kinds[:, 1]
+        self.index = ObstacleIndex(boxes)
+
+    def collision_free(self, starts, ends):
+        """
+        Tests the segments starts[i] -> ends[i] against every obstacle.
+        `starts` and `ends` are (N, 2) array-likes; returns a boolean mask of
+        length N that is True where the segment is collision free.
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        free = np.ones(len(starts), dtype=bool)
+        count('segment_checks', len(starts))
+
+        chunk = self.max_segments_per_chunk
+        for i in range(0, len(starts), chunk):
+            p, q = starts[i:i + chunk], ends[i:i + chunk]
+            segment, obstacle = self.index.query_segments(p, q)
+            if len(segment) == 0:
+                continue
+            count('obstacle_candidates', len(segment))
+            circle = self.is_circle[obstacle]
+            hits = np.zeros(len(segment), dtype=bool)
+            if np.any(~circle):
+                hits[~circle] = self._hits_rectangles(p, q, segment[~circle], self.kind_index[obstacle[~circle]])
+            if np.any(circle):
+                hits[circle] = self._hits_circles(p, q, segment[circle], self.kind_index[obstacle[circle]])
+            free[i + segment[hits]] = False
+        return free
+
+    def obstacles_near(self, x, y, margin):
+        """The obstacles whose bounding box lies within `margin` of point (x, y)."""
+        return self.obstacles_in_box(x - margin, y - margin, x + margin, y + margin)
+
+    def obstacles_in_box(self, min_x, min_y, max_x, max_y):
+        """The obstacles whose bounding box intersects the given box."""
+        _, candidates = self.index.query_boxes([[min_x, min_y]], [[max_x, max_y]])
+        return [self.obstacles[i] for i in sorted(candidates.tolist())]
+
+    def points_inside_rectangles(self, points):
+        """
+        Ray-casting test of every point against every rectangle.
+        Returns an (N, rectangles) boolean matrix.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        point, rect = np.divmod(np.arange(len(points) * len(self.rect_edges)), max(len(self.rect_edges), 1))
+        inside = np.zeros((len(points), len(self.rect_edges)), dtype=bool)
+        inside[point, rect] = self._points_inside(points[point], rect)
+        return inside
+
+    def _expand_edges(self, rect):
+        """For pairs with rectangles `rect`: the pair and the edge index of each of their edges."""
+        edges = self.rect_edges[rect]
+        pair = np.repeat(np.arange(len(rect)), edges)
+        k = np.arange(pair.size) - np.repeat(np.cumsum(edges) - edges, edges)
+        return pair, self.rect_offsets[rect][pair] + k, np.cumsum(edges) - edges
+
+    def _points_inside(self, points, rect):
+        """Ray-casting test of points[i] against rectangle rect[i]."""
+        if len(rect) == 0:
+            return np.zeros(0, dtype=bool)
+        pair, edge, first = self._expand_edges(rect)
+        x, y = points[pair, 0], points[pair, 1]
+        ax, ay = self.edge_p[edge, 0], self.edge_p[edge, 1]
+        bx, by = self.edge_q[edge, 0], self.edge_q[edge, 1]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_inters = (y - ay) * (bx - ax) / (by - ay) + ax
+        crossing = ((y > np.minimum(ay, by)) & (y <= np.maximum(ay, by)) &
+                    (x <= np.maximum(ax, bx)) & ((ax == bx) | (x <= x_inters)))
+        return np.add.reduceat(crossing.astype(np.int32), first) % 2 == 1
+
+    def _hits_rectangles(self, starts, ends, segment, rect):
+        """Whether segment starts[segment[i]] -> ends[segment[i]] hits rectangle rect[i]."""
+        p, q = starts[segment], ends[segment]
+        pair, edge, first = self._expand_edges(rect)
+        p1x, p1y = p[pair, 0], p[pair, 1]
+        q1x, q1y = q[pair, 0], q[pair, 1]
+        p2x, p2y = self.edge_p[edge, 0], self.edge_p[edge, 1]
+        q2x, q2y = self.edge_q[edge, 0], self.edge_q[edge, 1]
+
+        def orientation(px, py, qx, qy, rx, ry):
+            return np.sign((qy - py) * (rx - qx) - (qx - px) * (ry - qy))
+
+        def on_segment(px, py, qx, qy, rx, ry):
+            return ((qx <= np.maximum(px, rx)) & (qx >= np.minimum(px, rx)) &
+                    (qy <= np.maximum(py, ry)) & (qy >= np.minimum(py, ry)))
+
+        o1 = orientation(p1x, p1y, q1x, q1y, p2x, p2y)
+        o2 = orientation(p1x, p1y, q1x, q1y, q2x, q2y)
+        o3 = orientation(p2x, p2y, q2x, q2y, p1x, p1y)
+        o4 = orientation(p2x, p2y, q2x, q2y, q1x, q1y)
+
+        crosses = (o1 != o2) & (o3 != o4)
+        crosses |= (o1 == 0) & on_segment(p1x, p1y, p2x, p2y, q1x, q1y)
+        crosses |= (o2 == 0) & on_segment(p1x, p1y, q2x, q2y, q1x, q1y)
+        crosses |= (o3 == 0) & on_segment(p2x, p2y, p1x, p1y, q2x, q2y)
+        crosses |= (o4 == 0) & on_segment(p2x, p2y, q1x, q1y, q2x, q2y)
+        edge_hit = np.logical_or.reduceat(crosses, first)
+
+        p_inside = self._points_inside(p, rect)
+        q_inside = self._points_inside(q, rect)
+
+        is_point = np.all(p == q, axis=1)
+        return np.where(is_point, p_inside, edge_hit | (p_inside & q_inside))
+
+    def _hits_circles(self, starts, ends, segment, circle):
+        """Whether segment starts[segment[i]] -> ends[segment[i]] hits circle circle[i]."""
+        p, q = starts[segment], ends[segment]
+        center_x, center_y, radius = self.circles[circle, 0], self.circles[circle, 1], self.circles[circle, 2]
+        fx = p[:, 0] - center_x
+        fy = p[:, 1] - center_y
+        gx = q[:, 0] - center_x
+        gy = q[:, 1] - center_y
+        r2 = radius * radius
+
+        hits = (fx**2 + fy**2 <= r2) | (gx**2 + gy**2 <= r2)
+
+        # Intersection of the segment's supporting line with the circle
+        dx = q[:, 0] - p[:, 0]
+        dy = q[:, 1] - p[:, 1]
+        a = dx*dx + dy*dy
+        b = 2 * (fx*dx + fy*dy)
+        c = fx*fx + fy*fy - r2
+        discriminant = b*b - 4*a*c
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            root = np.sqrt(np.where(discriminant >= 0, discriminant, 0))
+            t1 = (-b - root) / (2*a)
+            t2 = (-b + root) / (2*a)
+        crosses = (discriminant >= 0) & (a != 0) & (((0 <= t1) & (t1 <= 1)) | ((0 <= t2) & (t2 <= 1)))
+        return hits | crosses
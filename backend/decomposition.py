@@ -1,133 +1,364 @@
 # Reference : https://blog.csdn.net/u013859301/article/details/83747866, Dechao Meng
 # for code https://www.programmersought.com/article/3950114934/
 import numpy as np
-import dill
-import matplotlib.image as mpimg
+
+from astar_modified import check_deadline
+
+# Pixels per band of columns read by decompose_in_bands
+MAX_BAND_PIXELS = 1 << 22
 
 class Cell:
-    """Represents a single cell in the decomposed map."""
-    def __init__(self):
-        self.min_x, self.max_x = None, None
-        self.left, self.right = list(), list()
-        self.ceiling, self.floor = dict(), dict()
-        self.center = (None, None)
-
-def Boustrophedon_Cellular_Decomposition(test_case):
-    """
-    Decomposes a binary map image into convex cells using the Boustrophedon algorithm.
-    Saves the decomposition result to a file using dill.
-    """
-    def calculate_connectivity(slice):
-        connectivity = 0
-        connective_parts = []
-        start_point = -1
-        for i in range(len(slice)):
-            if slice[i] == 0 and start_point != -1:
-                connectivity += 1
-                connective_parts.append((start_point, i))
-                start_point = -1
-            elif slice[i] == 1 and start_point == -1:
-                start_point = i
-        if start_point != -1:
-            connectivity += 1
-            connective_parts.append((start_point, len(slice)))
-        return connectivity, connective_parts
-
-    def get_adjacency_matrix(left_parts, right_parts) -> np.ndarray:
-        adjacency_matrix = np.zeros([len(left_parts), len(right_parts)], dtype=bool)
-        for i, left_part in enumerate(left_parts):
-            for j, right_part in enumerate(right_parts):
-                if min(left_part[1], right_part[1]) - max(left_part[0], right_part[0]) > 0:
-                    adjacency_matrix[i, j] = True
-        return adjacency_matrix
-
-    def create_cells(decomposed, total_cells_number):
-        cells = [None]  # No cell with id 0
-        for cell_id in range(1, total_cells_number + 1):
-            cell = Cell()
-            ys, xs = np.where(decomposed == cell_id)
-            if len(xs) == 0 or len(ys) == 0:
-                continue
-                
-            cell.min_x, cell.max_x = np.min(xs), np.max(xs)
-            
-            for y, x in zip(ys, xs):
-                # update left
-                if x == cell.min_x:
-                    cell.left.append(y)
-                # update right
-                if x == cell.max_x:
-                    cell.right.append(y)
-                # update ceiling
-                if (x not in cell.ceiling) or (y > cell.ceiling.get(x, -1)):
-                    cell.ceiling[x] = y
-                # update floor
-                if (x not in cell.floor) or (y < cell.floor.get(x, H+1)):
-                    cell.floor[x] = y
-            
-            x_center = int((cell.min_x + cell.max_x) / 2)
-            if x_center in cell.ceiling and x_center in cell.floor:
-                y_center = int((cell.ceiling[x_center] + cell.floor[x_center]) / 2)
-                cell.center = (x_center, y_center)
-            else: # Fallback for thin cells
-                cell.center = (np.mean(xs), np.mean(ys))
-
-            cells.append(cell)
+    """
+    Represents a single cell in the decomposed map.
+    floor[i] and ceiling[i] are the lowest and highest rows of the cell in
+    column min_x + i (-1 in columns the cell does not reach).
+    """
+    __slots__ = ('min_x', 'max_x', 'floor', 'ceiling', 'center')
+
+    def __init__(self, min_x, max_x, floor, ceiling, center):
+        self.min_x, self.max_x = min_x, max_x
+        self.floor, self.ceiling = floor, ceiling
+        self.center = center
+
+    @property
+    def left(self):
+        """Rows of the cell on its leftmost column."""
+        return np.arange(self.floor[0], self.ceiling[0] + 1)
+
+    @property
+    def right(self):
+        """Rows of the cell on its rightmost column."""
+        return np.arange(self.floor[-1], self.ceiling[-1] + 1)
+
+def label_dtype(total_cells_number):
+    """Smallest unsigned integer type holding the cell ids 0 to total_cells_number."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if total_cells_number <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+def create_cells(decomposed, total_cells_number):
+    """
+    Builds the list of cells, indexed by cell id (None for ids without pixels),
+    from a labelled image in a single pass: the image is run-length encoded
+    along its columns and the runs are reduced per (cell, column).
+    """
+    labels_by_column = decomposed.T
+    W, H = labels_by_column.shape
+    if W == 0 or H == 0:
+        return [None] * (total_cells_number + 1)
+
+    # Runs of equal labels along every column, in column then row order
+    change = np.ones(labels_by_column.shape, dtype=bool)
+    change[:, 1:] = labels_by_column[:, 1:] != labels_by_column[:, :-1]
+    run_columns, run_starts = np.nonzero(change)
+    run_labels = labels_by_column[run_columns, run_starts]
+    next_start = np.append(run_columns[1:] * H + run_starts[1:], W * H)
+    run_ends = next_start - run_columns * H
+
+    keep = (run_labels > 0) & (run_labels <= total_cells_number)
+    return cells_from_runs(run_columns[keep], run_starts[keep], run_ends[keep], run_labels[keep],
+                           total_cells_number, W)
+
+def cells_from_runs(run_columns, run_starts, run_ends, run_labels, total_cells_number, W):
+    """
+    Builds the list of cells from the labelled runs of an image of width W:
+    run k covers rows run_starts[k] to run_ends[k] (exclusive) of column
+    run_columns[k] and belongs to cell run_labels[k] (all ids > 0).
+    """
+    cells = [None] * (total_cells_number + 1)  # No cell with id 0
+    run_labels = run_labels.astype(np.int64)
+    order = np.lexsort((run_columns, run_labels))
+    run_columns, run_starts = run_columns[order], run_starts[order]
+    run_ends, run_labels = run_ends[order], run_labels[order]
+    if len(run_labels) == 0:
         return cells
 
-    image = mpimg.imread(test_case + "/map.jpg")
-    if len(image.shape) > 2:
-        image = image[:, :, 0]
-    H, W = image.shape
-    binary_image = (image > 127)
-
-    last_connectivity = 0
-    last_connectivity_parts = []
-    last_cells = []
-    total_cells_number = 0
-    decomposed = np.zeros(binary_image.shape, dtype=int)
-
-    for x in range(binary_image.shape[1]):
-        current_slice = binary_image[:, x]
-        connectivity, connective_parts = calculate_connectivity(current_slice)
-
-        if last_connectivity == 0:
-            current_cells = []
-            for _ in range(connectivity):
-                total_cells_number += 1
-                current_cells.append(total_cells_number)
-        elif connectivity == 0:
-            current_cells = []
-        else:
-            adjacency_matrix = get_adjacency_matrix(last_connectivity_parts, connective_parts)
-            current_cells = [0] * len(connective_parts)
-
-            for i in range(last_connectivity):
-                adj_sum = np.sum(adjacency_matrix[i, :])
-                if adj_sum == 1:
-                    j = np.where(adjacency_matrix[i, :])[0][0]
-                    current_cells[j] = last_cells[i]
-                elif adj_sum > 1:
-                    for j in np.where(adjacency_matrix[i, :])[0]:
-                        total_cells_number += 1
-                        current_cells[j] = total_cells_number
-            
-            for j in range(connectivity):
-                adj_sum = np.sum(adjacency_matrix[:, j])
-                if adj_sum > 1:
-                    total_cells_number += 1
-                    current_cells[j] = total_cells_number
-                elif adj_sum == 0:
-                    total_cells_number += 1
-                    current_cells[j] = total_cells_number
-
-        for cell, slice_part in zip(current_cells, connective_parts):
-            decomposed[slice_part[0]: slice_part[1], x] = cell
-
-        last_connectivity = connectivity
-        last_connectivity_parts = connective_parts
-        last_cells = current_cells
-
-    cells = create_cells(decomposed, total_cells_number)
-    with open(test_case + "/decomposed_result", "wb") as myfile:
-        dill.dump([decomposed, total_cells_number, cells], myfile)
+    # Grouped reductions per (cell, column)
+    group_key = run_labels * W + run_columns
+    group_first = np.flatnonzero(np.diff(group_key, prepend=-1))
+    group_labels = run_labels[group_first]
+    group_columns = run_columns[group_first]
+    group_floor = np.minimum.reduceat(run_starts, group_first)
+    group_ceiling = np.maximum.reduceat(run_ends - 1, group_first)
+    run_lengths = run_ends - run_starts
+    group_pixels = np.add.reduceat(run_lengths, group_first)
+    group_row_sum = np.add.reduceat(run_lengths * (run_starts + run_ends - 1) / 2, group_first)
+
+    cell_first = np.flatnonzero(np.diff(group_labels, prepend=-1))
+    cell_last = np.append(cell_first[1:], len(group_labels))
+    for first, last in zip(cell_first, cell_last):
+        columns = group_columns[first:last]
+        min_x, max_x = columns[0], columns[-1]
+        floor = np.full(max_x - min_x + 1, -1, dtype=group_floor.dtype)
+        ceiling = np.full(max_x - min_x + 1, -1, dtype=group_ceiling.dtype)
+        floor[columns - min_x] = group_floor[first:last]
+        ceiling[columns - min_x] = group_ceiling[first:last]
+
+        x_center = int((min_x + max_x) / 2)
+        if ceiling[x_center - min_x] >= 0:
+            y_center = int((ceiling[x_center - min_x] + floor[x_center - min_x]) / 2)
+            center = (x_center, y_center)
+        else: # Fallback for thin cells
+            pixels = np.sum(group_pixels[first:last])
+            center = (np.sum(columns * group_pixels[first:last]) / pixels,
+                      np.sum(group_row_sum[first:last]) / pixels)
+
+        cells[group_labels[first]] = Cell(min_x, max_x, floor, ceiling, center)
+    return cells
+
+def calculate_segments(binary_image):
+    """
+    Run-length encodes the free space of every column at once.
+    Returns the column, first row and end row (exclusive) of each free
+    segment, ordered by column then row.
+    """
+    H, W = binary_image.shape
+    padded = np.zeros((W, H + 2), dtype=np.int8)
+    padded[:, 1:-1] = binary_image.T
+    edges = np.diff(padded, axis=1)
+    columns, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return columns, starts, ends
+
+def match_segments(columns, starts, ends, H):
+    """
+    For every segment, finds the range [lo, hi) of the segments in the previous
+    column that share at least one row with it. Segments of a column are
+    disjoint and sorted, so the overlapping ones are contiguous and both
+    bounds come from a merge-style search on the sorted segment keys.
+    """
+    stride = H + 1
+    start_keys = columns * stride + starts
+    end_keys = columns * stride + ends
+    previous = (columns - 1) * stride
+    lo = np.searchsorted(end_keys, previous + starts, side='right')
+    hi = np.searchsorted(start_keys, previous + ends, side='left')
+    return lo, np.maximum(hi, lo)
+
+def sweep_labels(columns, starts, ends, H, W):
+    """
+    Boustrophedon sweep over the free segments of an H x W image (see
+    calculate_segments). Returns the cell id of every segment and the number
+    of cells.
+
+    The sweep is vectorized over all columns, but cell ids are numbered as in
+    the column-by-column sweep: for each column, a segment of the previous
+    column that splits into several segments first takes one new id per
+    segment, then every segment that starts a cell or merges several
+    segments takes a new id, and every other segment continues the cell of
+    its single neighbour on the left.
+    """
+    count = len(columns)
+    if count == 0:
+        return np.zeros(0, dtype=int), 0
+    index = np.arange(count)
+
+    # Neighbours of each segment in the previous (left) and next (right) column
+    lo, hi = match_segments(columns, starts, ends, H)
+    left_degree = hi - lo
+    coverage = np.zeros(count + 1, dtype=int)
+    np.add.at(coverage, lo, 1)
+    np.add.at(coverage, hi, -1)
+    right_degree = np.cumsum(coverage)[:-1]
+
+    # Ids consumed per column, in sweep order: new cells of column x, then the
+    # splits of column x (which the sweep assigns while visiting column x + 1)
+    new_count = (left_degree != 1).astype(int)
+    split_count = np.where(right_degree > 1, right_degree, 0)
+
+    def exclusive_cumsum_in_column(values):
+        total = np.cumsum(values) - values
+        return total - total[np.searchsorted(columns, columns, side='left')]
+
+    column_new = np.bincount(columns, weights=new_count, minlength=W).astype(int)
+    column_split = np.bincount(columns, weights=split_count, minlength=W).astype(int)
+    column_base = np.cumsum(column_new + column_split) - (column_new + column_split)
+    total_cells_number = int(np.sum(column_new + column_split))
+
+    new_ids = column_base[columns] + exclusive_cumsum_in_column(new_count) + 1
+    split_base = column_base[columns] + column_new[columns] + exclusive_cumsum_in_column(split_count)
+    first_right = np.searchsorted(hi, index, side='right')
+
+    labels = new_ids.copy()
+    parent = index.copy()
+    continues = left_degree == 1
+    left = lo[continues]
+    splits = right_degree[left] > 1
+    labels[index[continues][splits]] = split_base[left[splits]] + index[continues][splits] - first_right[left[splits]] + 1
+    parent[index[continues][~splits]] = left[~splits]
+
+    # Resolve chains of continued cells by pointer jumping
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            break
+        parent = grandparent
+    return labels[parent], total_cells_number
+
+def decompose_in_bands(read_band, shape, max_band_pixels=MAX_BAND_PIXELS, save_path=None, deadline=None,
+                       out=None):
+    """
+    Boustrophedon decomposition of a free-space image of `shape` (H, W) that
+    is read in bands of columns: read_band(x_start, x_end) returns the
+    (H, x_end - x_start) free space (True/nonzero = free) of those columns.
+
+    Bands hold at most max_band_pixels pixels. Only the free segments of the
+    image are kept across bands and the sweep runs on them (see
+    sweep_labels). The label image is then written band by band into `out`,
+    an array of `shape` whose integer type holds the cell ids (a np.memmap
+    keeps it on disk), or into a new in-memory array of the smallest
+    unsigned type that does (see label_dtype). Apart from the label image,
+    the memory used is bounded by the band size and the number of segments.
+    The deadline is checked between bands.
+
+    Returns decomposed, total_cells_number, cells like
+    Boustrophedon_Cellular_Decomposition.
+    """
+    H, W = shape
+    band = max(1, max_band_pixels // max(H, 1))
+    segments = [(np.zeros(0, dtype=np.int64),) * 3]
+    for x_start in range(0, W, band):
+        check_deadline(deadline)
+        columns, starts, ends = calculate_segments(np.asarray(read_band(x_start, min(x_start + band, W)), dtype=bool))
+        segments.append((columns + x_start, starts, ends))
+    columns, starts, ends = (np.concatenate(parts) for parts in zip(*segments))
+
+    check_deadline(deadline)
+    labels, total_cells_number = sweep_labels(columns, starts, ends, H, W)
+    if out is None:
+        decomposed = np.empty((H, W), dtype=label_dtype(total_cells_number))
+    elif out.shape != (H, W) or np.iinfo(out.dtype).max < total_cells_number:
+        raise ValueError(f"The output must be a {H}x{W} integer array holding {total_cells_number} cell ids")
+    else:
+        decomposed = out
+    lengths = ends - starts
+    for x_start in range(0, W, band):
+        check_deadline(deadline)
+        first, last = np.searchsorted(columns, [x_start, x_start + band])
+        band_lengths = lengths[first:last]
+        # Row of every free pixel of the band, segment by segment
+        offsets = np.arange(band_lengths.sum()) - np.repeat(np.cumsum(band_lengths) - band_lengths, band_lengths)
+        rows = np.repeat(starts[first:last], band_lengths) + offsets
+        band_labels = decomposed[:, x_start:x_start + band]
+        band_labels[...] = 0
+        band_labels[rows, np.repeat(columns[first:last] - x_start, band_lengths)] = np.repeat(labels[first:last],
+                                                                                             band_lengths)
+
+    cells = cells_from_runs(columns, starts, ends, labels, total_cells_number, W)
+    if save_path is not None:
+        save_decomposition(save_path, decomposed, total_cells_number)
+    return decomposed, total_cells_number, cells
+
+def Boustrophedon_Cellular_Decomposition(binary_image, save_path=None, max_band_pixels=MAX_BAND_PIXELS,
+                                         deadline=None, out=None):
+    """
+    Decomposes a binary map image (True/nonzero = free space) into convex cells
+    using the Boustrophedon algorithm (see sweep_labels), swept in bands of
+    columns (see decompose_in_bands, also for `out`).
+    Returns decomposed, total_cells_number, cells. The result is only written
+    to disk when save_path is given (see save_decomposition).
+    """
+    binary_image = np.asarray(binary_image, dtype=bool)
+    return decompose_in_bands(lambda x_start, x_end: binary_image[:, x_start:x_end], binary_image.shape,
+                              max_band_pixels, save_path, deadline, out)
+
+def update_decomposition(decomposed, total_cells_number, cells, binary_image, deadline=None, out=None):
+    """
+    Updates a decomposition for a changed map image (same shape, True/nonzero
+    = free space) instead of decomposing it again.
+
+    Only the cells that reach the columns where the free space changed are
+    re-swept, together with the newly freed pixels; they are replaced by
+    cells with new ids above total_cells_number. Every other cell keeps its
+    id and its Cell object, so anything keyed by those ids stays valid.
+    Cell centers are in image coordinates, like the cells of
+    Boustrophedon_Cellular_Decomposition.
+
+    The labels are written into `out`, which may be `decomposed` itself
+    (updated in place when nothing else reads it) or another array of its
+    shape, as long as its type holds the new ids; by default they are
+    written into a copy of `decomposed`, with wider labels if the new ids
+    need them.
+
+    Returns decomposed, total_cells_number, cells, replaced_ids. The ids of
+    replaced cells own no pixels any more (None in cells). The re-sweep
+    stops at the deadline like decompose_in_bands.
+    """
+    binary_image = np.asarray(binary_image, dtype=bool)
+    changed_columns = np.flatnonzero(np.any((decomposed > 0) != binary_image, axis=0))
+    if len(changed_columns) == 0:
+        return decomposed, total_cells_number, cells, []
+    x_start, x_end = int(changed_columns[0]), int(changed_columns[-1]) + 1
+
+    # Cells reaching the changed columns are swept again over their whole extent
+    replaced = np.unique(decomposed[:, x_start:x_end])
+    replaced = replaced[replaced > 0].tolist()
+    x_start = int(min([x_start] + [cells[i].min_x for i in replaced]))
+    x_end = int(max([x_end] + [cells[i].max_x + 1 for i in replaced]))
+
+    region = decomposed[:, x_start:x_end]
+    replaced_pixels = np.isin(region, replaced)
+    sweep = binary_image[:, x_start:x_end] & ((region == 0) | replaced_pixels)
+    region_decomposed, region_cells_number, region_cells = Boustrophedon_Cellular_Decomposition(sweep, deadline=deadline)
+
+    new_total = total_cells_number + region_cells_number
+    if out is None:
+        labels = decomposed.dtype if np.iinfo(decomposed.dtype).max >= new_total else label_dtype(new_total)
+        out = decomposed.astype(labels)
+    elif out.shape != decomposed.shape or np.iinfo(out.dtype).max < new_total:
+        raise ValueError(f"The output must be an array of the image's shape holding {new_total} cell ids")
+    elif out is not decomposed:
+        out[...] = decomposed
+    decomposed = out
+    region = decomposed[:, x_start:x_end]
+    region[replaced_pixels] = 0
+    region[sweep] = region_decomposed[sweep].astype(decomposed.dtype) + total_cells_number
+
+    cells = list(cells)
+    for i in replaced:
+        cells[i] = None
+    for cell in region_cells[1:]:
+        if cell is not None:
+            x_center, y_center = cell.center
+            cell = Cell(cell.min_x + x_start, cell.max_x + x_start, cell.floor, cell.ceiling,
+                        (x_center + x_start, y_center))
+        cells.append(cell)
+    return decomposed, total_cells_number + region_cells_number, cells, replaced
+
+def cell_adjacency(decomposed):
+    """
+    Finds the boundaries shared by cells in neighbouring columns.
+    Returns arrays (left_cells, right_cells, columns, floors, ceilings): cell
+    left_cells[k] ends at column columns[k] - 1, where right_cells[k] starts,
+    and the two share rows floors[k] to ceilings[k].
+    """
+    left, right = decomposed[:, :-1], decomposed[:, 1:]
+    rows, columns = np.nonzero((left != 0) & (right != 0) & (left != right))
+    left_cells, right_cells = left[rows, columns], right[rows, columns]
+    columns = columns + 1
+    if len(rows) == 0:
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, empty, empty, empty
+
+    order = np.lexsort((rows, columns, right_cells, left_cells))
+    rows, columns = rows[order], columns[order]
+    left_cells, right_cells = left_cells[order], right_cells[order]
+    changed = ((np.diff(left_cells) != 0) | (np.diff(right_cells) != 0) | (np.diff(columns) != 0))
+    first = np.flatnonzero(np.concatenate(([True], changed)))
+    return (left_cells[first], right_cells[first], columns[first],
+            np.minimum.reduceat(rows, first), np.maximum.reduceat(rows, first))
+
+def save_decomposition(path, decomposed, total_cells_number):
+    """
+    Writes a decomposition as a compressed .npz holding the label image and
+    the cell count. Cells are rebuilt from the labels by load_decomposition.
+    """
+    np.savez_compressed(path, decomposed=decomposed, total_cells_number=total_cells_number)
+
+def load_decomposition(path):
+    """Reads a decomposition written by save_decomposition."""
+    with np.load(path) as data:
+        decomposed = data['decomposed']
+        total_cells_number = int(data['total_cells_number'])
+    return decomposed, total_cells_number, create_cells(decomposed, total_cells_number)
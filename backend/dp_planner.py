@@ -1,20 +1,108 @@
+import json
+import math
+
 import numpy as np
 import cv2
-import dill
-import os
-from copy import deepcopy
 
-from astar_modified import AStarPlanner
-from decomposition import Boustrophedon_Cellular_Decomposition
+from cell_graph import CellGraph
+from decomposition import decompose_in_bands, update_decomposition
+from instrumentation import count, emit, stage
+from map_cache import (canonical, decomposition_cache, decomposition_hash, map_hash, map_lineage, recent_maps,
+                       roadmap_cache)
+from path_store import path_store, path_table
+from search_modes import SEARCH_PLANNERS
+
+# Maps differing from a recently decomposed map with the same boundary by at
+# most this many obstacles are decomposed incrementally from it
+MAX_INCREMENTAL_CHANGES = 4
+# Number of incremental edits followed back to find a reusable cached path
+MAX_LINEAGE_DEPTH = 8
+# Decomposition raster, in pixels per meter, unless a scale is given; it is
+# lowered by powers of two for areas whose raster would exceed MAX_RASTER_PIXELS
+DEFAULT_RASTER_SCALE = 1.0
+MAX_RASTER_PIXELS = 1 << 24
+
+def default_raster_scale(map_size):
+    """Raster scale of a map ([min_x, max_x, min_y, max_y]) without an explicit one."""
+    min_x, max_x, min_y, max_y = map_size
+    area = max(max_x - min_x, 1.0) * max(max_y - min_y, 1.0)
+    if area * DEFAULT_RASTER_SCALE ** 2 <= MAX_RASTER_PIXELS:
+        return DEFAULT_RASTER_SCALE
+    return DEFAULT_RASTER_SCALE * 2.0 ** math.floor(math.log2(math.sqrt(MAX_RASTER_PIXELS / area) / DEFAULT_RASTER_SCALE))
+
+def raster_shape(map_size, scale=1.0):
+    """(height, width) of the image of a map at `scale` pixels per meter."""
+    min_x, max_x, min_y, max_y = map_size
+    # Ensure dimensions are positive
+    return max(int((max_y - min_y) * scale), 1), max(int((max_x - min_x) * scale), 1)
+
+def rasterize_obstacles(obstacles, map_size, scale=1.0, columns=None):
+    """
+    Draws the rectangle obstacles into an image of the map ([min_x, max_x,
+    min_y, max_y]) at `scale` pixels per meter; obstacle pixels are 255,
+    free ones 0. With columns=(x_start, x_end), only that band of image
+    columns is drawn.
+    """
+    min_x, max_x, min_y, max_y = map_size
+    height, width = raster_shape(map_size, scale)
+    x_start, x_end = columns if columns is not None else (0, width)
+    map_img = np.zeros((height, x_end - x_start), np.uint8)
+
+    # Convert obstacle coordinates to image coordinates relative to the band
+    obstacles_for_cv2 = []
+    for obs in obstacles:
+        if obs['type'] == 'rectangle':
+            points = (np.array(obs['points'], dtype=float) * scale).astype(np.int32)
+            points[:, 0] -= int(min_x * scale) + x_start
+            points[:, 1] -= int(min_y * scale)
+            if points[:, 0].max() >= 0 and points[:, 0].min() < x_end - x_start:
+                obstacles_for_cv2.append(points)
+
+    if obstacles_for_cv2:
+         cv2.fillPoly(map_img, pts=obstacles_for_cv2, color=(255, 255, 255))
+    return map_img
 
 class DynamicProgrammingPlanner:
     """
     Implements a path planning strategy using Boustrophedon cellular decomposition
     and dynamic programming (memoization) to speed up repeated calculations.
+
+    With roadmap=True, the path between the start and goal cell centers is
+    searched on the cell adjacency graph (see CellGraph) instead of with a
+    grid A*; all_pairs=True additionally precomputes every cell-to-cell route
+    of the map. The decomposition raster has `raster_scale` pixels per meter
+    (see default_raster_scale when None) and is swept in bands of columns:
+    besides the label image (bounded by MAX_RASTER_PIXELS at the default
+    scale), decomposing a large area only takes memory for one band and
+    the free segments.
+    `resolution`, `levels`, `deadline` and `epsilon` are passed to every
+    grid planner, whose class is chosen by `search` (see SEARCH_PLANNERS).
+    After planning(), `expansions` and `cost_bound` sum up and bound the
+    grid searches of the request: the route through the cell centers is not
+    a shortest path itself, but each grid search in it is within
+    `cost_bound` of the shortest one between its end points.
+
+    Exact paths between cell centers are memoized per decomposition (see
+    decomposition_hash) and grid resolution, in the process-wide memory
+    table (path_table) and then in the persistent path store, so requests on
+    a known map skip their grid search.
+
+    A map that differs from a recently decomposed one by a few obstacles is
+    decomposed incrementally (see update_decomposition): cells away from the
+    edit keep their ids, and cached center-to-center paths of the previous
+    map that stay clear of the edited obstacles are reused.
     """
-    def __init__(self, start, goal, obstacles, boundary):
+    def __init__(self, start, goal, obstacles, boundary, roadmap=False, all_pairs=False,
+                 resolution=None, levels=1, deadline=None, search='astar', epsilon=0.0, raster_scale=None):
         self.start = start
         self.goal = goal
+        self.resolution = resolution
+        self.levels = levels
+        self.deadline = deadline
+        self.grid_planner = SEARCH_PLANNERS[search]
+        self.epsilon = epsilon
+        self.expansions = 0
+        self.cost_bound = None
         self.obstacles_meters = obstacles
         self.boundary_meters = boundary
         
@@ -25,78 +113,238 @@ class DynamicProgrammingPlanner:
             self.boundary_meters['bottom_left'][1],
             self.boundary_meters['top_right'][1]
         ]
-        self.decomposition_dir = 'decomposition_temp'
-        if not os.path.exists(self.decomposition_dir):
-            os.makedirs(self.decomposition_dir)
-            
+        self.raster_scale = float(raster_scale) if raster_scale else default_raster_scale(self.map_size)
+
         self.decomposed = None
         self.total_cells_number = 0
         self.cells = None
-        self.memory_table = None
+        self.decomposition_hash = None
         
-        # Perform decomposition upon initialization
-        self._perform_decomposition()
+        # Reuse the decomposition of a known map, otherwise perform it now
+        self.map_hash = map_hash(self.obstacles_meters, self.boundary_meters)
+        if self.raster_scale != 1.0:
+            # Cell ids depend on the raster, and so does everything keyed by them
+            self.map_hash += f":{self.raster_scale!r}"
+        cached = decomposition_cache.get(self.map_hash)
+        count('decomposition_cache_misses' if cached is None else 'decomposition_cache_hits')
+        if cached is None:
+            self._perform_decomposition()
+            decomposition_cache.put(self.map_hash, (self.decomposed, self.total_cells_number, self.cells,
+                                                    self.decomposition_hash))
+            recent_maps.put(self.map_hash, self._map_keys())
+        else:
+            self.decomposed, self.total_cells_number, self.cells, self.decomposition_hash = cached
 
-    def _perform_decomposition(self):
+        self.roadmap = None
+        if roadmap:
+            self.roadmap = roadmap_cache.get(self.decomposition_hash)
+            if self.roadmap is None:
+                self.roadmap = self._build_roadmap()
+            if all_pairs and self.roadmap.trees is None:
+                self.roadmap.precompute_all_pairs()
+            roadmap_cache.put(self.decomposition_hash, self.roadmap)
+
+    def _astar(self, start, goal, visibility_cache=None, epsilon=None):
+        """Creates a grid planner on this map with the configured resolution and search."""
+        return self.grid_planner(start, goal, self.obstacles_meters, self.boundary_meters, visibility_cache,
+                                 resolution=self.resolution, levels=self.levels, deadline=self.deadline,
+                                 epsilon=self.epsilon if epsilon is None else epsilon)
+
+    def _run(self, planner):
+        """Runs a grid planner, adding its expansions and cost bound to this planner's."""
+        result = planner.planning()
+        self.expansions += planner.expansions
+        if self.cost_bound is not None:
+            self.cost_bound = None if planner.cost_bound is None else max(self.cost_bound, planner.cost_bound)
+        return result
+
+    def _path_key(self, decomposition_hash):
         """
-        Creates a binary image of the map, runs the decomposition algorithm,
-        and loads the resulting cell data.
+        Key of the stored center-to-center paths of a decomposition on this
+        planner's grid. Only exact searches are stored, so coarse-to-fine
+        searches (levels > 1) are never memoized; they read the exact paths
+        of their resolution, hence the key leaves out the levels.
         """
-        min_x, max_x, min_y, max_y = self.map_size
-        width = int(max_x - min_x)
-        height = int(max_y - min_y)
+        if self.resolution is None:
+            return decomposition_hash
+        # The grid sets the paths' safety margin and density
+        return f"{decomposition_hash}:{self.resolution!r}"
 
-        # Ensure dimensions are positive
-        if width <= 0: width = 1
-        if height <= 0: height = 1
-        
-        map_img = np.zeros((height, width), np.uint8)
+    def _build_roadmap(self):
+        """
+        Builds the cell adjacency graph. Edges that cross an obstacle are
+        replaced by a grid A* path between their end points.
+        """
+        checker = self._astar(self.start, self.goal)
+
+        def plan_segment(p, q):
+            # Exact searches only, the roadmap is shared by every request on the map
+            path, _ = self._astar(p, q, epsilon=0.0).planning()
+            return path if len(path) > 1 else None
+
+        origin = (self.map_size[0], self.map_size[2])
+        return CellGraph(self.decomposed, self.cells, origin, checker.visibility_cache.query, plan_segment,
+                         self.raster_scale)
+
+    def _map_keys(self):
+        """Canonical boundary (with the raster scale) and set of canonical obstacles of the map."""
+        return canonical([self.boundary_meters, self.raster_scale]), frozenset(canonical(obs) for obs in self.obstacles_meters)
 
-        # Convert obstacle coordinates to image coordinates relative to map origin
-        obstacles_for_cv2 = []
-        for obs in self.obstacles_meters:
+    def _find_base_map(self):
+        """
+        Finds the recently decomposed map closest to this one, with the same
+        boundary and at most MAX_INCREMENTAL_CHANGES different obstacles.
+        Returns (base decomposition, changed obstacles) or None.
+        """
+        boundary, keys = self._map_keys()
+        best = None
+        for base_hash, (base_boundary, base_keys) in recent_maps.items():
+            changed = keys ^ base_keys
+            if base_boundary == boundary and len(changed) <= MAX_INCREMENTAL_CHANGES:
+                if best is None or len(changed) < len(best[1]):
+                    best = (base_hash, changed)
+        if best is None:
+            return None
+        decomposition = decomposition_cache.get(best[0])
+        if decomposition is None:
+            return None
+        return decomposition, [json.loads(key) for key in best[1]]
+
+    def _changed_ranges(self, obstacles):
+        """
+        X ranges (in meters) covered by the given obstacles, widened by one
+        grid step so that grid paths passing close to them are included.
+        """
+        min_x, max_x, min_y, max_y = self.map_size
+        margin = self.resolution or min(max_x - min_x, max_y - min_y) * 0.02
+        ranges = []
+        for obs in obstacles:
             if obs['type'] == 'rectangle':
-                points = np.array(obs['points'], dtype=np.int32)
-                points[:, 0] -= int(min_x)
-                points[:, 1] -= int(min_y)
-                obstacles_for_cv2.append(points)
+                xs = [p[0] for p in obs['points']]
+                ranges.append((min(xs) - margin, max(xs) + margin))
+            elif obs['type'] == 'circle':
+                ranges.append((obs['center'][0] - obs['radius'] - margin, obs['center'][0] + obs['radius'] + margin))
+        return ranges
 
-        if obstacles_for_cv2:
-             cv2.fillPoly(map_img, pts=obstacles_for_cv2, color=(255, 255, 255))
-        
-        # Invert image so free space is white
-        cv2.bitwise_not(map_img, map_img)
-        map_image_path = os.path.join(self.decomposition_dir, "map.jpg")
-        cv2.imwrite(map_image_path, map_img)
+    def _perform_decomposition(self):
+        """
+        Rasterizes the map and runs the decomposition algorithm on it, one
+        band of columns at a time, or updates the decomposition of a close
+        map from a full raster.
+        """
+        min_x, max_x, min_y, max_y = self.map_size
+        shape = raster_shape(self.map_size, self.raster_scale)
 
-        # Run the Boustrophedon decomposition
-        Boustrophedon_Cellular_Decomposition(self.decomposition_dir)
-        
-        # Load the decomposition results
-        result_path = os.path.join(self.decomposition_dir, "decomposed_result")
-        decomposed, total_cells_number, cells = dill.load(open(result_path, "rb"))
+        base = self._find_base_map()
+        if base is not None:
+            with stage('rasterize'):
+                map_img = rasterize_obstacles(self.obstacles_meters, self.map_size, self.raster_scale)
+            with stage('decompose'):
+                # Only re-sweep the cells around the edited obstacles; the other
+                # cells keep their ids and their (already shifted) centers
+                (base_decomposed, base_total, base_cells, base_decomposition_hash), changed = base
+                decomposed, total_cells_number, cells, replaced = update_decomposition(
+                    base_decomposed, base_total, base_cells, map_img == 0, self.deadline)
+            lineage = (base_decomposition_hash, frozenset(replaced), self._changed_ranges(changed))
+            first_new_cell = base_total + 1
+            count('incremental_decompositions')
+        else:
+            def read_band(x_start, x_end):
+                band = rasterize_obstacles(self.obstacles_meters, self.map_size, self.raster_scale, (x_start, x_end))
+                return band == 0
+
+            # Run the Boustrophedon decomposition on the free space (the
+            # bands are rasterized as the sweep reads them)
+            with stage('decompose'):
+                decomposed, total_cells_number, cells = decompose_in_bands(read_band, shape, deadline=self.deadline)
+            first_new_cell = 1
+            lineage = None
 
         # Adjust cell center coordinates from image space back to original map space
-        for i in range(1, len(cells)):
+        for i in range(first_new_cell, len(cells)):
             if cells[i] is not None:
                 x_center, y_center = cells[i].center
-                cells[i].center = (x_center + min_x, y_center + min_y)
+                cells[i].center = (x_center / self.raster_scale + min_x, y_center / self.raster_scale + min_y)
 
         self.decomposed = decomposed
         self.total_cells_number = total_cells_number
         self.cells = cells
-        # Initialize memory table for storing paths between cell centers
-        self.memory_table = [[-1] * total_cells_number for _ in range(total_cells_number)]
+        self.decomposition_hash = decomposition_hash(self.map_hash, decomposed)
+        if lineage is not None:
+            map_lineage.put(self.decomposition_hash, lineage)
+
+    def _inherited_path(self, start_cell_num, goal_cell_num):
+        """
+        Looks for the center-to-center path in the path store of the maps this
+        one was incrementally decomposed from. A path is reused (and stored
+        for this map) when both cells kept their ids and it stays clear of
+        every x range where obstacles changed on the way.
+        """
+        key, changed_ranges = self.decomposition_hash, []
+        for _ in range(MAX_LINEAGE_DEPTH):
+            lineage = map_lineage.get(key)
+            if lineage is None:
+                return None
+            key, replaced, ranges = lineage
+            if start_cell_num in replaced or goal_cell_num in replaced:
+                return None
+            changed_ranges.extend(ranges)
+
+            path = path_store.get(self._path_key(key), start_cell_num, goal_cell_num)
+            if path is not None:
+                path_min_x = min(p[0] for p in path)
+                path_max_x = max(p[0] for p in path)
+                if any(low <= path_max_x and path_min_x <= high for low, high in changed_ranges):
+                    return None
+                if len(path) > 1:
+                    path_store.put(self._path_key(self.decomposition_hash), start_cell_num, goal_cell_num, path)
+                count('inherited_paths')
+                return path
+        return None
+
+    def _stored_path(self, start_cell_num, goal_cell_num):
+        """
+        Path between two cell centers from the persistent store, from the
+        maps this one was edited from, or from a grid search. Exact paths are
+        kept in the memory table (see PathTable) for the next requests.
+        Returns the path and the visibility cache of the grid search, None
+        when there was none.
+        """
+        # The persistent store is shared by all requests and workers
+        key = self._path_key(self.decomposition_hash)
+        path = path_store.get(key, start_cell_num, goal_cell_num)
+        if path is None:
+            path = self._inherited_path(start_cell_num, goal_cell_num)
+        visibility_cache = None
+        if path is not None:
+            emit("Path between cell centers found in the path store.")
+            count('path_store_hits')
+        else:
+            emit("Path not in memory, calculating A* between cell centers...")
+            count('path_store_misses')
+            planner = self._astar(self.cells[start_cell_num].center, self.cells[goal_cell_num].center)
+            path, _ = self._run(planner)
+            visibility_cache = planner.visibility_cache
+            # The store and the table are shared with the exact searches, and
+            # only hold paths that were found
+            if planner.cost_bound != 1.0 or len(path) < 2:
+                return path, visibility_cache
+            path_store.put(key, start_cell_num, goal_cell_num, path)
+        if len(path) > 1:
+            path_table.put(key, start_cell_num, goal_cell_num, path)
+        return path, visibility_cache
 
     def planning(self):
         """
         Main planning function that orchestrates the pathfinding process.
         """
+        self.expansions, self.cost_bound = 0, 1.0
+
         # Convert start/goal coordinates to image coordinates to find their cells
-        start_img_x = int(self.start[0] - self.map_size[0])
-        start_img_y = int(self.start[1] - self.map_size[2])
-        goal_img_x = int(self.goal[0] - self.map_size[0])
-        goal_img_y = int(self.goal[1] - self.map_size[2])
+        start_img_x = int((self.start[0] - self.map_size[0]) * self.raster_scale)
+        start_img_y = int((self.start[1] - self.map_size[2]) * self.raster_scale)
+        goal_img_x = int((self.goal[0] - self.map_size[0]) * self.raster_scale)
+        goal_img_y = int((self.goal[1] - self.map_size[2]) * self.raster_scale)
 
         # Clamp coordinates to be within image bounds
         h, w = self.decomposed.shape
@@ -105,53 +353,58 @@ class DynamicProgrammingPlanner:
         goal_img_y = max(0, min(goal_img_y, h - 1))
         goal_img_x = max(0, min(goal_img_x, w - 1))
 
-        start_cell_num = self.decomposed[start_img_y, start_img_x]
-        goal_cell_num = self.decomposed[goal_img_y, goal_img_x]
+        start_cell_num = int(self.decomposed[start_img_y, start_img_x])
+        goal_cell_num = int(self.decomposed[goal_img_y, goal_img_x])
         
         # Handle cases where start or goal is inside an obstacle (cell 0)
         if start_cell_num == 0 or goal_cell_num == 0:
-            print("Start or goal point is inside an obstacle. Cannot plan path.")
+            emit("Start or goal point is inside an obstacle. Cannot plan path.")
             return [], []
-            
-        start_cell_idx = start_cell_num - 1
-        goal_cell_idx = goal_cell_num - 1
 
         # If start and goal are in the same cell, plan a direct A* path
         if start_cell_num == goal_cell_num:
-            planner = AStarPlanner(self.start, self.goal, self.obstacles_meters, self.boundary_meters)
-            return planner.planning()
-
-        start_cell_center = self.cells[start_cell_num].center
-        goal_cell_center = self.cells[goal_cell_num].center
+            planner = self._astar(self.start, self.goal)
+            return self._run(planner)
 
-        path_between_centers = []
-        # Check memory table for a pre-calculated path
-        if self.memory_table[start_cell_idx][goal_cell_idx] != -1:
-            print("Path between cell centers found in memory.")
-            path_between_centers = deepcopy(self.memory_table[start_cell_idx][goal_cell_idx])
+        # The grid planners of the request share one visibility cache, so
+        # segment checks made while pruning their paths are reused for the
+        # final pruning; the first planner built provides it
+        visibility_cache = None
+        if self.roadmap is not None:
+            path_between_centers = self.roadmap.shortest_path(start_cell_num, goal_cell_num)
+            if path_between_centers is None:
+                emit("Start and goal cells are not connected.")
+                return [], []
         else:
-            print("Path not in memory, calculating A* between cell centers...")
-            planner = AStarPlanner(start_cell_center, goal_cell_center, self.obstacles_meters, self.boundary_meters)
-            path, _ = planner.planning()
-            path_between_centers = path
-            
-            # Store the new path in the memory table for future use
-            self.memory_table[start_cell_idx][goal_cell_idx] = deepcopy(path_between_centers)
-            self.memory_table[goal_cell_idx][start_cell_idx] = deepcopy(path_between_centers[::-1])
+            # The memory table first: a read-only view of a path of this map,
+            # listed once for the response
+            path_between_centers = path_table.get(self._path_key(self.decomposition_hash), start_cell_num,
+                                                  goal_cell_num)
+            if path_between_centers is not None:
+                emit("Path between cell centers found in memory.")
+                count('memory_table_hits')
+                path_between_centers = path_between_centers.tolist()
+            else:
+                count('memory_table_misses')
+                path_between_centers, visibility_cache = self._stored_path(start_cell_num, goal_cell_num)
+                if len(path_between_centers) < 2:
+                    emit("No path between the start and goal cell centers.")
+                    return [], []
 
         # Plan path from the actual start point to the start of the center-path
-        planner_start = AStarPlanner(self.start, path_between_centers[0], self.obstacles_meters, self.boundary_meters)
-        start_segment, _ = planner_start.planning()
+        planner_start = self._astar(self.start, path_between_centers[0], visibility_cache)
+        start_segment, _ = self._run(planner_start)
         
         # Plan path from the end of the center-path to the actual goal point
-        planner_goal = AStarPlanner(path_between_centers[-1], self.goal, self.obstacles_meters, self.boundary_meters)
-        goal_segment, _ = planner_goal.planning()
+        planner_goal = self._astar(path_between_centers[-1], self.goal, planner_start.visibility_cache)
+        goal_segment, _ = self._run(planner_goal)
 
         # Combine the three path segments, avoiding duplicate points
         full_path = start_segment[:-1] + path_between_centers + goal_segment[1:]
 
-        # Perform a final pruning on the combined path to smooth it
-        temp_planner = AStarPlanner(self.start, self.goal, self.obstacles_meters, self.boundary_meters)
-        pruned_full_path = temp_planner.prune_path(full_path)
+        # Perform a final pruning on the combined path to smooth it. The start
+        # planner has the lattice (anchored at the start) and obstacles of a
+        # planner for the whole path, so no other planner is rasterized
+        pruned_full_path = planner_start.prune_path(full_path)
 
         return full_path, pruned_full_path
@@ -0,0 +1,236 @@
+# incremental_planner.py
+
+import bisect
+import heapq
+import math
+import time
+
+import numpy as np
+
+from astar_modified import AStarPlanner, PlanningTimeout
+from instrumentation import count, emit, stage
+from map_cache import canonical
+
+
+class LPAStarPlanner:
+    """
+    Lifelong Planning A* (Koenig & Likhachev) on the grid of AStarPlanner.
+
+    The first planning() call is a regular A* search. The search state (g and
+    rhs values and the priority queue) is kept afterwards, so when obstacles
+    change, update_obstacles() only rasterizes the grid windows under the
+    added and removed obstacles and touches the cells whose occupancy
+    changed, and the next planning() call only repairs the part of the
+    search those changes affect.
+
+    The g and rhs values live in float64 NumPy arrays (read through
+    memoryviews in the search loops); see nbytes() for the memory a planner
+    holds.
+
+    Start, goal, boundary and resolution are fixed for the lifetime of the
+    planner. All goal cells (the lattice points within one resolution of the
+    goal) lead to a virtual goal vertex at no cost, so the path ends at the
+    cheapest of them, followed by the goal itself as with AStarPlanner.
+    """
+    def __init__(self, start, goal, obstacles, boundary, resolution=None, deadline=None):
+        self.start = start
+        self.goal = goal
+        self.boundary = boundary
+        self.deadline = deadline
+        # A copy: update_obstacles() compares the new obstacles with these
+        self.grid_planner = AStarPlanner(start, goal, list(obstacles), boundary, resolution=resolution)
+        self.resolution = self.grid_planner.resolution
+        # Expansions of the last planning() call
+        self.expansions = 0
+
+        # Flat lattice padded with a blocked border, as in AStarPlanner.planning
+        rows, cols = self.grid_planner.occupancy_grid.shape
+        self.stride = cols + 2
+        xs = start[0] + np.arange(self.grid_planner.grid_x0 - 1, self.grid_planner.grid_x0 + cols + 1) * self.resolution
+        ys = start[1] + np.arange(self.grid_planner.grid_y0 - 1, self.grid_planner.grid_y0 + rows + 1) * self.resolution
+        self.xs, self.ys = xs.tolist(), ys.tolist()
+
+        self.start_index = (1 - self.grid_planner.grid_y0) * self.stride + (1 - self.grid_planner.grid_x0)
+        self.free_grid = np.zeros((rows + 2) * self.stride, dtype=bool)
+        self.free_grid.reshape(rows + 2, self.stride)[1:-1, 1:-1] = self.grid_planner.occupancy_grid
+        self.free_grid[self.start_index] = True  # The start itself is never checked
+        self.free = memoryview(self.free_grid)
+
+        # The virtual goal vertex comes after the lattice
+        self.size = self.free_grid.size
+        self.goal_index = self.size
+        self.goal_cells = self._goal_cells()
+
+        self.offsets = [(dx + dy * self.stride, cost * self.resolution) for dx, dy, cost in self.grid_planner.motion]
+        self.g = np.full(self.size + 1, math.inf)
+        self.rhs = np.full(self.size + 1, math.inf)
+        self._g, self._rhs = memoryview(self.g), memoryview(self.rhs)
+        # Entries are (k1, k2, vertex). An entry is outdated, and skipped when
+        # popped, once its vertex is consistent or has another key.
+        self.open_heap = []
+
+        self._rhs[self.start_index] = 0.0
+        self._queue(self.start_index)
+
+    def _goal_cells(self):
+        """Flat indices of the lattice points within one resolution of the goal."""
+        goal_x, goal_y = self.goal
+        columns = range(bisect.bisect_left(self.xs, goal_x - self.resolution),
+                        bisect.bisect_right(self.xs, goal_x + self.resolution))
+        rows = range(bisect.bisect_left(self.ys, goal_y - self.resolution),
+                     bisect.bisect_right(self.ys, goal_y + self.resolution))
+        return {
+            row * self.stride + column
+            for row in rows for column in columns
+            if math.hypot(self.xs[column] - goal_x, self.ys[row] - goal_y) <= self.resolution
+        }
+
+    def _heuristic(self, u):
+        """Distance to the goal region, consistent with the zero-cost goal edges."""
+        if u == self.goal_index:
+            return 0.0
+        distance = math.hypot(self.xs[u % self.stride] - self.goal[0], self.ys[u // self.stride] - self.goal[1])
+        return max(distance - self.resolution, 0.0)
+
+    def nbytes(self):
+        """Approximate memory held by the planner (search state and grids)."""
+        return (self.g.nbytes + self.rhs.nbytes + self.free_grid.nbytes
+                + self.grid_planner.occupancy_grid.nbytes + 100 * len(self.open_heap))
+
+    def _successors(self, u):
+        """(vertex, edge cost) pairs leaving u, ignoring occupancy."""
+        if u == self.goal_index:
+            return []
+        successors = [(u + offset, cost) for offset, cost in self.offsets]
+        if u in self.goal_cells:
+            successors.append((self.goal_index, 0.0))
+        return successors
+
+    def _best_predecessor(self, u):
+        """Returns the predecessor of u on its cheapest path and the cost of that path."""
+        g, free = self._g, self.free
+        best, best_cost = -1, math.inf
+        if u == self.goal_index:
+            for s in self.goal_cells:
+                if free[s] and g[s] < best_cost:
+                    best, best_cost = s, g[s]
+        elif free[u]:
+            for offset, cost in self.offsets:
+                s = u - offset
+                if free[s] and g[s] + cost < best_cost:
+                    best, best_cost = s, g[s] + cost
+        return best, best_cost
+
+    def _queue(self, u):
+        """
+        Queues u, under the key (k2 + heuristic, k2) with k2 = min(g, rhs), if
+        it is inconsistent; entries of consistent vertices are outdated.
+        """
+        g, rhs = self._g[u], self._rhs[u]
+        if g != rhs:
+            k2 = min(g, rhs)
+            heapq.heappush(self.open_heap, (k2 + self._heuristic(u), k2, u))
+
+    def _update_vertex(self, u):
+        if u != self.start_index:
+            self._rhs[u] = self._best_predecessor(u)[1]
+        self._queue(u)
+
+    def compute_shortest_path(self):
+        g, rhs, free = self._g, self._rhs, self.free
+        goal = self.goal_index
+        self.expansions = 0
+        while self.open_heap:
+            k1, k2, u = self.open_heap[0]
+            # k1 is k2 plus the heuristic of u, so comparing k2 is enough
+            if g[u] == rhs[u] or k2 != min(g[u], rhs[u]):
+                heapq.heappop(self.open_heap)
+                continue  # outdated entry
+            # Strictly past the goal's key (the goal's heuristic is 0): a goal
+            # cell reaches the goal at no cost, so an underconsistent one can
+            # share the goal's key
+            if rhs[goal] == g[goal] and (k1, k2) > (g[goal], g[goal]):
+                break
+
+            if self.deadline is not None and self.expansions % 1024 == 0 and time.monotonic() > self.deadline:
+                raise PlanningTimeout("Path planning exceeded its time budget")
+
+            heapq.heappop(self.open_heap)
+            self.expansions += 1
+
+            if g[u] > rhs[u]:
+                # Overconsistent: settle u and offer it to its successors
+                g[u] = rhs[u]
+                for s, cost in self._successors(u):
+                    if s != self.start_index and (s == goal or free[s]) and g[u] + cost < rhs[s]:
+                        rhs[s] = g[u] + cost
+                        self._queue(s)
+            else:
+                # Underconsistent: u got more expensive, so the vertices whose
+                # best path went through it look for another one
+                g_old = g[u]
+                g[u] = math.inf
+                for s, cost in self._successors(u) + [(u, None)]:
+                    if s != self.start_index and (s == u or rhs[s] == g_old + cost):
+                        rhs[s] = self._best_predecessor(s)[1]
+                        self._queue(s)
+
+    def update_obstacles(self, obstacles, changed_obstacles=None):
+        """
+        Replaces the obstacles and updates the vertices around every grid
+        cell whose occupancy changed; only the grid windows under the added
+        and removed obstacles (`changed_obstacles`, found by comparing the
+        obstacle lists when not given) are rasterized. Returns the number of
+        changed cells.
+        """
+        if changed_obstacles is None:
+            previous = {canonical(obs): obs for obs in self.grid_planner.obstacles}
+            current = {canonical(obs): obs for obs in obstacles}
+            changed_obstacles = [previous.get(key) or current[key] for key in previous.keys() ^ current.keys()]
+        windows = self.grid_planner.replace_obstacles(list(obstacles), changed_obstacles)
+
+        free_2d = self.free_grid.reshape(-1, self.stride)
+        changed = []
+        for y0, y1, x0, x1 in windows:
+            occupancy = self.grid_planner.occupancy_grid[y0:y1, x0:x1]
+            rows, columns = np.nonzero(free_2d[y0 + 1:y1 + 1, x0 + 1:x1 + 1] != occupancy)
+            changed.extend(((rows + y0 + 1) * self.stride + columns + x0 + 1).tolist())
+            free_2d[y0 + 1:y1 + 1, x0 + 1:x1 + 1] = occupancy
+        self.free_grid[self.start_index] = True
+        changed = set(changed) - {self.start_index}
+
+        affected = set()
+        for v in changed:
+            affected.add(v)
+            affected.update(s for s, _ in self._successors(v))
+        for u in affected:
+            self._update_vertex(u)
+        return len(changed)
+
+    def planning(self):
+        """Returns [path, pruned_path] like AStarPlanner.planning."""
+        with stage('search'):
+            self.compute_shortest_path()
+        count('nodes_expanded', self.expansions)
+
+        path = [[self.goal[0], self.goal[1]]]
+        if self._rhs[self.goal_index] == math.inf:
+            emit("Open set is empty..")
+            return [path, path]
+
+        # A broken chain of predecessors (or a cycle) means the repair left an
+        # inconsistent state behind; report no path rather than loop forever
+        u = self._best_predecessor(self.goal_index)[0]
+        steps = 0
+        while u != self.start_index:
+            if u == -1 or steps > self.size:
+                emit("Open set is empty..")
+                return [path[:1], path[:1]]
+            path.append([self.xs[u % self.stride], self.ys[u // self.stride]])
+            u = self._best_predecessor(u)[0]
+            steps += 1
+        path.append([self.xs[u % self.stride], self.ys[u // self.stride]])
+        path = path[::-1]
+        emit("Goal is reached!")
+
+        return [path, self.grid_planner.prune_path(path)]
@@ -0,0 +1,154 @@
+# instrumentation.py
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+
+# Stats of the request being handled in this thread (or task), if any
+_current_stats = ContextVar('planning_stats', default=None)
+
+# Receives planner events (goal reached, cache hits, ...) when set
+_event_hook = None
+
+
+def set_event_hook(hook):
+    """Sets the function called with every planner event message (None to disable)."""
+    global _event_hook
+    _event_hook = hook
+
+
+def emit(message):
+    """Reports a planner event. Does nothing unless an event hook is set."""
+    if _event_hook is not None:
+        _event_hook(message)
+
+
+class PlanningStats:
+    """
+    Instrumentation of one request: wall time per stage (seconds, summed
+    over repeated stages) and event counters.
+    """
+    def __init__(self):
+        self.stages = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    def add_time(self, name, seconds):
+        self.stages[name] += seconds
+
+    def add(self, name, value=1):
+        self.counters[name] += value
+
+    def merge(self, stats):
+        """Adds the stages and counters of another PlanningStats or of its as_dict()."""
+        if isinstance(stats, PlanningStats):
+            stats = stats.as_dict()
+        for name, ms in stats.get('stages_ms', {}).items():
+            self.stages[name] += ms / 1000.0
+        for name, value in stats.get('counters', {}).items():
+            self.counters[name] += value
+
+    def as_dict(self):
+        return {
+            'stages_ms': {name: seconds * 1000.0 for name, seconds in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+    def server_timing(self):
+        """The stages as a Server-Timing header value."""
+        return ', '.join(f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in self.stages.items())
+
+
+def current_stats():
+    """The PlanningStats being collected, or None outside of collect()."""
+    return _current_stats.get()
+
+
+@contextmanager
+def collect():
+    """Collects the stages and counters recorded inside the block into a new PlanningStats."""
+    stats = PlanningStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Times the block as a stage of the current stats, if any."""
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_time(name, time.perf_counter() - started)
+
+
+def count(name, value=1):
+    """Adds to a counter of the current stats, if any."""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(name, value)
+
+
+class RequestMetrics:
+    """
+    Thread-safe aggregate of the instrumented requests, per endpoint: request
+    and status counts, counter totals, and stage latency percentiles over
+    the last `window` requests.
+    """
+    def __init__(self, window=1024):
+        self.window = window
+        self.endpoints = dict()
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, status, stats):
+        with self.lock:
+            entry = self.endpoints.get(endpoint)
+            if entry is None:
+                entry = self.endpoints[endpoint] = {
+                    'requests': 0,
+                    'status': defaultdict(int),
+                    'stages': defaultdict(lambda: deque(maxlen=self.window)),
+                    'counters': defaultdict(int),
+                }
+            entry['requests'] += 1
+            entry['status'][str(status)] += 1
+            for name, seconds in stats.stages.items():
+                entry['stages'][name].append(seconds * 1000.0)
+            for name, value in stats.counters.items():
+                entry['counters'][name] += value
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = {}
+            for endpoint, entry in self.endpoints.items():
+                stages = {}
+                for name, samples in entry['stages'].items():
+                    samples = np.array(samples)
+                    stages[name] = {
+                        'samples': len(samples),
+                        'mean_ms': float(np.mean(samples)),
+                        'p50_ms': float(np.percentile(samples, 50)),
+                        'p90_ms': float(np.percentile(samples, 90)),
+                        'p99_ms': float(np.percentile(samples, 99)),
+                    }
+                snapshot[endpoint] = {
+                    'requests': entry['requests'],
+                    'status': dict(entry['status']),
+                    'stages': stages,
+                    'counters': dict(entry['counters']),
+                }
+            return snapshot
+
+
+# Process-wide aggregate served by /metrics
+request_metrics = RequestMetrics()
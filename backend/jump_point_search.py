@@ -0,0 +1,203 @@
+# jump_point_search.py
+
+import heapq
+import math
+import time
+
+import numpy as np
+
+from astar_modified import AStarPlanner, PlanningTimeout
+
+SQRT2 = math.sqrt(2)
+
+
+def _steps_to_events(events, axis, forward):
+    """
+    For every cell, the number of steps along `axis` (towards higher indices
+    if `forward`) to the first event cell strictly beyond it. The grid border
+    is blocked, hence an event, so every ray ends inside the grid.
+    """
+    length = events.shape[axis]
+    position = np.arange(length).reshape((-1, 1) if axis == 0 else (1, -1))
+    if forward:
+        marked = np.where(events, position, length)
+        nearest = np.flip(np.minimum.accumulate(np.flip(marked, axis), axis=axis), axis)
+        following = np.roll(nearest, -1, axis=axis)  # first event after the cell
+        return (following - position).astype(np.int32)
+    marked = np.where(events, position, -1)
+    nearest = np.maximum.accumulate(marked, axis=axis)
+    preceding = np.roll(nearest, 1, axis=axis)  # last event before the cell
+    return (position - preceding).astype(np.int32)
+
+
+def jump_tables(free, stride, targets):
+    """
+    Precomputes the straight jumps of the padded, flattened free grid.
+
+    A straight jump stops on the first cell that is blocked, a target or has
+    a forced neighbour for its direction; the returned dict maps each
+    straight flat offset (+1, -1, +stride, -stride) to the flat array of
+    step counts to that cell. A jump ends on a jump point when the cell it
+    stops on is free, and in a dead end otherwise.
+    """
+    grid = free.reshape(-1, stride)
+    blocked = ~grid
+    is_target = np.zeros(grid.shape, dtype=bool)
+    is_target.flat[list(targets)] = True
+    events = blocked | is_target
+
+    def shifted(array, dy, dx):
+        """array[y + dy, x + dx] at [y, x] (wrapping on the blocked border)."""
+        return np.roll(array, (-dy, -dx), axis=(0, 1))
+
+    tables = {}
+    for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        # A neighbour beside the ray is forced when the cell next to the ray is
+        # blocked but the one after it, in the direction of travel, is free
+        if dx:
+            forced = ((shifted(blocked, 1, 0) & shifted(grid, 1, dx)) |
+                      (shifted(blocked, -1, 0) & shifted(grid, -1, dx)))
+            steps = _steps_to_events(events | (grid & forced), axis=1, forward=dx > 0)
+        else:
+            forced = ((shifted(blocked, 0, 1) & shifted(grid, dy, 1)) |
+                      (shifted(blocked, 0, -1) & shifted(grid, dy, -1)))
+            steps = _steps_to_events(events | (grid & forced), axis=0, forward=dy > 0)
+        tables[dx + dy * stride] = steps.ravel()
+    return tables
+
+
+def jump_point_search(free, stride, start_index, targets, xs, ys, goal, resolution, deadline=None):
+    """
+    Jump Point Search (Harabor & Grastien, 2011) on the 8-connected lattice
+    of AStarPlanner: same moves (a diagonal step only needs its destination
+    to be free), same costs and the same goal test, so the path found has
+    the cost of the A* one while only the jump points enter the open set.
+
+    `free` is the padded, flattened free grid and `targets` the free flat
+    indices within one resolution of the goal; the search ends on the first
+    target taken from the open set. Returns (goal_index, parent, expanded,
+    pushed): parent links join jump points, which lie on straight or
+    diagonal runs of free cells (see AStarPlanner.calc_final_path), and
+    goal_index is -1 when no target is reachable.
+    """
+    size = free.size
+    targets = set(targets)
+    tables = jump_tables(free, stride, targets)
+    goal_x, goal_y = goal
+
+    g_cost = np.full(size, np.inf)
+    parent = np.full(size, -1, dtype=np.int64)
+    # 0: unvisited, 1: open, 2: closed
+    state = np.zeros(size, dtype=np.int8)
+    open_order = np.zeros(size, dtype=np.int64)
+
+    def straight(index, offset):
+        """End of the straight jump from index, -1 for a dead end."""
+        end = index + int(tables[offset][index]) * offset
+        return end if free[end] else -1
+
+    def diagonal(index, dx, dy):
+        """End of the diagonal jump from index, -1 for a dead end."""
+        offset = dx + dy * stride
+        while True:
+            index += offset
+            if not free[index]:
+                return -1
+            if index in targets:
+                return index
+            # Forced neighbours behind the move
+            if ((not free[index - dx] and free[index - dx + dy * stride]) or
+                    (not free[index - dy * stride] and free[index + dx - dy * stride])):
+                return index
+            if straight(index, dx) != -1 or straight(index, dy * stride) != -1:
+                return index
+
+    def directions(index):
+        """Directions (dx, dy) to jump in from index, pruned by how it was reached."""
+        previous = int(parent[index])
+        if previous == -1:
+            return [(1, 0), (0, 1), (-1, 0), (0, -1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+        dx = (index % stride > previous % stride) - (index % stride < previous % stride)
+        dy = (index // stride > previous // stride) - (index // stride < previous // stride)
+        if dx and dy:
+            result = [(dx, 0), (0, dy), (dx, dy)]
+            if not free[index - dx] and free[index - dx + dy * stride]:
+                result.append((-dx, dy))
+            if not free[index - dy * stride] and free[index + dx - dy * stride]:
+                result.append((dx, -dy))
+        elif dx:
+            result = [(dx, 0)]
+            for side in (1, -1):
+                if not free[index + side * stride] and free[index + dx + side * stride]:
+                    result.append((dx, side))
+        else:
+            result = [(0, dy)]
+            for side in (1, -1):
+                if not free[index + side] and free[index + side + dy * stride]:
+                    result.append((side, dy))
+        return result
+
+    g_cost[start_index] = 0.0
+    state[start_index] = 1
+    open_count, entered = 1, 1
+    open_heap = [(math.hypot(xs[start_index % stride] - goal_x, ys[start_index // stride] - goal_y), 0, start_index)]
+    goal_index = -1
+    expanded, pushed = 0, 1
+
+    while open_count:
+        if deadline is not None and expanded % 1024 == 0 and time.monotonic() > deadline:
+            raise PlanningTimeout("Path planning exceeded its time budget")
+
+        f, _, c_id = heapq.heappop(open_heap)
+        if state[c_id] != 1:
+            continue  # stale entry
+        c_cost = g_cost[c_id]
+        if f != c_cost + math.hypot(xs[c_id % stride] - goal_x, ys[c_id // stride] - goal_y):
+            continue  # stale entry, the node has been improved since
+
+        if c_id in targets:
+            goal_index = c_id
+            break
+
+        state[c_id] = 2
+        open_count -= 1
+        expanded += 1
+
+        for dx, dy in directions(c_id):
+            if dx and dy:
+                n_id = diagonal(c_id, dx, dy)
+            else:
+                n_id = straight(c_id, dx + dy * stride)
+            if n_id == -1 or state[n_id] == 2:
+                continue
+            steps = max(abs(n_id % stride - c_id % stride), abs(n_id // stride - c_id // stride))
+            n_cost = c_cost + steps * (SQRT2 if dx and dy else 1) * resolution
+            if state[n_id] == 0:
+                state[n_id] = 1
+                open_count += 1
+                open_order[n_id] = entered
+                entered += 1
+            elif g_cost[n_id] <= n_cost:
+                continue
+            g_cost[n_id] = n_cost
+            parent[n_id] = c_id
+            heapq.heappush(open_heap, (
+                n_cost + math.hypot(xs[n_id % stride] - goal_x, ys[n_id // stride] - goal_y),
+                open_order[n_id], n_id,
+            ))
+            pushed += 1
+
+    return goal_index, parent, expanded, pushed
+
+
+class JumpPointPlanner(AStarPlanner):
+    """
+    AStarPlanner searching with Jump Point Search: the same grid, boundary,
+    obstacles, goal test and prune_path post-processing, and paths of the
+    same cost, with orders of magnitude fewer expansions in open terrain.
+    The search is exact, epsilon is not used.
+    """
+    def search(self, free, stride, start_index, xs, ys):
+        self.cost_bound = 1.0
+        return jump_point_search(free, stride, start_index, self.goal_targets(free, stride, start_index, xs, ys),
+                                 xs, ys, self.goal, self.resolution, self.deadline)
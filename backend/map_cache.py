@@ -0,0 +1,167 @@
+# map_cache.py
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def canonical(value):
+    """Canonical JSON text of a value; equal obstacles give equal texts."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+
+def map_hash(obstacles, boundary):
+    """
+    Canonical hash of a map, computed on the metric boundary and obstacles
+    returned by process_request_data. Obstacle order does not matter.
+    """
+    content = {
+        'boundary': {key: list(value) for key, value in boundary.items()},
+        'obstacles': sorted(canonical(obs) for obs in obstacles),
+    }
+    return hashlib.sha256(canonical(content).encode()).hexdigest()
+
+
+def decomposition_hash(map_hash, decomposed):
+    """
+    Hash of a map's decomposition: its map hash and its cell label image.
+    Cell ids of an incrementally updated decomposition depend on the edits
+    it was derived from, so anything keyed by cell ids outside of this
+    process (the path store) is keyed by this hash instead of the map's.
+    """
+    digest = hashlib.sha256(map_hash.encode())
+    digest.update(f"{decomposed.shape}:{decomposed.dtype.str}".encode())
+    digest.update(np.ascontiguousarray(decomposed).tobytes())
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by an approximate memory budget in bytes.
+    `sizeof` estimates the size of a value; the least recently used entries
+    are evicted until the budget is respected. Keeps hit/miss counters.
+    """
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.current_bytes -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return  # Larger than the whole budget, never cached
+            self.entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def items(self):
+        """Snapshot of the (key, value) pairs, least recently used first."""
+        with self.lock:
+            return [(key, value) for key, (value, _) in self.entries.items()]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def decomposition_nbytes(decomposition):
+    """Approximate memory held by a (decomposed, total_cells_number, cells, hash) result."""
+    decomposed, _, cells, _ = decomposition
+    cell_bytes = sum(
+        cell.floor.nbytes + cell.ceiling.nbytes + 128
+        for cell in cells if cell is not None
+    )
+    return decomposed.nbytes + cell_bytes
+
+
+# Process-wide cache of decomposition results, shared by all requests.
+# The budget can be set with the DECOMPOSITION_CACHE_MB environment variable.
+decomposition_cache = LRUCache(
+    max_bytes=int(float(os.environ.get('DECOMPOSITION_CACHE_MB', 256)) * 1024 * 1024),
+    sizeof=decomposition_nbytes,
+)
+
+
+def roadmap_nbytes(graph):
+    """Approximate memory held by a CellGraph."""
+    points = sum(len(path) for path in graph.geometry.values())
+    tree_entries = sum(len(tree) for tree in graph.trees.values()) if graph.trees else 0
+    return 200 * len(graph.positions) + 64 * points + 100 * tree_entries
+
+
+# Process-wide cache of cell roadmaps, keyed by decomposition hash.
+roadmap_cache = LRUCache(
+    max_bytes=int(float(os.environ.get('ROADMAP_CACHE_MB', 64)) * 1024 * 1024),
+    sizeof=roadmap_nbytes,
+)
+
+
+def visibility_graph_nbytes(graph):
+    """Approximate memory held by a VisibilityGraph and its collision checker."""
+    arrays = [graph.nodes, graph.previous, graph.following, graph.neighbors, graph.weights, graph.offsets,
+              graph.circles, graph.node_circle, graph.node_angle, graph.circle_order, graph.circle_offsets]
+    for checker in (graph.collision_checker, graph.core_checker):
+        arrays += [checker.edge_p, checker.edge_q, checker.circles, checker.index.boxes, checker.index.items]
+    return sum(array.nbytes for array in arrays) + 400 * len(graph.collision_checker.obstacles)
+
+
+# Process-wide cache of visibility graphs, keyed by map hash and clearance.
+visibility_graph_cache = LRUCache(
+    max_bytes=int(float(os.environ.get('VISIBILITY_GRAPH_CACHE_MB', 64)) * 1024 * 1024),
+    sizeof=visibility_graph_nbytes,
+)
+
+
+# Boundary and canonical obstacles of recently decomposed maps, by map hash,
+# so that an edited map can be decomposed from a close one (see
+# DynamicProgrammingPlanner._perform_decomposition).
+recent_maps = LRUCache(
+    max_bytes=16 * 1024 * 1024,
+    sizeof=lambda entry: 200 + sum(len(key) + 60 for key in entry[1]),
+)
+
+
+# How an incrementally updated decomposition derives from the decomposition
+# of its base map, by decomposition hash: (base decomposition hash, ids of
+# the replaced cells, x ranges in meters whose content changed). Lets cached
+# center-to-center paths of the base be reused.
+map_lineage = LRUCache(
+    max_bytes=16 * 1024 * 1024,
+    sizeof=lambda entry: 200 + 32 * len(entry[1]) + 32 * len(entry[2]),
+)
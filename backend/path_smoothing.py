@@ -0,0 +1,92 @@
+# path_smoothing.py
+
+import numpy as np
+
+from instrumentation import count
+
+
+class VisibilityCache:
+    """
+    Memoizes segment visibility (collision-free) results for one obstacle set,
+    so repeated line-of-sight checks between the same points are answered
+    without calling the collision kernel again.
+    """
+    def __init__(self, collision_checker, max_entries=1 << 18):
+        self.collision_checker = collision_checker
+        self.max_entries = max_entries
+        self.visible = dict()
+
+    def query(self, starts, ends):
+        """Returns a boolean mask, True where starts[i] -> ends[i] is collision free."""
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        keys = [tuple(k) for k in np.hstack((starts, ends)).tolist()]
+
+        result = np.empty(len(keys), dtype=bool)
+        missing = []
+        for i, key in enumerate(keys):
+            visible = self.visible.get(key)
+            if visible is None:
+                missing.append(i)
+            else:
+                result[i] = visible
+
+        count('visibility_cache_hits', len(keys) - len(missing))
+        count('visibility_cache_misses', len(missing))
+        if missing:
+            missing = np.array(missing)
+            free = self.collision_checker.collision_free(starts[missing], ends[missing])
+            result[missing] = free
+            if len(self.visible) + len(missing) > self.max_entries:
+                self.visible.clear()
+            self.visible.update(zip((keys[i] for i in missing), free.tolist()))
+        return result
+
+
+def prune_path(path, visibility, is_safe_point):
+    """
+    Shortcuts a path: from each anchor, jump to the farthest later point that
+    is visible from it and such that none of the skipped points is unsafe.
+
+    Only points before the next unsafe point can be reached, so the search is
+    limited to that window. Candidates are then tested farthest-first in
+    blocks of doubling size (galloping), stopping at the first block that
+    contains a visible point. This returns the same path as testing every
+    candidate from the end, while most anchors only pay for a few batched
+    kernel calls.
+
+    `visibility` is a VisibilityCache and `is_safe_point(x, y)` tells whether
+    a path point keeps its distance from the obstacles.
+    """
+    if not path or len(path) < 3:
+        return path
+
+    points = np.asarray(path, dtype=float)
+    n = len(points)
+    safe = np.array([is_safe_point(x, y) for x, y in points.tolist()])
+    # next_unsafe[i] is the first index >= i whose point is unsafe (n if none)
+    next_unsafe = np.minimum.accumulate(np.where(safe, n, np.arange(n))[::-1])[::-1]
+
+    pruned_path = [path[0]]
+    current_index = 0
+
+    while current_index < n - 1:
+        best_next_index = current_index + 1  # Default to the next point
+
+        highest = min(n - 1, int(next_unsafe[current_index + 1]))
+        block = 4
+        while highest > current_index + 1:
+            lowest = max(current_index + 2, highest - block + 1)
+            candidates = np.arange(highest, lowest - 1, -1)
+            starts = np.broadcast_to(points[current_index], (len(candidates), 2))
+            reachable = np.flatnonzero(visibility.query(starts, points[candidates]))
+            if len(reachable):
+                best_next_index = int(candidates[reachable[0]])
+                break
+            highest = lowest - 1
+            block *= 2
+
+        pruned_path.append(path[best_next_index])
+        current_index = best_next_index
+
+    return pruned_path
@@ -0,0 +1,143 @@
+# path_store.py
+
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from map_cache import LRUCache
+
+
+class PathStore:
+    """
+    Persistent memory of paths between cell centers, keyed by
+    (decomposition hash, start cell, goal cell).
+
+    Paths live in a local SQLite database, so they are shared by every
+    request and worker process on the machine and survive restarts. A path is
+    stored once and served for both directions. The store keeps about
+    `max_entries` paths: every `evict_every` inserts of a process, the least
+    recently used ones beyond that are evicted.
+    """
+    def __init__(self, db_path, max_entries=100000, evict_every=256):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.local = threading.local()
+        self.inserts = 0
+        self.inserts_lock = threading.Lock()
+
+    def _connection(self):
+        # SQLite connections must not cross threads or forked processes
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS paths ("
+                " map_hash TEXT NOT NULL,"
+                " start_cell INTEGER NOT NULL,"
+                " goal_cell INTEGER NOT NULL,"
+                " path BLOB NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (map_hash, start_cell, goal_cell))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS paths_last_used ON paths (last_used)")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def get(self, map_hash, start_cell, goal_cell):
+        """Returns the stored path from start_cell to goal_cell, or None."""
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT start_cell, goal_cell, path FROM paths WHERE map_hash = ? AND"
+            " ((start_cell = ? AND goal_cell = ?) OR (start_cell = ? AND goal_cell = ?))",
+            (map_hash, int(start_cell), int(goal_cell), int(goal_cell), int(start_cell)),
+        ).fetchone()
+        if row is None:
+            return None
+
+        stored_start, stored_goal, blob = row
+        connection.execute(
+            "UPDATE paths SET last_used = ? WHERE map_hash = ? AND start_cell = ? AND goal_cell = ?",
+            (time.time(), map_hash, stored_start, stored_goal),
+        )
+        path = np.frombuffer(blob, dtype=np.float64).reshape(-1, 2).tolist()
+        return path if stored_start == start_cell else path[::-1]
+
+    def put(self, map_hash, start_cell, goal_cell, path):
+        connection = self._connection()
+        blob = np.asarray(path, dtype=np.float64).reshape(-1, 2).tobytes()
+        connection.execute(
+            "INSERT OR REPLACE INTO paths VALUES (?, ?, ?, ?, ?)",
+            (map_hash, int(start_cell), int(goal_cell), blob, time.time()),
+        )
+        # Counting the rows scans the whole table, so it is only done now and then
+        with self.inserts_lock:
+            self.inserts += 1
+            if self.inserts % self.evict_every:
+                return
+        overflow = connection.execute("SELECT COUNT(*) FROM paths").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            connection.execute(
+                "DELETE FROM paths WHERE rowid IN"
+                " (SELECT rowid FROM paths ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM paths")
+
+
+class PathTable:
+    """
+    In-memory table of paths between cell centers, keyed like PathStore and
+    consulted before it.
+
+    The table is sparse and symmetric: a path is held once, under the
+    (map hash, lower cell, higher cell) key, as a read-only (N, 2) float64
+    array running from the lower cell to the higher one. get() returns that
+    array, or a reversed view of it for the other direction, without copying.
+    The values are those of the search (and of PathStore), so a request
+    gets the same path from the table as from a fresh search.
+    Entries are evicted least recently used first beyond `max_bytes`.
+    """
+    def __init__(self, max_bytes):
+        self.paths = LRUCache(max_bytes, sizeof=lambda path: path.nbytes + 200)
+
+    def get(self, map_hash, start_cell, goal_cell):
+        """Returns a read-only view of the path from start_cell to goal_cell, or None."""
+        path = self.paths.get((map_hash, min(start_cell, goal_cell), max(start_cell, goal_cell)))
+        if path is None or start_cell <= goal_cell:
+            return path
+        return path[::-1]
+
+    def put(self, map_hash, start_cell, goal_cell, path):
+        path = np.array(path, dtype=np.float64).reshape(-1, 2)
+        if start_cell > goal_cell:
+            path = path[::-1].copy()
+        path.flags.writeable = False
+        self.paths.put((map_hash, min(start_cell, goal_cell), max(start_cell, goal_cell)), path)
+
+    def clear(self):
+        self.paths.clear()
+
+    def stats(self):
+        return self.paths.stats()
+
+
+# Machine-wide store, location and size configurable through the environment
+path_store = PathStore(
+    db_path=os.environ.get('PATH_STORE_PATH', 'path_store.sqlite3'),
+    max_entries=int(os.environ.get('PATH_STORE_MAX_ENTRIES', 100000)),
+)
+
+# Process-wide table in front of the store, its budget set by PATH_TABLE_MB
+path_table = PathTable(max_bytes=int(float(os.environ.get('PATH_TABLE_MB', 32)) * 1024 * 1024))
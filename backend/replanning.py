@@ -0,0 +1,139 @@
+# replanning.py
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from astar_modified import PlanningTimeout
+from incremental_planner import LPAStarPlanner
+
+
+def _canonical(obstacle):
+    return json.dumps(obstacle, sort_keys=True, separators=(',', ':'))
+
+
+class ReplanningSession:
+    """
+    Incremental planning state of one map being edited: an LPAStarPlanner
+    and the current (metric) obstacles, plus the reference point used to
+    convert the client's coordinates. The lock serializes the replans of a
+    session.
+    """
+    def __init__(self, start, goal, obstacles, boundary, ref_lat, ref_lon, resolution=None):
+        self.planner = LPAStarPlanner(start, goal, obstacles, boundary, resolution=resolution)
+        self.obstacles = list(obstacles)
+        self.ref_lat = ref_lat
+        self.ref_lon = ref_lon
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def nbytes(self):
+        """Approximate memory held by the session."""
+        return self.planner.nbytes() + 400 * len(self.obstacles)
+
+    def replan(self, added=(), removed=(), deadline=None):
+        """
+        Applies an obstacle diff and repairs the previous solution. Returns a
+        result dict like batch_planner.plan_pair, or raises ValueError when a
+        removed obstacle is not part of the map.
+        """
+        with self.lock:
+            if added or removed:
+                obstacles = list(self.obstacles)
+                keys = [_canonical(obs) for obs in obstacles]
+                for obs in removed:
+                    key = _canonical(obs)
+                    if key not in keys:
+                        raise ValueError("A removed obstacle is not part of the session's map")
+                    index = keys.index(key)
+                    del obstacles[index], keys[index]
+                obstacles.extend(added)
+                self.planner.update_obstacles(obstacles, list(added) + list(removed))
+                self.obstacles = obstacles
+
+            self.planner.deadline = deadline
+            try:
+                path, pruned_path = self.planner.planning()
+            except PlanningTimeout as e:
+                # The search state stays valid, the next replan resumes it
+                return {'status': 'timeout', 'error': str(e)}
+            except Exception as e:
+                return {'status': 'error', 'error': str(e)}
+
+        if len(path) < 2:
+            return {'status': 'no_path', 'error': 'No path found'}
+        # LPA* keeps shortest paths, expansions are those of this repair
+        return {'status': 'ok', 'path': path, 'pruned_path': pruned_path,
+                'expansions': self.planner.expansions, 'cost_bound': 1.0}
+
+
+class SessionStore:
+    """
+    Thread-safe registry of replanning sessions. Sessions unused for
+    `idle_seconds` are evicted, as are the least recently used ones while
+    the sessions hold more than `max_bytes` (see ReplanningSession.nbytes);
+    the most recently used session is always kept.
+    """
+    def __init__(self, idle_seconds, max_bytes):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.sessions = OrderedDict()
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def _evict(self, now):
+        # Measured on every eviction: the open list of a session grows as it replans
+        sizes = {session_id: session.nbytes() for session_id, session in self.sessions.items()}
+        total = sum(sizes.values())
+        while len(self.sessions) > 1:
+            session_id, session = next(iter(self.sessions.items()))
+            if total <= self.max_bytes and now - session.last_used <= self.idle_seconds:
+                break
+            del self.sessions[session_id]
+            total -= sizes[session_id]
+            self.evictions += 1
+
+    def add(self, session):
+        """Registers a session and returns its ID."""
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[session_id] = session
+            self._evict(time.monotonic())
+        return session_id
+
+    def get(self, session_id):
+        """Returns the session, or None when it is unknown or was evicted."""
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            session = self.sessions.get(session_id)
+            if session is not None:
+                session.last_used = now
+                self.sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'sessions': len(self.sessions),
+                'bytes': sum(session.nbytes() for session in self.sessions.values()),
+                'max_bytes': self.max_bytes,
+                'idle_seconds': self.idle_seconds,
+                'evictions': self.evictions,
+            }
+
+
+# Process-wide replanning sessions. The idle timeout and the memory budget
+# of the sessions can be set with REPLAN_SESSION_IDLE_SECONDS and
+# REPLAN_SESSIONS_MB.
+replanning_sessions = SessionStore(
+    idle_seconds=float(os.environ.get('REPLAN_SESSION_IDLE_SECONDS', 600)),
+    max_bytes=int(float(os.environ.get('REPLAN_SESSIONS_MB', 512)) * 1024 * 1024),
+)
@@ -0,0 +1,15 @@
+# search_modes.py
+
+from astar_modified import AStarPlanner
+from bidirectional_search import BidirectionalAStarPlanner
+from jump_point_search import JumpPointPlanner
+
+# Grid planner used for each value of the 'search' planning option. Every
+# planner takes AStarPlanner's arguments and returns [path, pruned_path];
+# 'weighted' is A* with the request's epsilon, the others are exact.
+SEARCH_PLANNERS = {
+    'astar': AStarPlanner,
+    'weighted': AStarPlanner,
+    'jps': JumpPointPlanner,
+    'bidirectional': BidirectionalAStarPlanner,
+}
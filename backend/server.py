@@ -1,21 +1,61 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from astar_modified import AStarPlanner
-from dp_planner import DynamicProgrammingPlanner
+from werkzeug.serving import make_server
+from astar_modified import PlanningTimeout
+from batch_planner import plan_batch, plan_pair
+from instrumentation import collect, current_stats, request_metrics, set_event_hook, stage
+from map_cache import decomposition_cache, roadmap_cache, visibility_graph_cache
+from path_store import path_table
+from replanning import ReplanningSession, replanning_sessions
+from search_modes import SEARCH_PLANNERS
+from worker_pool import PlanningPool, PoolOverloaded
+import functools
+import logging
+import math
 import numpy as np
 import os
-import shutil
+import signal
+import sys
+import threading
+import time
 
 app = Flask(__name__)
 CORS(app) # This will allow requests from your Flutter web app
 
+# Pool of planning worker processes, only used in production mode
+planning_pool = None
+
+# Replans run on the request thread (their sessions live in this process),
+# so they get admission slots of their own; REPLAN_MAX_CONCURRENT sets how
+# many can run at once (default: one per core)
+replan_slots = threading.BoundedSemaphore(int(os.environ.get('REPLAN_MAX_CONCURRENT', 0)) or os.cpu_count() or 1)
+
+# Response encodings of the planned paths
+PATH_ENCODINGS = ('json', 'flat', 'polyline')
+
+# Limits of the planning options: grid points of the finest search grid,
+# coarse-to-fine levels and time budget in seconds
+MAX_GRID_POINTS = 1 << 22
+MAX_LEVELS = 8
+MAX_TIME_BUDGET = 600.0
+
+class InvalidRequest(Exception):
+    """Raised for malformed planning options; answered with a 400."""
+
+@functools.lru_cache(maxsize=64)
+def projection_factors(ref_lat):
+    """Meters per degree of latitude and longitude around a reference latitude."""
+    m_per_deg_lat = 111132.954 - 559.822 * np.cos(2 * np.radians(ref_lat)) + 1.175 * np.cos(4 * np.radians(ref_lat))
+    m_per_deg_lon = 111319.488 * np.cos(np.radians(ref_lat))
+    return float(m_per_deg_lat), float(m_per_deg_lon)
+
 def latlng_to_meters(lat, lon, ref_lat, ref_lon):
     """
     Approximate conversion from LatLng to meters.
     This is a simplified projection and works well for small areas.
+    Accepts scalars or NumPy arrays.
     """
-    m_per_deg_lat = 111132.954 - 559.822 * np.cos(2 * np.radians(ref_lat)) + 1.175 * np.cos(4 * np.radians(ref_lat))
-    m_per_deg_lon = 111319.488 * np.cos(np.radians(ref_lat))
+    m_per_deg_lat, m_per_deg_lon = projection_factors(ref_lat)
     
     x = (lon - ref_lon) * m_per_deg_lon
     y = (lat - ref_lat) * m_per_deg_lat
@@ -24,22 +64,77 @@ def latlng_to_meters(lat, lon, ref_lat, ref_lon):
 def meters_to_latlng(x, y, ref_lat, ref_lon):
     """
     Approximate conversion from meters to LatLng.
+    Accepts scalars or NumPy arrays.
     """
-    m_per_deg_lat = 111132.954 - 559.822 * np.cos(2 * np.radians(ref_lat)) + 1.175 * np.cos(4 * np.radians(ref_lat))
-    m_per_deg_lon = 111319.488 * np.cos(np.radians(ref_lat))
+    m_per_deg_lat, m_per_deg_lon = projection_factors(ref_lat)
     
     lon = x / m_per_deg_lon + ref_lon
     lat = y / m_per_deg_lat + ref_lat
     return lat, lon
 
-def process_request_data(data):
-    """Helper function to process incoming JSON data and convert to meters."""
+def encode_polyline(lat, lon, precision=5):
+    """Google encoded polyline of the given latitude and longitude arrays."""
+    factor = 10 ** precision
+    values = np.empty((len(lat), 2), dtype=np.int64)
+    values[:, 0] = np.round(np.asarray(lat) * factor)
+    values[:, 1] = np.round(np.asarray(lon) * factor)
+    values[1:] -= values[:-1].copy()
+    # Zig-zag encoding of the signed deltas
+    values = np.where(values < 0, ~(values << 1), values << 1).ravel().tolist()
+
+    chunks = []
+    for value in values:
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+def encode_path(path, ref_lat, ref_lon, options):
+    """
+    Converts a metric path to LatLng in one vectorized step and encodes it as
+    requested by options['encoding']:
+    - 'json': list of {'latitude', 'longitude'} dicts (default)
+    - 'flat': flat [lat0, lon0, lat1, lon1, ...] list
+    - 'polyline': Google encoded polyline string with options['precision']
+      decimal digits (default 5)
+    """
+    points = np.asarray(path, dtype=float).reshape(-1, 2)
+    lat, lon = meters_to_latlng(points[:, 0], points[:, 1], ref_lat, ref_lon)
+    if options['encoding'] == 'polyline':
+        return encode_polyline(lat, lon, options['precision'])
+    if options['encoding'] == 'flat':
+        return np.column_stack((lat, lon)).ravel().tolist()
+    return [{'latitude': la, 'longitude': lo} for la, lo in zip(lat.tolist(), lon.tolist())]
+
+def encode_result_paths(result, ref_lat, ref_lon, options):
+    """Encodes the paths of a plan_pair result in place, dropping 'path' unless requested."""
+    if not options['include_path']:
+        result.pop('path', None)
+    for key in ('path', 'pruned_path'):
+        if key in result:
+            result[key] = encode_path(result[key], ref_lat, ref_lon, options)
+    return result
+
+def process_map_data(data):
+    """
+    Converts the boundary and obstacles of incoming JSON data to meters,
+    relative to the first boundary point.
+    Optional planner settings are returned in `options`: the grid resolution
+    in meters ('resolution', default 2% of the boundary's shorter side), the
+    number of coarse-to-fine levels ('levels', default 1), the grid search
+    ('search': 'astar', 'jps' for Jump Point Search, 'bidirectional', or
+    'weighted' for weighted A* with 'epsilon', default 0.5), the DP roadmap
+    flags ('roadmap', 'all_pairs'), the DP decomposition raster in pixels
+    per meter ('raster_scale', default 1, lowered for very large areas) and
+    a planning time limit in seconds ('time_budget'). The response format is set by 'encoding' (see
+    encode_path, with 'precision' for polylines), 'include_path' (false
+    to only return the pruned path) and 'include_stats' (true to add the
+    request's stage timings and counters as 'stats').
+    """
     ref_lat = data['boundary']['points'][0]['latitude']
     ref_lon = data['boundary']['points'][0]['longitude']
     
-    start_x, start_y = latlng_to_meters(data['start']['latitude'], data['start']['longitude'], ref_lat, ref_lon)
-    goal_x, goal_y = latlng_to_meters(data['goal']['latitude'], data['goal']['longitude'], ref_lat, ref_lon)
-    
     boundary_points_m = [latlng_to_meters(p['latitude'], p['longitude'], ref_lat, ref_lon) for p in data['boundary']['points']]
     
     min_x = min(p[0] for p in boundary_points_m)
@@ -49,77 +144,381 @@ def process_request_data(data):
     
     boundary_m = {'bottom_left': (min_x, min_y), 'top_right': (max_x, max_y)}
     
+    obstacles_m = obstacles_to_meters(data['obstacles'], ref_lat, ref_lon)
+
+    options = process_options(data)
+    check_grid_size(boundary_m, options)
+    return obstacles_m, boundary_m, ref_lat, ref_lon, options
+
+def check_grid_size(boundary, options):
+    """Rejects resolutions whose grid over the boundary would exceed MAX_GRID_POINTS."""
+    width = boundary['top_right'][0] - boundary['bottom_left'][0]
+    height = boundary['top_right'][1] - boundary['bottom_left'][1]
+    min_side = min(width, height) if min(width, height) > 0 else 100
+    # The grid planners' default resolution (see AStarPlanner)
+    resolution = options['resolution'] or min_side * 0.02
+    if (width / resolution + 1) * (height / resolution + 1) > MAX_GRID_POINTS:
+        raise InvalidRequest(f"'resolution' is too fine for the boundary (over {MAX_GRID_POINTS} grid points)")
+
+def obstacles_to_meters(obstacles, ref_lat, ref_lon):
+    """Converts JSON obstacles to meters; unknown obstacle types are skipped."""
     obstacles_m = []
-    for obs in data['obstacles']:
+    for obs in obstacles:
         if obs['type'] == 'rectangle':
             points_m = [latlng_to_meters(p['latitude'], p['longitude'], ref_lat, ref_lon) for p in obs['points']]
             obstacles_m.append({'type': 'rectangle', 'points': points_m})
         elif obs['type'] == 'circle':
             center_x, center_y = latlng_to_meters(obs['center']['latitude'], obs['center']['longitude'], ref_lat, ref_lon)
             obstacles_m.append({'type': 'circle', 'center': (center_x, center_y), 'radius': obs['radius']})
+    return obstacles_m
+
+def read_number(data, name, default=None, kind=float):
+    """Reads an optional numeric option; values that are not finite numbers answer 400."""
+    if data.get(name) is None:
+        return default
+    try:
+        value = kind(data[name])
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidRequest(f"'{name}' must be a number")
+    if not math.isfinite(value):
+        raise InvalidRequest(f"'{name}' must be a finite number")
+    return value
+
+def process_options(data):
+    """Reads the optional planner and response settings (see process_map_data)."""
+    options = {
+        'resolution': read_number(data, 'resolution'),
+        'levels': read_number(data, 'levels', 1, kind=int),
+        'search': data.get('search', 'astar'),
+        'epsilon': read_number(data, 'epsilon', 0.5) if data.get('search') == 'weighted' else 0.0,
+        'roadmap': bool(data.get('roadmap', False)),
+        'all_pairs': bool(data.get('all_pairs', False)),
+        'raster_scale': read_number(data, 'raster_scale'),
+        'time_budget': read_number(data, 'time_budget'),
+        'encoding': data.get('encoding', 'json'),
+        'precision': read_number(data, 'precision', 5, kind=int),
+        'include_path': bool(data.get('include_path', True)),
+        'include_stats': bool(data.get('include_stats', False)),
+    }
+    if options['resolution'] is not None and options['resolution'] <= 0:
+        raise InvalidRequest("'resolution' must be a positive number")
+    if not 1 <= options['levels'] <= MAX_LEVELS:
+        raise InvalidRequest(f"'levels' must be between 1 and {MAX_LEVELS}")
+    if options['time_budget'] is not None and not 0 < options['time_budget'] <= MAX_TIME_BUDGET:
+        raise InvalidRequest(f"'time_budget' must be a positive number of seconds, at most {MAX_TIME_BUDGET:g}")
+    if options['search'] not in SEARCH_PLANNERS:
+        raise InvalidRequest(f"Unknown search '{options['search']}'")
+    if 'epsilon' in data and options['search'] != 'weighted':
+        raise InvalidRequest("'epsilon' only applies to the 'weighted' search")
+    if options['epsilon'] < 0:
+        raise InvalidRequest("'epsilon' must be a non-negative number")
+    if options['raster_scale'] is not None and options['raster_scale'] <= 0:
+        raise InvalidRequest("'raster_scale' must be a positive number")
+    if options['encoding'] not in PATH_ENCODINGS:
+        raise InvalidRequest(f"Unknown encoding '{options['encoding']}'")
+    if not 0 <= options['precision'] <= 10:
+        raise InvalidRequest("'precision' must be between 0 and 10")
+    return options
+
+def process_request_data(data):
+    """Helper function to process incoming JSON data and convert to meters."""
+    with stage('parse'):
+        return _process_request_data(data)
+
+def _process_request_data(data):
+    obstacles_m, boundary_m, ref_lat, ref_lon, options = process_map_data(data)
+
+    start_x, start_y = latlng_to_meters(data['start']['latitude'], data['start']['longitude'], ref_lat, ref_lon)
+    goal_x, goal_y = latlng_to_meters(data['goal']['latitude'], data['goal']['longitude'], ref_lat, ref_lon)
             
-    return (start_x, start_y), (goal_x, goal_y), obstacles_m, boundary_m, ref_lat, ref_lon
+    return (start_x, start_y), (goal_x, goal_y), obstacles_m, boundary_m, ref_lat, ref_lon, options
 
-@app.route('/plan-path', methods=['POST'])
-def plan_path():
-    data = request.json
-    start, goal, obstacles, boundary, ref_lat, ref_lon = process_request_data(data)
-
-    # Initialize and run the A* planner
-    planner = AStarPlanner(
-        start=start,
-        goal=goal,
-        obstacles=obstacles,
-        boundary=boundary
-    )
-    
-    path, pruned_path = planner.planning()
+def run_planner(start, goal, obstacles, boundary, options, planner):
+    """
+    Plans one start/goal pair in the worker pool in production mode, or on
+    the request thread otherwise. Returns plan_pair's result dict.
+    """
+    if planning_pool is not None:
+        return planning_pool.run(plan_pair, start, goal, obstacles, boundary, options, planner,
+                                 time_budget=options['time_budget'])
+    deadline = time.monotonic() + options['time_budget'] if options['time_budget'] else None
+    return plan_pair(start, goal, obstacles, boundary, options, planner, deadline)
+
+def request_deadline(options):
+    """
+    Deadline of planning on the request thread: the 'time_budget' option,
+    limited to (or, when missing, replaced by) the pool's budget in
+    production mode. None means no deadline.
+    """
+    budget = options['time_budget']
+    if planning_pool is not None:
+        budget = min(budget, planning_pool.time_budget) if budget else planning_pool.time_budget
+    return time.monotonic() + budget if budget else None
 
-    if not path:
-        return jsonify({"error": "No path found"}), 404
+def merge_result_stats(result):
+    """Moves the stats of a plan_pair result (possibly from a worker) into the request's stats."""
+    stats = result.pop('stats', None)
+    if stats is not None and current_stats() is not None:
+        current_stats().merge(stats)
+    return result
+
+def instrumented(endpoint):
+    """
+    Collects the stages and counters of every request to `endpoint`: they
+    are sent in a Server-Timing header and aggregated for /metrics.
+    """
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        with collect() as stats:
+            started = time.perf_counter()
+            try:
+                response = app.make_response(endpoint(*args, **kwargs))
+            except Exception as e:
+                # Answered by an error handler, recorded by exception type
+                request_metrics.record(request.url_rule.rule, type(e).__name__, stats)
+                raise
+            stats.add_time('total', time.perf_counter() - started)
+        request_metrics.record(request.url_rule.rule, response.status_code, stats)
+        response.headers['Server-Timing'] = stats.server_timing()
+        return response
+    return wrapper
+
+def planning_response(result, ref_lat, ref_lon, options, error_message, extra=None):
+    """
+    Turns a plan_pair result into the JSON response of the planning endpoints.
+    The fields of `extra` are added to every response.
+    """
+    merge_result_stats(result)
+    with stage('serialize'):
+        return _planning_response(result, ref_lat, ref_lon, options, error_message, extra or {})
+
+def _planning_response(result, ref_lat, ref_lon, options, error_message, extra):
+    if options['include_stats']:
+        extra = {**extra, 'stats': current_stats().as_dict()}
+    if result['status'] == 'timeout':
+        return jsonify({"error": result['error'], **extra}), 504
+    if result['status'] == 'error':
+        app.logger.error("Error during path planning: %s", result['error'])
+        return jsonify({"error": error_message, **extra}), 500
+    if result['status'] == 'no_path':
+        return jsonify({"error": "No path found", **extra}), 404
 
     # Convert the resulting paths back to LatLng
-    path_latlng = [{'latitude': lat, 'longitude': lon} for lat, lon in [meters_to_latlng(p[0], p[1], ref_lat, ref_lon) for p in path]]
-    pruned_path_latlng = [{'latitude': lat, 'longitude': lon} for lat, lon in [meters_to_latlng(p[0], p[1], ref_lat, ref_lon) for p in pruned_path]]
+    response = encode_result_paths(
+        {'path': result['path'], 'pruned_path': result['pruned_path']}, ref_lat, ref_lon, options
+    )
+    response['encoding'] = options['encoding']
+    if 'expansions' in result:
+        response['expansions'] = result['expansions']
+        response['cost_bound'] = result['cost_bound']
+    response.update(extra)
+    return jsonify(response)
 
-    return jsonify({
-        'path': path_latlng,
-        'pruned_path': pruned_path_latlng
-    })
+@app.errorhandler(InvalidRequest)
+def handle_invalid_request(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(PoolOverloaded)
+def handle_overload(e):
+    return jsonify({"error": str(e)}), 503, {'Retry-After': '1'}
+
+@app.errorhandler(PlanningTimeout)
+def handle_timeout(e):
+    return jsonify({"error": str(e)}), 504
+
+@app.route('/plan-path', methods=['POST'])
+@instrumented
+def plan_path():
+    data = request.json
+    start, goal, obstacles, boundary, ref_lat, ref_lon, options = process_request_data(data)
+
+    # Run the A* planner
+    result = run_planner(start, goal, obstacles, boundary, options, 'astar')
+    return planning_response(result, ref_lat, ref_lon, options, "An error occurred during path planning.")
 
 @app.route('/plan-path-dp', methods=['POST'])
+@instrumented
 def plan_path_dp():
     data = request.json
-    start, goal, obstacles, boundary, ref_lat, ref_lon = process_request_data(data)
+    start, goal, obstacles, boundary, ref_lat, ref_lon, options = process_request_data(data)
+
+    # Run the Dynamic Programming planner
+    result = run_planner(start, goal, obstacles, boundary, options, 'dp')
+    return planning_response(result, ref_lat, ref_lon, options, "An error occurred during dynamic programming path planning.")
+
+@app.route('/plan-path-visibility', methods=['POST'])
+@instrumented
+def plan_path_visibility():
+    """
+    Shortest path on the visibility graph of the map (see
+    VisibilityGraphPlanner), for open maps with few obstacles. The graph is
+    cached per map; 'resolution' only sets the clearance (half of it) and
+    'path' and 'pruned_path' are the same.
+    """
+    data = request.json
+    start, goal, obstacles, boundary, ref_lat, ref_lon, options = process_request_data(data)
+
+    result = run_planner(start, goal, obstacles, boundary, options, 'visibility')
+    return planning_response(result, ref_lat, ref_lon, options, "An error occurred during visibility graph path planning.")
 
-    # Initialize and run the Dynamic Programming planner
+@app.route('/replan-path', methods=['POST'])
+@instrumented
+def replan_path():
+    """
+    Incremental replanning while obstacles are being edited.
+
+    Without a 'session_id', the body is that of /plan-path: the map is
+    planned from scratch and the response holds a new 'session_id'. With a
+    'session_id', the body only holds the obstacle diff ('added' and
+    'removed' lists, in the format of 'obstacles') and the response options;
+    the previous search is repaired instead of restarted. Start, goal,
+    boundary and resolution are fixed per session.
+
+    Sessions live in the serving process and are evicted when idle or when
+    they hold too much memory; an unknown or evicted session answers 410
+    and the client starts a new one. Replans run on the request thread,
+    at most REPLAN_MAX_CONCURRENT at once (503 beyond that).
+    """
+    data = request.json
+    session_id = data.get('session_id')
+    added, removed = [], []
+    if session_id is None:
+        start, goal, obstacles, boundary, ref_lat, ref_lon, options = process_request_data(data)
+    else:
+        session = replanning_sessions.get(session_id)
+        if session is None:
+            return jsonify({"error": "Unknown or expired session"}), 410
+        with stage('parse'):
+            options = process_options(data)
+            added = obstacles_to_meters(data.get('added', []), session.ref_lat, session.ref_lon)
+            removed = obstacles_to_meters(data.get('removed', []), session.ref_lat, session.ref_lon)
+
+    if not replan_slots.acquire(blocking=False):
+        raise PoolOverloaded("The planning server is overloaded, try again later")
     try:
-        planner = DynamicProgrammingPlanner(
-            start=start,
-            goal=goal,
-            obstacles=obstacles,
-            boundary=boundary
-        )
-        path, pruned_path = planner.planning()
-    except Exception as e:
-        print(f"Error during DP planning: {e}")
-        return jsonify({"error": "An error occurred during dynamic programming path planning."}), 500
-    # finally:
-    #     # Clean up the temporary decomposition directory
-    #     if os.path.exists('decomposition_temp'):
-    #         shutil.rmtree('decomposition_temp')
-
-    if not path:
-        return jsonify({"error": "No path found"}), 404
+        deadline = request_deadline(options)
+        if session_id is None:
+            session = ReplanningSession(start, goal, obstacles, boundary, ref_lat, ref_lon,
+                                        resolution=options['resolution'])
+            session_id = replanning_sessions.add(session)
+        result = session.replan(added, removed, deadline)
+    except ValueError as e:
+        raise InvalidRequest(str(e))
+    finally:
+        replan_slots.release()
+    return planning_response(result, session.ref_lat, session.ref_lon, options,
+                             "An error occurred during incremental path planning.",
+                             extra={'session_id': session_id})
 
-    # Convert the resulting paths back to LatLng
-    path_latlng = [{'latitude': lat, 'longitude': lon} for lat, lon in [meters_to_latlng(p[0], p[1], ref_lat, ref_lon) for p in path]]
-    pruned_path_latlng = [{'latitude': lat, 'longitude': lon} for lat, lon in [meters_to_latlng(p[0], p[1], ref_lat, ref_lon) for p in pruned_path]]
+@app.route('/replan-path/<session_id>', methods=['DELETE'])
+def close_replanning_session(session_id):
+    """Drops a replanning session before it is evicted."""
+    if not replanning_sessions.remove(session_id):
+        return jsonify({"error": "Unknown or expired session"}), 410
+    return jsonify({'session_id': session_id})
+
+@app.route('/plan-paths-batch', methods=['POST'])
+@instrumented
+def plan_paths_batch():
+    """
+    Plans many start/goal pairs on one map. The body holds the boundary and
+    obstacles once, a list of 'pairs' ({'start': ..., 'goal': ...}) and the
+    planner to use ('astar', 'dp' or 'visibility'). Each pair gets its own
+    result with a 'status' of 'ok', 'no_path', 'timeout' or 'error'. With
+    'include_stats', each result holds the stats of its pair and the
+    response those of the whole request. In production mode, a request
+    holds at most as many pairs as the worker pool admits tasks.
+    """
+    data = request.json
+    with stage('parse'):
+        obstacles, boundary, ref_lat, ref_lon, options = process_map_data(data)
+        planner = data.get('planner', 'astar')
+        if planner not in ('astar', 'dp', 'visibility'):
+            return jsonify({"error": f"Unknown planner '{planner}'"}), 400
+
+        pairs = []
+        for pair in data.get('pairs', []):
+            start = latlng_to_meters(pair['start']['latitude'], pair['start']['longitude'], ref_lat, ref_lon)
+            goal = latlng_to_meters(pair['goal']['latitude'], pair['goal']['longitude'], ref_lat, ref_lon)
+            pairs.append(((float(start[0]), float(start[1])), (float(goal[0]), float(goal[1]))))
+        # Every pair takes one of the pool's admission slots
+        if planning_pool is not None and len(pairs) > planning_pool.capacity:
+            raise InvalidRequest(f"At most {planning_pool.capacity} pairs can be planned per request")
+
+    results = plan_batch(pairs, obstacles, boundary, options, planner,
+                         pool=planning_pool, time_budget=options['time_budget'])
 
+    with stage('serialize'):
+        # Convert the resulting paths back to LatLng
+        for result in results:
+            stats = result.get('stats')
+            merge_result_stats(result)
+            if options['include_stats'] and stats is not None:
+                result['stats'] = stats
+            encode_result_paths(result, ref_lat, ref_lon, options)
+
+        response = {'results': results, 'encoding': options['encoding']}
+        if options['include_stats']:
+            response['stats'] = current_stats().as_dict()
+        return jsonify(response)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Aggregated instrumentation of the planning endpoints (request counts,
+    stage latency percentiles, counter totals) and the state of the caches.
+    Everything is per serving process; in production mode the caches
+    reported are those of the request process, the workers keep their own.
+    """
     return jsonify({
-        'path': path_latlng,
-        'pruned_path': pruned_path_latlng
+        'endpoints': request_metrics.snapshot(),
+        'caches': {
+            'decomposition': decomposition_cache.stats(),
+            'roadmap': roadmap_cache.stats(),
+            'visibility_graph': visibility_graph_cache.stats(),
+            'path_table': path_table.stats(),
+        },
+        'replanning_sessions': replanning_sessions.stats(),
+        'planning_workers': planning_pool.workers if planning_pool is not None else 0,
     })
 
+def serve_production(host='0.0.0.0', port=5000):
+    """
+    Production serving: a threaded server without the debug reloader, with
+    planning dispatched to a bounded worker pool. Configured through
+    PLANNING_WORKERS (default: one per core), PLANNING_QUEUE_SIZE (requests
+    allowed to wait for a worker, default: twice the workers) and
+    PLANNING_TIME_BUDGET (seconds per request, default 30).
+    SIGTERM or Ctrl+C stops accepting requests, lets the in-flight ones
+    finish and then shuts the pool down. The server logs at INFO level to
+    stderr.
+    """
+    global planning_pool
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    planning_pool = PlanningPool(
+        workers=int(os.environ.get('PLANNING_WORKERS', 0)) or None,
+        queue_size=int(os.environ['PLANNING_QUEUE_SIZE']) if 'PLANNING_QUEUE_SIZE' in os.environ else None,
+        time_budget=float(os.environ.get('PLANNING_TIME_BUDGET', 30)),
+    )
+    http_server = make_server(host, port, app, threaded=True)
+    http_server.daemon_threads = False  # server_close() waits for in-flight requests
+
+    def stop(signum, frame):
+        threading.Thread(target=http_server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    app.logger.info("Serving on http://%s:%d with %d planning workers", host, port, planning_pool.workers)
+    try:
+        http_server.serve_forever()
+    finally:
+        http_server.server_close()
+        planning_pool.shutdown(wait=True)
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    if '--production' in sys.argv or os.environ.get('PLANNING_MODE') == 'production':
+        serve_production()
+    else:
+        # Planner events are only printed while developing
+        set_event_hook(print)
+        app.run(debug=True)
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the tests' path store away from the server's
+os.environ['PATH_STORE_PATH'] = os.path.join(tempfile.mkdtemp(), 'test_paths.sqlite3')
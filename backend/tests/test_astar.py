@@ -0,0 +1,125 @@
+import heapq
+import math
+
+import numpy as np
+
+from astar_modified import AStarPlanner
+
+BOUNDARY = {'bottom_left': [0, 0], 'top_right': [100, 100]}
+
+
+def random_obstacles(rng, count=12):
+    obstacles = []
+    for _ in range(count):
+        x, y = rng.uniform(0, 90, size=2).tolist()
+        if rng.random() < 0.6:
+            w, h = rng.uniform(2, 25, size=2).tolist()
+            obstacles.append({'type': 'rectangle', 'points': [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]})
+        else:
+            obstacles.append({'type': 'circle', 'center': [x, y], 'radius': float(rng.uniform(1, 8))})
+    return obstacles
+
+
+def random_problems(seed, count):
+    """Random maps with a start and a goal clear of the obstacles."""
+    rng = np.random.default_rng(seed)
+    problems = []
+    while len(problems) < count:
+        obstacles = random_obstacles(rng)
+        start, goal = rng.uniform(1, 99, size=2).tolist(), rng.uniform(1, 99, size=2).tolist()
+        planner = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=float(rng.choice([1.5, 2.0, 3.1])))
+        if planner.verify_point(*start) and planner.verify_point(*goal):
+            problems.append((start, goal, obstacles, planner.resolution))
+    return problems
+
+
+def path_length(path):
+    return sum(math.dist(p, q) for p, q in zip(path[:-1], path[1:]))
+
+
+def reference_cost(planner):
+    """Dijkstra over the planner's occupancy grid, ending on the lattice points within one step of the goal."""
+    grid = planner.occupancy_grid
+    rows, cols = grid.shape
+    start = (-planner.grid_y0, -planner.grid_x0)
+    cost = {start: 0.0}
+    heap = [(0.0, start)]
+    best = math.inf
+    while heap:
+        c, (row, col) = heapq.heappop(heap)
+        if c > cost[(row, col)]:
+            continue
+        x = planner.start[0] + (col + planner.grid_x0) * planner.resolution
+        y = planner.start[1] + (row + planner.grid_y0) * planner.resolution
+        to_goal = math.hypot(x - planner.goal[0], y - planner.goal[1])
+        if to_goal <= planner.resolution:
+            best = min(best, c + to_goal)
+        for dx, dy, step in planner.motion:
+            n = (row + dy, col + dx)
+            if 0 <= n[0] < rows and 0 <= n[1] < cols and grid[n] and c + step * planner.resolution < cost.get(n, math.inf):
+                cost[n] = c + step * planner.resolution
+                heapq.heappush(heap, (cost[n], n))
+    return best
+
+
+def test_paths_are_as_short_as_dijkstra():
+    for start, goal, obstacles, resolution in random_problems(0, 12):
+        planner = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution)
+        path, _ = planner.planning()
+        expected = reference_cost(planner)
+        if math.isinf(expected):
+            assert len(path) < 2
+        else:
+            assert math.isclose(path_length(path), expected)
+
+
+def test_paths_follow_free_lattice_steps():
+    for start, goal, obstacles, resolution in random_problems(1, 12):
+        planner = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution)
+        path, _ = planner.planning()
+        assert path[0] == start and path[-1] == goal
+        lattice = path[:-1]
+        for x, y in lattice[1:]:
+            assert planner.verify_node(x, y)
+        for p, q in zip(lattice[:-1], lattice[1:]):
+            dx, dy = round((q[0] - p[0]) / resolution), round((q[1] - p[1]) / resolution)
+            assert (dx, dy) != (0, 0) and max(abs(dx), abs(dy)) == 1
+        assert math.dist(lattice[-1], goal) <= resolution
+        assert planner.expansions > 0
+
+
+def test_occupancy_grid_matches_the_point_test():
+    for start, goal, obstacles, resolution in random_problems(2, 6):
+        planner = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution)
+        rows, cols = planner.occupancy_grid.shape
+        xs, ys = planner.lattice_coordinates(cols, rows)
+        expected = [[planner.verify_point(x, y) for x in xs.tolist()] for y in ys.tolist()]
+        assert planner.occupancy_grid.tolist() == expected
+
+
+def reference_prune(planner, path):
+    """The quadratic pruning, testing every candidate from the end of the path."""
+    if len(path) < 3:
+        return path
+    pruned, current = [path[0]], 0
+    while current < len(path) - 1:
+        best = current + 1
+        for candidate in range(len(path) - 1, current, -1):
+            if (planner.collision_checker.collision_free([path[current]], [path[candidate]])[0] and
+                    all(planner.verify_node(*path[i]) for i in range(current + 1, candidate))):
+                best = candidate
+                break
+        pruned.append(path[best])
+        current = best
+    return pruned
+
+
+def test_pruning_matches_the_quadratic_pruning():
+    for start, goal, obstacles, resolution in random_problems(3, 12):
+        planner = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution)
+        path, pruned = planner.planning()
+        assert pruned == reference_prune(planner, path)
+        # Jittered paths, with points too close to the obstacles
+        rough = [[x + resolution * math.sin(7 * i), y + resolution * math.cos(5 * i)]
+                 for i, (x, y) in enumerate(path)]
+        assert planner.prune_path(rough) == reference_prune(planner, rough)
@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+import pytest
+
+from astar_modified import PlanningTimeout
+from batch_planner import plan_batch
+from benchmarks.map_generator import generate_map
+from decomposition import Boustrophedon_Cellular_Decomposition
+from server import process_map_data
+from visibility_graph import VisibilityGraph
+
+PAIRS = [((5, 5), (195, 195)), ((5, 195), (195, 5)), ((100, 5), (100, 195)), ((5, 100), (195, 100)),
+         ((20, 180), (180, 20))]
+
+
+def test_batches_in_the_worker_pool_match_serial_planning():
+    obstacles, boundary, _, _, options = process_map_data(generate_map('random', 200, 20, 0))
+    for planner in ('astar', 'dp', 'visibility'):
+        serial = plan_batch(PAIRS, obstacles, boundary, options, planner, max_workers=1)
+        parallel = plan_batch(PAIRS, obstacles, boundary, options, planner, max_workers=3)
+        assert [result['status'] for result in parallel] == [result['status'] for result in serial]
+        assert [result.get('path') for result in parallel] == [result.get('path') for result in serial]
+
+
+def test_failing_maps_report_per_pair_errors():
+    obstacles, boundary, _, _, options = process_map_data(generate_map('random', 200, 20, 0))
+    results = plan_batch(PAIRS, obstacles, boundary, dict(options, search='unknown'), 'dp', max_workers=2)
+    assert [result['status'] for result in results] == ['error'] * len(PAIRS)
+
+
+def test_shared_structures_stop_at_the_deadline():
+    obstacles, boundary, _, _, _ = process_map_data(generate_map('random', 200, 20, 1))
+    passed = time.monotonic() - 1
+    with pytest.raises(PlanningTimeout):
+        Boustrophedon_Cellular_Decomposition(np.ones((200, 200), dtype=bool), deadline=passed)
+    with pytest.raises(PlanningTimeout):
+        VisibilityGraph(obstacles, boundary, 2.0, deadline=passed)
@@ -0,0 +1,119 @@
+import math
+
+import numpy as np
+
+from collision import ObstacleIndex, SegmentCollisionChecker
+
+
+def orientation(p, q, r):
+    val = (q[1] - p[1]) * (r[0] - q[0]) - (q[0] - p[0]) * (r[1] - q[1])
+    return (val > 0) - (val < 0)
+
+
+def on_segment(p, q, r):
+    return min(p[0], r[0]) <= q[0] <= max(p[0], r[0]) and min(p[1], r[1]) <= q[1] <= max(p[1], r[1])
+
+
+def segments_intersect(p1, q1, p2, q2):
+    o1, o2 = orientation(p1, q1, p2), orientation(p1, q1, q2)
+    o3, o4 = orientation(p2, q2, p1), orientation(p2, q2, q1)
+    return ((o1 != o2 and o3 != o4) or
+            (o1 == 0 and on_segment(p1, p2, q1)) or (o2 == 0 and on_segment(p1, q2, q1)) or
+            (o3 == 0 and on_segment(p2, p1, q2)) or (o4 == 0 and on_segment(p2, q1, q2)))
+
+
+def inside_rectangle(point, rect_points):
+    x, y = point
+    inside = False
+    p1x, p1y = rect_points[0]
+    for i in range(len(rect_points) + 1):
+        p2x, p2y = rect_points[i % len(rect_points)]
+        if min(p1y, p2y) < y <= max(p1y, p2y) and x <= max(p1x, p2x):
+            if p1x == p2x or x <= (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x:
+                inside = not inside
+        p1x, p1y = p2x, p2y
+    return inside
+
+
+def scalar_collision_free(p, q, obstacles, safety_margin):
+    """The obstacle-by-obstacle test the vectorized kernel replaced."""
+    for obs in obstacles:
+        if obs['type'] == 'rectangle':
+            points = obs['points']
+            if p == q:
+                if inside_rectangle(p, points):
+                    return False
+                continue
+            if any(segments_intersect(p, q, points[i], points[(i + 1) % 4]) for i in range(4)):
+                return False
+            if inside_rectangle(p, points) and inside_rectangle(q, points):
+                return False
+        else:
+            (cx, cy), radius = obs['center'], obs['radius'] + safety_margin
+            if math.dist(p, (cx, cy)) <= radius or math.dist(q, (cx, cy)) <= radius:
+                return False
+            dx, dy, fx, fy = q[0] - p[0], q[1] - p[1], p[0] - cx, p[1] - cy
+            a, b, c = dx * dx + dy * dy, 2 * (fx * dx + fy * dy), fx * fx + fy * fy - radius * radius
+            discriminant = b * b - 4 * a * c
+            if a != 0 and discriminant >= 0:
+                root = math.sqrt(discriminant)
+                if 0 <= (-b - root) / (2 * a) <= 1 or 0 <= (-b + root) / (2 * a) <= 1:
+                    return False
+    return True
+
+
+def random_obstacles(rng, count):
+    obstacles = []
+    for _ in range(count):
+        x, y = rng.integers(0, 90, size=2).tolist()
+        if rng.random() < 0.5:
+            w, h = rng.integers(1, 15, size=2).tolist()
+            points = [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+            if rng.random() < 0.3:  # A diamond, to exercise slanted edges
+                points = [[x, y + h], [x + w, y], [x + 2 * w, y + h], [x + w, y + 2 * h]]
+            obstacles.append({'type': 'rectangle', 'points': points})
+        else:
+            obstacles.append({'type': 'circle', 'center': [x, y], 'radius': int(rng.integers(1, 8))})
+    return obstacles
+
+
+def test_vectorized_checks_match_the_scalar_check():
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        obstacles = random_obstacles(rng, 30)
+        checker = SegmentCollisionChecker(obstacles, 1.0)
+        # Integer end points, so that segments often touch edges and corners
+        starts = rng.integers(0, 100, size=(400, 2))
+        ends = np.where(rng.random((400, 1)) < 0.1, starts, rng.integers(0, 100, size=(400, 2)))
+        free = checker.collision_free(starts, ends)
+        expected = [scalar_collision_free(tuple(p), tuple(q), obstacles, 1.0)
+                    for p, q in zip(starts.tolist(), ends.tolist())]
+        assert free.tolist() == expected
+
+
+def test_index_queries_match_brute_force():
+    rng = np.random.default_rng(1)
+    low = rng.uniform(0, 1000, size=(300, 2))
+    boxes = np.hstack([low, low + rng.uniform(0, 40, size=(300, 2))])
+    index = ObstacleIndex(boxes)
+
+    query_low = rng.uniform(-50, 1000, size=(200, 2))
+    query_high = query_low + rng.uniform(0, 120, size=(200, 2))
+    query, box = index.query_boxes(query_low, query_high)
+    found = set(zip(query.tolist(), box.tolist()))
+    overlap = ((boxes[None, :, 0] <= query_high[:, None, 0]) & (boxes[None, :, 2] >= query_low[:, None, 0]) &
+               (boxes[None, :, 1] <= query_high[:, None, 1]) & (boxes[None, :, 3] >= query_low[:, None, 1]))
+    assert found == set(zip(*map(np.ndarray.tolist, np.nonzero(overlap))))
+
+    # Segment queries may return extra candidates, but never miss a box
+    # overlapping the segment's bounding box near the segment
+    starts = rng.uniform(0, 1000, size=(200, 2))
+    ends = rng.uniform(0, 1000, size=(200, 2))
+    segment, box = index.query_segments(starts, ends)
+    found = set(zip(segment.tolist(), box.tolist()))
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    for i, (p, q) in enumerate(zip(starts, ends)):
+        t = np.clip(np.dot(centers - p, q - p) / np.dot(q - p, q - p), 0, 1)
+        closest = p + t[:, None] * (q - p)
+        touching = np.all((closest >= boxes[:, :2]) & (closest <= boxes[:, 2:]), axis=1)
+        assert {(i, j) for j in np.flatnonzero(touching).tolist()} <= found
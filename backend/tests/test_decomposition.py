@@ -0,0 +1,128 @@
+import numpy as np
+
+from decomposition import Boustrophedon_Cellular_Decomposition, create_cells, update_decomposition
+
+
+def random_map(seed, shape=(120, 160), count=25):
+    rng = np.random.default_rng(seed)
+    image = np.ones(shape, dtype=bool)
+    for _ in range(count):
+        y, x = rng.integers(0, shape[0]), rng.integers(0, shape[1])
+        image[y:y + rng.integers(2, 20), x:x + rng.integers(2, 20)] = False
+    return image
+
+
+def test_labels_are_written_into_a_memory_mapped_output(tmp_path):
+    image = random_map(0)
+    decomposed, total, _ = Boustrophedon_Cellular_Decomposition(image, max_band_pixels=2000)
+    out = np.lib.format.open_memmap(tmp_path / 'labels.npy', mode='w+', dtype=np.uint32, shape=image.shape)
+    mapped, mapped_total, _ = Boustrophedon_Cellular_Decomposition(image, max_band_pixels=2000, out=out)
+    assert mapped is out and mapped_total == total
+    assert np.array_equal(mapped, decomposed)
+
+
+def test_decompositions_can_be_updated_in_place():
+    image = random_map(1)
+    decomposed, total, cells = Boustrophedon_Cellular_Decomposition(image)
+    edited = image.copy()
+    edited[40:60, 70:90] = False
+    copied = update_decomposition(decomposed, total, cells, edited)
+    labels = decomposed.astype(np.uint32)
+    in_place = update_decomposition(labels, total, cells, edited, out=labels)
+    assert in_place[0] is labels
+    assert np.array_equal(labels, copied[0])
+    assert in_place[1] == copied[1] and in_place[3] == copied[3]
+
+
+def reference_sweep(binary_image):
+    """The column-by-column sweep the vectorized decomposition replaced."""
+    def free_runs(column):
+        runs, start = [], -1
+        for i, free in enumerate(column):
+            if not free and start != -1:
+                runs.append((start, i))
+                start = -1
+            elif free and start == -1:
+                start = i
+        if start != -1:
+            runs.append((start, len(column)))
+        return runs
+
+    decomposed = np.zeros(binary_image.shape, dtype=int)
+    total = 0
+    last_runs, last_cells = [], []
+    for x in range(binary_image.shape[1]):
+        runs = free_runs(binary_image[:, x])
+        if not last_runs:
+            cells = list(range(total + 1, total + len(runs) + 1))
+            total += len(runs)
+        elif not runs:
+            cells = []
+        else:
+            adjacency = np.array([[min(a[1], b[1]) - max(a[0], b[0]) > 0 for b in runs] for a in last_runs])
+            cells = [0] * len(runs)
+            for i in range(len(last_runs)):
+                neighbours = np.flatnonzero(adjacency[i])
+                if len(neighbours) == 1:
+                    cells[neighbours[0]] = last_cells[i]
+                elif len(neighbours) > 1:
+                    for j in neighbours:
+                        total += 1
+                        cells[j] = total
+            for j in range(len(runs)):
+                if adjacency[:, j].sum() != 1:
+                    total += 1
+                    cells[j] = total
+        for cell, (start, end) in zip(cells, runs):
+            decomposed[start:end, x] = cell
+        last_runs, last_cells = runs, cells
+    return decomposed, total
+
+
+def test_labels_match_the_column_by_column_sweep():
+    for seed in range(8):
+        image = random_map(seed, count=10 + 5 * seed)
+        decomposed, total, _ = Boustrophedon_Cellular_Decomposition(image, max_band_pixels=3000)
+        expected, expected_total = reference_sweep(image)
+        assert total == expected_total
+        assert np.array_equal(decomposed, expected)
+
+
+def reference_cells(decomposed, total):
+    """Cell bounds and centers extracted one cell at a time, as before the single-pass extraction."""
+    cells = [None]
+    for cell_id in range(1, total + 1):
+        ys, xs = np.where(decomposed == cell_id)
+        if len(xs) == 0:
+            cells.append(None)
+            continue
+        floor = {x: ys[xs == x].min() for x in np.unique(xs)}
+        ceiling = {x: ys[xs == x].max() for x in np.unique(xs)}
+        min_x, max_x = xs.min(), xs.max()
+        x_center = int((min_x + max_x) / 2)
+        if x_center in ceiling:
+            center = (x_center, int((ceiling[x_center] + floor[x_center]) / 2))
+        else:
+            center = (np.mean(xs), np.mean(ys))
+        cells.append((min_x, max_x, floor, ceiling, center))
+    return cells
+
+
+def test_cells_match_the_per_cell_extraction():
+    rng = np.random.default_rng(0)
+    # Decomposed maps, and scattered labels that leave columns out of their cells
+    labellings = [Boustrophedon_Cellular_Decomposition(random_map(seed))[:2] for seed in range(4)]
+    labellings += [(rng.integers(0, 12, size=(30, 40)) * (rng.random((30, 40)) < 0.02), 14) for _ in range(4)]
+    for decomposed, total in labellings:
+        cells = create_cells(decomposed, total)
+        assert len(cells) == total + 1
+        for cell, expected in zip(cells[1:], reference_cells(decomposed, total)[1:]):
+            if expected is None:
+                assert cell is None
+                continue
+            min_x, max_x, floor, ceiling, center = expected
+            assert (cell.min_x, cell.max_x) == (min_x, max_x)
+            for x in range(min_x, max_x + 1):
+                assert cell.floor[x - min_x] == floor.get(x, -1)
+                assert cell.ceiling[x - min_x] == ceiling.get(x, -1)
+            assert np.allclose(cell.center, center)
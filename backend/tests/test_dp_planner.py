@@ -0,0 +1,142 @@
+import numpy as np
+
+import map_cache
+from collision import SegmentCollisionChecker
+from dp_planner import DynamicProgrammingPlanner
+from instrumentation import collect
+from path_store import path_store, path_table
+
+BOUNDARY = {'bottom_left': [0, 0], 'top_right': [200, 200]}
+PAIRS = [([5, 5], [195, 195]), ([5, 195], [195, 5]), ([100, 5], [100, 195]), ([5, 100], [195, 100])]
+
+
+def rectangle(x0, y0, x1, y1):
+    return {'type': 'rectangle', 'points': [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]}
+
+
+def clear_process_caches():
+    for cache in (map_cache.decomposition_cache, map_cache.roadmap_cache, map_cache.recent_maps,
+                  map_cache.map_lineage):
+        cache.clear()
+    path_table.clear()
+
+
+def test_stored_paths_join_the_centers_of_their_cells():
+    base = [rectangle(20 + 40 * i, 30 + 25 * (i % 3), 35 + 40 * i, 60 + 25 * (i % 3)) for i in range(4)]
+    edited = base + [rectangle(90, 90, 110, 150)]
+    clear_process_caches()
+    path_store.clear()
+
+    planners = []
+    # The edited map is decomposed incrementally from the base map, then
+    # from scratch as a new process would
+    for obstacles in (base, edited, None, edited):
+        if obstacles is None:
+            clear_process_caches()
+            continue
+        for start, goal in PAIRS:
+            planner = DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY)
+            planner.planning()
+            planners.append(planner)
+    assert planners[4].decomposition_hash != planners[-1].decomposition_hash
+
+    for planner in planners:
+        for start_cell in range(1, len(planner.cells)):
+            for goal_cell in range(start_cell + 1, len(planner.cells)):
+                path = path_store.get(planner.decomposition_hash, start_cell, goal_cell)
+                if path is not None:
+                    assert np.allclose(path[0], planner.cells[start_cell].center)
+                    assert np.allclose(path[-1], planner.cells[goal_cell].center)
+
+
+def test_stored_paths_are_not_shared_across_resolutions():
+    obstacles = [rectangle(100, 20, 110, 180)]
+    start, goal = [5, 100], [195, 100]
+    clear_process_caches()
+    path_store.clear()
+    fresh_path, _ = DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY).planning()
+
+    clear_process_caches()
+    path_store.clear()
+    DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY, resolution=10).planning()
+    path, _ = DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY).planning()
+    assert path == fresh_path
+
+
+def test_failed_searches_are_not_stored():
+    # The goal is walled in, so no path between cell centers reaches it
+    walls = [rectangle(140, 140, 190, 145), rectangle(140, 185, 190, 190),
+             rectangle(140, 145, 145, 185), rectangle(185, 145, 190, 185)]
+    clear_process_caches()
+    path_store.clear()
+    planner = DynamicProgrammingPlanner([5, 5], [165, 165], walls, BOUNDARY)
+    path, _ = planner.planning()
+    assert len(path) < 2
+
+    for start_cell in range(1, len(planner.cells)):
+        for goal_cell in range(start_cell + 1, len(planner.cells)):
+            assert path_store.get(planner.decomposition_hash, start_cell, goal_cell) is None
+
+
+def test_coarse_to_fine_requests_reuse_exact_stored_paths():
+    obstacles = [rectangle(100, 20, 110, 180)]
+    start, goal = [5, 100], [195, 100]
+    clear_process_caches()
+    path_store.clear()
+    DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY).planning()
+
+    clear_process_caches()
+    with collect() as stats:
+        DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY, levels=3).planning()
+    assert stats.counters['path_store_hits'] == 1
+    assert 'path_store_misses' not in stats.counters
+
+
+def test_memory_table_hits_return_the_searched_path():
+    obstacles = [rectangle(100, 20, 110, 180), rectangle(40, 60, 70, 75)]
+    clear_process_caches()
+    path_store.clear()
+    # A resolution whose lattice points do not survive a float32 round trip
+    for start, goal in PAIRS:
+        first = DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY, resolution=3.3).planning()
+        with collect() as stats:
+            second = DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY, resolution=3.3).planning()
+        assert second == first
+        assert stats.counters['memory_table_hits'] == 1
+
+
+def test_cached_decompositions_match_fresh_ones():
+    obstacles = [rectangle(20 + 40 * i, 30 + 25 * (i % 3), 35 + 40 * i, 60 + 25 * (i % 3)) for i in range(4)]
+    clear_process_caches()
+    path_store.clear()
+    fresh = DynamicProgrammingPlanner(PAIRS[0][0], PAIRS[0][1], obstacles, BOUNDARY)
+    fresh_paths = [DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY).planning() for start, goal in PAIRS]
+
+    # An equal map sent again, with its keys in another order
+    same_map = [{'points': [list(p) for p in obs['points']], 'type': obs['type']} for obs in obstacles]
+    for (start, goal), fresh_path in zip(PAIRS, fresh_paths):
+        with collect() as stats:
+            planner = DynamicProgrammingPlanner(start, goal, same_map, dict(reversed(BOUNDARY.items())))
+        assert stats.counters['decomposition_cache_hits'] == 1
+        assert planner.decomposition_hash == fresh.decomposition_hash
+        assert planner.total_cells_number == fresh.total_cells_number
+        assert np.array_equal(planner.decomposed, fresh.decomposed)
+        assert planner.planning() == fresh_path
+
+
+def test_roadmap_paths_are_collision_free_and_share_the_roadmap():
+    obstacles = [rectangle(20 + 40 * i, 30 + 25 * (i % 3), 35 + 40 * i, 60 + 25 * (i % 3)) for i in range(4)]
+    obstacles.append(rectangle(90, 140, 110, 160))
+    checker = SegmentCollisionChecker(obstacles, 0.0)
+    clear_process_caches()
+    path_store.clear()
+    roadmaps = set()
+    for all_pairs in (False, True):
+        for start, goal in PAIRS:
+            planner = DynamicProgrammingPlanner(start, goal, obstacles, BOUNDARY, roadmap=True, all_pairs=all_pairs)
+            path, pruned_path = planner.planning()
+            roadmaps.add(id(planner.roadmap))
+            assert path[0] == start and path[-1] == goal
+            for points in (path, pruned_path):
+                assert checker.collision_free(points[:-1], points[1:]).all()
+    assert len(roadmaps) == 1
@@ -0,0 +1,67 @@
+import math
+import random
+
+from incremental_planner import LPAStarPlanner
+
+BOUNDARY = {'bottom_left': [0, 0], 'top_right': [100, 100]}
+START = [5, 5]
+
+
+def rectangle(x0, y0, x1, y1):
+    return {'type': 'rectangle', 'points': [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]}
+
+
+def walls_around(goal, inner=4, thickness=2):
+    x, y = goal
+    return [
+        rectangle(x - inner - thickness, y - inner - thickness, x + inner + thickness, y - inner),
+        rectangle(x - inner - thickness, y + inner, x + inner + thickness, y + inner + thickness),
+        rectangle(x - inner - thickness, y - inner, x - inner, y + inner),
+        rectangle(x + inner, y - inner, x + inner + thickness, y + inner),
+    ]
+
+
+def goal_cost(planner):
+    return planner.rhs[planner.goal_index]
+
+
+def assert_matches_fresh(planner, start, goal, obstacles):
+    path, _ = planner.planning()
+    fresh = LPAStarPlanner(start, goal, obstacles, BOUNDARY)
+    fresh_path, _ = fresh.planning()
+    assert (len(path) < 2) == (len(fresh_path) < 2)
+    assert math.isclose(goal_cost(planner), goal_cost(fresh)) or goal_cost(planner) == goal_cost(fresh)
+
+
+def test_walling_the_goal_in_and_out():
+    goal = [80.0, 80.0]
+    obstacles = [rectangle(30, 20, 40, 70)]
+    planner = LPAStarPlanner(START, goal, obstacles, BOUNDARY)
+    assert len(planner.planning()[0]) > 1
+
+    planner.update_obstacles(obstacles + walls_around(goal))
+    path, pruned_path = planner.planning()
+    assert len(path) == 1 and len(pruned_path) == 1
+    assert goal_cost(planner) == math.inf
+
+    planner.update_obstacles(obstacles)
+    assert_matches_fresh(planner, START, goal, obstacles)
+
+
+def test_random_edits_around_the_goal_match_fresh_searches():
+    rng = random.Random(3)
+    for _ in range(8):
+        goal = [rng.uniform(60, 95), rng.uniform(60, 95)]
+        obstacles = []
+        planner = LPAStarPlanner(START, goal, obstacles, BOUNDARY)
+        planner.planning()
+        for _ in range(5):
+            if obstacles and rng.random() < 0.4:
+                changed = obstacles.pop(rng.randrange(len(obstacles)))
+            else:
+                x, y = goal[0] + rng.uniform(-4, 4), goal[1] + rng.uniform(-4, 4)
+                changed = {'type': 'circle', 'center': [x, y], 'radius': rng.uniform(1, 8)}
+                obstacles.append(changed)
+            # As replanning sessions do, with the edited obstacle given
+            planner.update_obstacles(obstacles, [changed])
+            assert_matches_fresh(planner, START, goal, obstacles)
@@ -0,0 +1,25 @@
+from path_store import PathStore
+
+
+def stored_count(store):
+    return store._connection().execute("SELECT COUNT(*) FROM paths").fetchone()[0]
+
+
+def test_paths_are_served_in_both_directions(tmp_path):
+    store = PathStore(str(tmp_path / 'paths.sqlite3'))
+    store.put('map', 1, 2, [[0.0, 0.0], [1.0, 2.0]])
+    assert store.get('map', 1, 2) == [[0.0, 0.0], [1.0, 2.0]]
+    assert store.get('map', 2, 1) == [[1.0, 2.0], [0.0, 0.0]]
+    assert store.get('map', 1, 3) is None
+
+
+def test_least_recently_used_paths_are_evicted_every_few_inserts(tmp_path):
+    store = PathStore(str(tmp_path / 'paths.sqlite3'), max_entries=10, evict_every=5)
+    for cell in range(14):
+        store.put('map', 0, cell + 1, [[0.0, 0.0], [cell, 0.0]])
+    # Over max_entries until the next check, on the 15th insert
+    assert stored_count(store) == 14
+    store.put('map', 0, 15, [[0.0, 0.0], [15.0, 0.0]])
+    assert stored_count(store) == 10
+    assert store.get('map', 0, 1) is None
+    assert store.get('map', 0, 15) is not None
@@ -0,0 +1,21 @@
+from replanning import ReplanningSession, SessionStore
+
+BOUNDARY = {'bottom_left': [0, 0], 'top_right': [100, 100]}
+
+
+def session():
+    return ReplanningSession([5, 5], [90, 90], [], BOUNDARY, 0.0, 0.0)
+
+
+def test_sessions_are_evicted_beyond_the_memory_budget():
+    size = session().nbytes()
+    store = SessionStore(idle_seconds=600, max_bytes=int(2.5 * size))
+    ids = [store.add(session()) for _ in range(4)]
+    assert [store.get(session_id) is not None for session_id in ids] == [False, False, True, True]
+    assert store.stats()['bytes'] <= store.max_bytes
+
+
+def test_the_latest_session_is_kept_even_if_over_budget():
+    store = SessionStore(idle_seconds=600, max_bytes=1)
+    first, second = store.add(session()), store.add(session())
+    assert store.get(first) is None and store.get(second) is not None
@@ -0,0 +1,35 @@
+import math
+
+from astar_modified import AStarPlanner
+from bidirectional_search import BidirectionalAStarPlanner
+from jump_point_search import JumpPointPlanner
+from test_astar import BOUNDARY, path_length, random_problems
+
+
+def test_jump_point_paths_are_as_short_as_astar():
+    for start, goal, obstacles, resolution in random_problems(10, 15):
+        path, _ = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution).planning()
+        planner = JumpPointPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution)
+        jump_path, _ = planner.planning()
+        assert math.isclose(path_length(jump_path), path_length(path))
+        for x, y in jump_path[1:-1]:
+            assert planner.verify_node(x, y)
+
+
+def test_bidirectional_paths_are_as_short_as_astar():
+    for start, goal, obstacles, resolution in random_problems(11, 15):
+        path, _ = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution).planning()
+        planner = BidirectionalAStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution)
+        both_ways, _ = planner.planning()
+        assert math.isclose(path_length(both_ways), path_length(path))
+        assert both_ways[0] == start and both_ways[-1] == goal
+
+
+def test_weighted_paths_stay_within_their_bound():
+    for start, goal, obstacles, resolution in random_problems(12, 15):
+        path, _ = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution).planning()
+        for epsilon in (0.2, 1.0):
+            planner = AStarPlanner(start, goal, obstacles, BOUNDARY, resolution=resolution, epsilon=epsilon)
+            weighted, _ = planner.planning()
+            assert 1.0 <= planner.cost_bound <= 1.0 + epsilon
+            assert path_length(weighted) <= planner.cost_bound * path_length(path) + 1e-9
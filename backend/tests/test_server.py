@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from benchmarks.map_generator import generate_map
+from server import app, encode_polyline
+
+
+@pytest.mark.parametrize('name, value', [
+    ('resolution', 'abc'), ('resolution', -1), ('resolution', 0), ('resolution', 1e-4),
+    ('levels', 'two'), ('levels', 0), ('levels', 100),
+    ('time_budget', -1), ('time_budget', 0), ('time_budget', 1e9),
+])
+def test_invalid_planning_options_answer_400(name, value):
+    data = generate_map('random', 200, 10, 0)
+    data[name] = value
+    response = app.test_client().post('/plan-path', json=data)
+    assert response.status_code == 400
+    assert name in response.get_json()['error']
+
+
+def test_replans_beyond_the_concurrency_limit_answer_503(monkeypatch):
+    import threading
+    import server
+    monkeypatch.setattr(server, 'replan_slots', threading.BoundedSemaphore(1))
+    server.replan_slots.acquire()
+    response = app.test_client().post('/replan-path', json=generate_map('random', 200, 10, 0))
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def decode_polyline(encoded, precision=5):
+    values, value, shift = [], 0, 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    points = np.cumsum(np.reshape(values, (-1, 2)), axis=0)
+    return points / 10 ** precision
+
+
+@pytest.mark.parametrize('precision', [5, 6])
+def test_polylines_round_trip(precision):
+    rng = np.random.default_rng(precision)
+    lat = np.concatenate(([89.999999, -89.999999], rng.uniform(-90, 90, 50), 45 + np.cumsum(rng.normal(0, 1e-5, 50))))
+    lon = np.concatenate(([-179.999999, 179.999999], rng.uniform(-180, 180, 50), 7 + np.cumsum(rng.normal(0, 1e-5, 50))))
+    decoded = decode_polyline(encode_polyline(lat, lon, precision), precision)
+    assert np.abs(decoded - np.column_stack((lat, lon))).max() <= 0.5 / 10 ** precision + 1e-12
+
+
+def test_polyline_responses_match_json_responses():
+    data = generate_map('random', 200, 10, 0)
+    json_response = app.test_client().post('/plan-path', json=data).get_json()
+    polyline_response = app.test_client().post(
+        '/plan-path', json={**data, 'encoding': 'polyline', 'precision': 6}).get_json()
+    assert polyline_response['encoding'] == 'polyline'
+    for key in ('path', 'pruned_path'):
+        expected = [[p['latitude'], p['longitude']] for p in json_response[key]]
+        assert np.abs(decode_polyline(polyline_response[key], 6) - expected).max() <= 0.5e-6 + 1e-12
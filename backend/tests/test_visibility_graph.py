@@ -0,0 +1,36 @@
+import math
+import random
+
+from collision import SegmentCollisionChecker
+from visibility_graph import VisibilityGraph
+
+BOUNDARY = {'bottom_left': [0, 0], 'top_right': [100, 100]}
+
+
+def length(path):
+    return sum(math.dist(p, q) for p, q in zip(path, path[1:]))
+
+
+def test_paths_around_a_circle_follow_its_tangents_and_arc():
+    graph = VisibilityGraph([{'type': 'circle', 'center': [50, 50], 'radius': 10}], BOUNDARY, 1.0)
+    path, _ = graph.shortest_path([10, 50], [90, 50])
+    radius, distance = 11.0, 40.0
+    exact = 2 * math.sqrt(distance ** 2 - radius ** 2) + radius * (math.pi - 2 * math.acos(radius / distance))
+    assert exact <= length(path) <= exact * 1.001
+
+
+def test_paths_keep_the_clearance():
+    rnd = random.Random(3)
+    obstacles = [{'type': 'circle', 'center': [rnd.uniform(10, 90), rnd.uniform(10, 90)], 'radius': rnd.uniform(2, 8)}
+                 for _ in range(6)]
+    obstacles.append({'type': 'rectangle', 'points': [[40, 10], [45, 10], [45, 60], [40, 60]]})
+    graph = VisibilityGraph(obstacles, BOUNDARY, 1.0)
+    checker = SegmentCollisionChecker(obstacles, 0.999)
+    for _ in range(20):
+        start, goal = [rnd.uniform(0, 100), rnd.uniform(0, 100)], [rnd.uniform(0, 100), rnd.uniform(0, 100)]
+        if not checker.collision_free([start, goal], [start, goal]).all():
+            continue
+        path, _ = graph.shortest_path(start, goal)
+        if path:
+            assert checker.collision_free(path[:-1], path[1:]).all()
+            assert all(0 <= x <= 100 and 0 <= y <= 100 for x, y in path)
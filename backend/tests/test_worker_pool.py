@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from worker_pool import PlanningPool, PoolOverloaded
+
+
+def wait(seconds, deadline=None):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = PlanningPool(workers=2, queue_size=2, time_budget=5)
+    yield pool
+    pool.shutdown()
+
+
+def test_batches_take_one_admission_slot_per_task(pool):
+    with pytest.raises(PoolOverloaded):
+        pool.map(wait, [(0.0,)] * (pool.capacity + 1))
+    assert pool.map(wait, [(0.0,)] * pool.capacity) == [0.0] * pool.capacity
+
+    # Every slot is back once the tasks are done
+    time.sleep(0.1)
+    for _ in range(pool.capacity):
+        assert pool.admission.acquire(blocking=False)
+    with pytest.raises(PoolOverloaded):
+        pool.run(wait, 0.0)
+    for _ in range(pool.capacity):
+        pool.admission.release()
@@ -0,0 +1,502 @@
+# visibility_graph.py
+
+import heapq
+import math
+import time
+
+import numpy as np
+
+from astar_modified import PlanningTimeout, check_deadline
+from collision import SegmentCollisionChecker
+from instrumentation import count, stage
+from map_cache import map_hash, visibility_graph_cache
+
+
+class VisibilityGraph:
+    """
+    Visibility graph of a map for paths keeping `clearance` meters from the
+    obstacles, as AStarPlanner's safety margin does: rectangles are grown
+    into their bounding box plus the clearance, circles into a circle of
+    radius + clearance.
+
+    Shortest paths around these obstacles are made of straight segments
+    between rectangle corners and points where the segments touch a grown
+    circle, and of arcs along the circles. The nodes are the corners of the
+    grown rectangles and the tangent points of the segments from the
+    corners to the circles and between circles (both outer and inner
+    bitangents); corners and circles are pushed out by a hair so that edges
+    may run along an outline without touching it. Nodes outside the boundary
+    or inside another obstacle are dropped. The edges are the free segments
+    that are tangent to the obstacle at both ends (the only segments a
+    shortest path can use) and the free arcs between neighbouring tangent
+    points of a circle, weighted by their length. Start and goal are joined
+    at query time to the corners they see and through their own tangents to
+    every circle. The tangency test and the segment tests run in batches
+    over all node pairs. The construction stops with PlanningTimeout once
+    `deadline` passes (checked between batches).
+
+    Built once per map and clearance (see VisibilityGraphPlanner), then
+    shared by every query on that map.
+    """
+
+    # Largest angle between the points drawn along an arc. They are joined by
+    # tangents to the circle, so the drawn path stays clear and is at most
+    # tan(arc_step / 2) / (arc_step / 2) - 1 (0.1%) longer than the arc
+    arc_step = math.pi / 32
+
+    # Upper bound on the number of node pairs tested for tangency at once
+    max_pairs_per_chunk = 1 << 20
+
+    def __init__(self, obstacles, boundary, clearance, deadline=None):
+        self.clearance = clearance
+        self.bottom_left = boundary['bottom_left']
+        self.top_right = boundary['top_right']
+        x_min, y_min = self.bottom_left
+        x_max, y_max = self.top_right
+        offset = 1e-6 * max(x_max - x_min, y_max - y_min, 1.0)
+
+        cores, grown, polygons, circles = [], [], [], []
+        for obs in obstacles:
+            if obs['type'] == 'rectangle':
+                xs, ys = [p[0] for p in obs['points']], [p[1] for p in obs['points']]
+                cores.append({'type': 'rectangle',
+                              'points': [(min(xs), min(ys)), (max(xs), min(ys)), (max(xs), max(ys)), (min(xs), max(ys))]})
+                low_x, low_y = min(xs) - clearance, min(ys) - clearance
+                high_x, high_y = max(xs) + clearance, max(ys) + clearance
+                grown.append({'type': 'rectangle',
+                              'points': [(low_x, low_y), (high_x, low_y), (high_x, high_y), (low_x, high_y)]})
+                polygons.append(np.array([(low_x - offset, low_y - offset), (high_x + offset, low_y - offset),
+                                          (high_x + offset, high_y + offset), (low_x - offset, high_y + offset)]))
+            elif obs['type'] == 'circle':
+                cores.append(obs)
+                grown.append(obs)  # Grown by the checker's margin
+                circles.append((obs['center'][0], obs['center'][1], obs['radius'] + clearance + offset))
+        # Segment tests against the grown obstacles, and point tests against
+        # the obstacles themselves
+        self.collision_checker = SegmentCollisionChecker(grown, clearance)
+        self.core_checker = SegmentCollisionChecker(cores, 0.0)
+        # Center x, center y and (grown) radius of every circle
+        self.circles = np.array(circles, dtype=float).reshape(-1, 3)
+
+        if polygons:
+            corners = np.concatenate(polygons)
+            # Neighbours of every corner on its own rectangle
+            previous = np.concatenate([np.roll(polygon, 1, axis=0) for polygon in polygons])
+            following = np.concatenate([np.roll(polygon, -1, axis=0) for polygon in polygons])
+        else:
+            corners = previous = following = np.zeros((0, 2))
+        keep = self.free_points(corners)
+        corners, self.previous, self.following = corners[keep], previous[keep], following[keep]
+        self.nodes = corners
+        self.corner_count = corner_count = len(corners)
+
+        # Straight edges between corners
+        first, second = self._visible_pairs(deadline)
+        weights = np.linalg.norm(corners[first] - corners[second], axis=1)
+        node_circle, node_angle = [np.full(corner_count, -1)], [np.full(corner_count, np.nan)]
+        firsts, seconds, all_weights = [first], [second], [weights]
+
+        def add_nodes(circle, angle):
+            index = corner_count + sum(len(part) for part in node_circle[1:])
+            node_circle.append(circle)
+            node_angle.append(angle)
+            return np.arange(index, index + len(circle))
+
+        # Straight edges from the corners to the circles they see
+        check_deadline(deadline)
+        corner, circle, angle = self.tangents_from(corners)
+        points = self.circle_points(circle, angle)
+        valid = self.tangent_at(corner, points) & self.free_points(points)
+        valid[valid] = self.collision_checker.collision_free(corners[corner[valid]], points[valid])
+        corner, circle, angle, points = corner[valid], circle[valid], angle[valid], points[valid]
+        firsts.append(corner)
+        seconds.append(add_nodes(circle, angle))
+        all_weights.append(np.linalg.norm(points - corners[corner], axis=1))
+
+        # Straight edges between circles
+        check_deadline(deadline)
+        circle_1, angle_1, circle_2, angle_2 = self.bitangents()
+        points_1, points_2 = self.circle_points(circle_1, angle_1), self.circle_points(circle_2, angle_2)
+        valid = self.free_points(points_1) & self.free_points(points_2)
+        valid[valid] = self.collision_checker.collision_free(points_1[valid], points_2[valid])
+        firsts.append(add_nodes(circle_1[valid], angle_1[valid]))
+        seconds.append(add_nodes(circle_2[valid], angle_2[valid]))
+        all_weights.append(np.linalg.norm(points_2[valid] - points_1[valid], axis=1))
+
+        self.node_circle = np.concatenate(node_circle)
+        self.node_angle = np.concatenate(node_angle)
+        self.nodes = np.concatenate([corners] + [self.circle_points(circle, angle)
+                                                 for circle, angle in zip(node_circle[1:], node_angle[1:])])
+
+        # Arcs between neighbouring tangent points of each circle; the nodes of
+        # circle c are circle_order[circle_offsets[c]:circle_offsets[c + 1]],
+        # counterclockwise
+        check_deadline(deadline)
+        on_circle = np.flatnonzero(self.node_circle >= 0)
+        self.circle_order = on_circle[np.lexsort((self.node_angle[on_circle], self.node_circle[on_circle]))]
+        self.circle_offsets = np.searchsorted(self.node_circle[self.circle_order], np.arange(len(self.circles) + 1))
+        position = np.arange(len(self.circle_order))
+        group = self.node_circle[self.circle_order]
+        group_first, group_end = self.circle_offsets[group], self.circle_offsets[group + 1]
+        following = np.where(position + 1 == group_end, group_first, position + 1)
+        arcs = group_end - group_first > 1
+        first, second = self.circle_order[arcs], self.circle_order[following[arcs]]
+        sweep = np.mod(self.node_angle[second] - self.node_angle[first], 2 * math.pi)
+        free = self.arcs_free(self.node_circle[first], self.node_angle[first], sweep, self.collision_checker)
+        firsts.append(first[free])
+        seconds.append(second[free])
+        all_weights.append(self.circles[self.node_circle[first[free]], 2] * sweep[free])
+
+        # Adjacency in compressed rows: the neighbours of node i are
+        # neighbors[offsets[i]:offsets[i + 1]], at distances weights[...]
+        first, second, weights = np.concatenate(firsts), np.concatenate(seconds), np.concatenate(all_weights)
+        sources = np.concatenate((first, second))
+        order = np.argsort(sources, kind='stable')
+        self.neighbors = np.concatenate((second, first))[order]
+        self.weights = np.concatenate((weights, weights))[order]
+        self.offsets = np.searchsorted(sources[order], np.arange(len(self.nodes) + 1))
+
+    def tangent_at(self, corner, points):
+        """Whether the lines from `corner` to each of `points` are tangent to the rectangle of the corner."""
+        direction = points - self.nodes[corner]
+        before = self.previous[corner] - self.nodes[corner]
+        after = self.following[corner] - self.nodes[corner]
+        cross_before = direction[..., 0] * before[..., 1] - direction[..., 1] * before[..., 0]
+        cross_after = direction[..., 0] * after[..., 1] - direction[..., 1] * after[..., 0]
+        return cross_before * cross_after >= 0
+
+    def _visible_pairs(self, deadline=None):
+        """Corner pairs (i < j) whose segment is free and tangent to the rectangles at both ends."""
+        n = len(self.nodes)
+        rows = max(1, self.max_pairs_per_chunk // max(n, 1))
+        firsts, seconds = [], []
+        for start in range(0, n, rows):
+            check_deadline(deadline)
+            first, second = np.nonzero(np.arange(start, min(start + rows, n))[:, None] < np.arange(n)[None, :])
+            first += start
+            tangent = self.tangent_at(first, self.nodes[second]) & self.tangent_at(second, self.nodes[first])
+            first, second = first[tangent], second[tangent]
+            visible = self.collision_checker.collision_free(self.nodes[first], self.nodes[second])
+            firsts.append(first[visible])
+            seconds.append(second[visible])
+        if not firsts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+    def circle_points(self, circle, angle, radius_scale=1.0):
+        """Points at `angle` (radians) on the grown circles, scaled away from their centers by radius_scale."""
+        radius = self.circles[circle, 2] * radius_scale
+        return self.circles[circle, :2] + np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+
+    def tangents_from(self, points):
+        """
+        Both tangents from each of `points` to each grown circle that does
+        not contain it. Returns (source, circle, angle): the tangent from
+        points[source[k]] touches circle[k] at angle[k].
+        """
+        offsets = points[:, None, :] - self.circles[None, :, :2]
+        distance = np.hypot(offsets[..., 0], offsets[..., 1])
+        source, circle = np.nonzero(distance > self.circles[None, :, 2])
+        direction = np.arctan2(offsets[source, circle, 1], offsets[source, circle, 0])
+        half_angle = np.arccos(self.circles[circle, 2] / distance[source, circle])
+        angle = np.column_stack((direction + half_angle, direction - half_angle)).ravel()
+        return np.repeat(source, 2), np.repeat(circle, 2), np.mod(angle, 2 * math.pi)
+
+    def bitangents(self):
+        """
+        The outer and inner tangents between every pair of grown circles that
+        have them. Returns (circle_1, angle_1, circle_2, angle_2), the end
+        points of each tangent.
+        """
+        circle_1, circle_2 = np.triu_indices(len(self.circles), 1)
+        offsets = self.circles[circle_2, :2] - self.circles[circle_1, :2]
+        distance = np.hypot(offsets[:, 0], offsets[:, 1])
+        direction = np.arctan2(offsets[:, 1], offsets[:, 0])
+        radius_1, radius_2 = self.circles[circle_1, 2], self.circles[circle_2, 2]
+        firsts, angles_1, seconds, angles_2 = [], [], [], []
+        # Outer tangents touch both circles on the same side, inner ones on opposite sides
+        for radii, opposite in ((radius_1 - radius_2, 0.0), (radius_1 + radius_2, math.pi)):
+            exists = distance > np.abs(radii)
+            half_angle = np.arccos(radii[exists] / distance[exists])
+            for sign in (1.0, -1.0):
+                angle = direction[exists] + sign * half_angle
+                firsts.append(circle_1[exists])
+                angles_1.append(angle)
+                seconds.append(circle_2[exists])
+                angles_2.append(angle + opposite)
+        return (np.concatenate(firsts), np.mod(np.concatenate(angles_1), 2 * math.pi),
+                np.concatenate(seconds), np.mod(np.concatenate(angles_2), 2 * math.pi))
+
+    def arc_points(self, circle, angle, sweep):
+        """
+        The points drawn along arcs: arc k starts at angle[k] on circle[k]
+        and turns by sweep[k] radians (counterclockwise when positive). The
+        inner points lie on tangents to the circle at most arc_step apart.
+        Returns (arc, points): the points after the start of each arc, in
+        order and ending with its end point.
+        """
+        steps = np.maximum(1, np.ceil(np.abs(sweep) / self.arc_step)).astype(np.int64)
+        arc = np.repeat(np.arange(len(steps)), steps + 1)
+        # Point j (1 to steps) of an arc, the end point being j = steps + 1
+        j = np.arange(len(arc)) - np.repeat(np.cumsum(steps + 1) - (steps + 1), steps + 1) + 1
+        half_step = (sweep / (2 * steps))[arc]
+        end = j == steps[arc] + 1
+        angle = angle[arc] + np.where(end, sweep[arc], (2 * j - 1) * half_step)
+        return arc, self.circle_points(circle[arc], angle, np.where(end, 1.0, 1.0 / np.cos(half_step)))
+
+    def arcs_free(self, circle, angle, sweep, checker):
+        """Whether the drawn arcs (see arc_points) stay inside the boundary and are free for `checker`."""
+        if len(circle) == 0:
+            return np.zeros(0, dtype=bool)
+        arc, points = self.arc_points(circle, angle, sweep)
+        first = np.flatnonzero(np.diff(arc, prepend=-1))
+        starts = np.roll(points, 1, axis=0)
+        starts[first] = self.circle_points(circle, angle)
+        free = checker.collision_free(starts, points) & self.inside(points)
+        return np.logical_and.reduceat(free, first)
+
+    def inside(self, points):
+        """Whether each point is inside the boundary."""
+        (x_min, y_min), (x_max, y_max) = self.bottom_left, self.top_right
+        return ((x_min <= points[:, 0]) & (points[:, 0] <= x_max) &
+                (y_min <= points[:, 1]) & (points[:, 1] <= y_max))
+
+    def free_points(self, points):
+        """Whether each point is inside the boundary and out of the grown obstacles."""
+        free = self.inside(points)
+        free[free] = self.collision_checker.collision_free(points[free], points[free])
+        return free
+
+    def reachable(self, points):
+        """Whether each point is inside the boundary and outside the obstacles (it may be within the clearance)."""
+        return self.inside(points) & self.core_checker.collision_free(points, points)
+    def escape_checker(self, points):
+        """
+        Collision checker for the segments leaving `points`, which lie within
+        the clearance of some obstacles: the grown obstacles that contain
+        them are left out, so that the points can still be left.
+        """
+        if len(points) == 0:
+            return self.collision_checker
+        inside = set()
+        for x, y in points.tolist():
+            for obs in self.collision_checker.obstacles_near(x, y, 0.0):
+                if not SegmentCollisionChecker([obs], self.clearance).collision_free([(x, y)], [(x, y)])[0]:
+                    inside.add(id(obs))
+        return SegmentCollisionChecker([obs for obs in self.collision_checker.obstacles if id(obs) not in inside],
+                                       self.clearance)
+
+    def visible_from(self, point, checker):
+        """
+        Corners joined to `point` by a segment free for `checker` and tangent
+        at the corner, and their distances. From within the clearance (an
+        escape checker), the way out may cross the obstacle to a node where
+        it is not tangent, so every node is a candidate.
+        """
+        if checker is self.collision_checker:
+            candidates = np.flatnonzero(self.tangent_at(np.arange(self.corner_count), point))
+        else:
+            candidates = np.arange(len(self.nodes))
+        visible = checker.collision_free(np.broadcast_to(point, (len(candidates), 2)), self.nodes[candidates])
+        candidates = candidates[visible]
+        return candidates, np.linalg.norm(self.nodes[candidates] - point, axis=1)
+
+    def _query_arcs(self, node_circle, node_angle, first_index):
+        """
+        Free arcs joining the query-time tangent points (nodes from
+        first_index on) to their neighbours on the same circle, graph nodes
+        or other query points. `node_circle` and `node_angle` cover the graph
+        and query nodes. Returns (first, second, weights).
+        """
+        firsts, seconds = [], []
+        for c in np.unique(node_circle[first_index:]).tolist():
+            nodes = np.concatenate((self.circle_order[self.circle_offsets[c]:self.circle_offsets[c + 1]],
+                                    first_index + np.flatnonzero(node_circle[first_index:] == c)))
+            if len(nodes) < 2:
+                continue
+            nodes = nodes[np.argsort(node_angle[nodes], kind='stable')]
+            following = np.roll(nodes, -1)
+            arcs = (nodes >= first_index) | (following >= first_index)
+            firsts.append(nodes[arcs])
+            seconds.append(following[arcs])
+        if not firsts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        circle = node_circle[first]
+        sweep = np.mod(node_angle[second] - node_angle[first], 2 * math.pi)
+        free = self.arcs_free(circle, node_angle[first], sweep, self.collision_checker)
+        return first[free], second[free], self.circles[circle[free], 2] * sweep[free]
+
+    def shortest_path(self, start, goal, deadline=None):
+        """
+        Dijkstra from start to goal over the graph, with both points joined
+        to the corners they see and, through their tangents, to the circles.
+        Returns (path, expanded): the path is a list of [x, y] points from
+        start to goal, arcs drawn as in arc_points, empty when the goal
+        cannot be reached or one of the points lies outside the boundary or
+        inside an obstacle.
+        """
+        points = np.array([start, goal], dtype=float)
+        if not self.reachable(points).all():
+            return [], 0
+        unclear = ~self.collision_checker.collision_free(points, points)
+        n = len(self.nodes)
+        start_index, goal_index = n, n + 1
+        checkers = [self.escape_checker(points[:1][unclear[:1]]), self.escape_checker(points[1:][unclear[1:]])]
+
+        # Edges of the query: start and goal to the corners they see, and
+        # their tangent points on the circles (numbered from n + 2) to start
+        # and goal and along the circles
+        firsts, seconds, all_weights = [], [], []
+        start_nodes, start_weights = self.visible_from(points[0], checkers[0])
+        goal_nodes, goal_weights = self.visible_from(points[1], checkers[1])
+        firsts += [np.full(len(start_nodes), start_index), goal_nodes]
+        seconds += [start_nodes, np.full(len(goal_nodes), goal_index)]
+        all_weights += [start_weights, goal_weights]
+        if self.escape_checker(points[unclear]).collision_free(points[:1], points[1:])[0]:
+            firsts.append([start_index])
+            seconds.append([goal_index])
+            all_weights.append([math.dist(start, goal)])
+
+        source, circle, angle = self.tangents_from(points)
+        tangent_points = self.circle_points(circle, angle)
+        valid = self.free_points(tangent_points)
+        for end in (0, 1):
+            mask = valid & (source == end)
+            valid[mask] = checkers[end].collision_free(np.broadcast_to(points[end], (mask.sum(), 2)),
+                                                       tangent_points[mask])
+        source, circle, angle, tangent_points = source[valid], circle[valid], angle[valid], tangent_points[valid]
+        query_nodes = n + 2 + np.arange(len(source))
+        firsts.append(np.where(source == 0, start_index, query_nodes))
+        seconds.append(np.where(source == 0, query_nodes, goal_index))
+        all_weights.append(np.linalg.norm(tangent_points - points[source], axis=1))
+        node_points = np.concatenate((self.nodes, points, tangent_points))
+        node_circle = np.concatenate((self.node_circle, [-1, -1], circle)).astype(np.int64)
+        node_angle = np.concatenate((self.node_angle, [np.nan, np.nan], angle))
+        first, second, weights = self._query_arcs(node_circle, node_angle, n + 2)
+        firsts.append(first)
+        seconds.append(second)
+        all_weights.append(weights)
+
+        # Query adjacency, in both directions except into the start and out of the goal
+        first = np.concatenate(firsts).astype(np.int64)
+        second = np.concatenate(seconds).astype(np.int64)
+        weights = np.concatenate(all_weights).astype(float)
+        sources, targets = np.concatenate((first, second)), np.concatenate((second, first))
+        weights = np.concatenate((weights, weights))
+        keep = (targets != start_index) & (sources != goal_index)
+        sources, targets, weights = sources[keep], targets[keep], weights[keep]
+        order = np.argsort(sources, kind='stable')
+        query_targets, query_weights = targets[order], weights[order]
+        total = n + 2 + len(source)
+        query_offsets = np.searchsorted(sources[order], np.arange(total + 1))
+
+        cost = np.full(total, np.inf)
+        parent = np.full(total, -1, dtype=np.int64)
+        closed = np.zeros(total, dtype=bool)
+        cost[start_index] = 0.0
+        open_heap = [(0.0, start_index)]
+        expanded = 0
+
+        while open_heap:
+            if deadline is not None and expanded % 1024 == 0 and time.monotonic() > deadline:
+                raise PlanningTimeout("Path planning exceeded its time budget")
+
+            c_cost, c_id = heapq.heappop(open_heap)
+            if closed[c_id] or c_cost != cost[c_id]:
+                continue  # stale entry
+            closed[c_id] = True
+            expanded += 1
+            if c_id == goal_index:
+                break
+
+            neighbors = query_targets[query_offsets[c_id]:query_offsets[c_id + 1]]
+            weights = query_weights[query_offsets[c_id]:query_offsets[c_id + 1]]
+            if c_id < n:
+                neighbors = np.concatenate((self.neighbors[self.offsets[c_id]:self.offsets[c_id + 1]], neighbors))
+                weights = np.concatenate((self.weights[self.offsets[c_id]:self.offsets[c_id + 1]], weights))
+
+            n_costs = c_cost + weights
+            better = n_costs < cost[neighbors]
+            for n_id, n_cost in zip(neighbors[better].tolist(), n_costs[better].tolist()):
+                cost[n_id] = n_cost
+                parent[n_id] = c_id
+                heapq.heappush(open_heap, (n_cost, n_id))
+
+        if not closed[goal_index]:
+            return [], expanded
+        route = [goal_index]
+        while route[-1] != start_index:
+            route.append(int(parent[route[-1]]))
+        route.reverse()
+
+        path = [[start[0], start[1]]]
+        for u, v in zip(route[:-1], route[1:]):
+            if v == goal_index:
+                path.append([goal[0], goal[1]])
+            elif node_circle[u] >= 0 and node_circle[u] == node_circle[v]:
+                # An arc, turning the way whose length is the cost of the step
+                radius = self.circles[node_circle[u], 2]
+                sweep = (node_angle[v] - node_angle[u]) % (2 * math.pi)
+                step = cost[v] - cost[u]
+                if abs(radius * (2 * math.pi - sweep) - step) < abs(radius * sweep - step):
+                    sweep -= 2 * math.pi
+                _, arc = self.arc_points(node_circle[u:u + 1], node_angle[u:u + 1], np.array([sweep]))
+                path.extend(arc.tolist())
+            else:
+                path.append(node_points[v].tolist())
+        return path, expanded
+
+
+class VisibilityGraphPlanner:
+    """
+    Shortest paths on the visibility graph of the map (see VisibilityGraph)
+    instead of a grid. The graph is cached per map and clearance, so a query
+    on a known map only joins start and goal to it and runs Dijkstra.
+
+    The clearance is half the `resolution`, which defaults to 2% of the
+    boundary's shorter side like AStarPlanner's, so both keep the same
+    distance from the obstacles. Paths are the shortest ones around the
+    grown obstacles and need no pruning: planning() returns the same list
+    as path and pruned path.
+    """
+    def __init__(self, start, goal, obstacles, boundary, resolution=None, deadline=None):
+        self.start = start
+        self.goal = goal
+        self.obstacles = obstacles
+        self.boundary = boundary
+        self.deadline = deadline
+        # Same meaning as in AStarPlanner
+        self.expansions = 0
+        self.cost_bound = None
+        # Graph used by the last planning() call
+        self.graph = None
+
+        x_min, y_min = boundary['bottom_left']
+        x_max, y_max = boundary['top_right']
+        min_side = min(x_max - x_min, y_max - y_min)
+        self.resolution = resolution if resolution else (min_side if min_side > 0 else 100) * 0.02
+        self.clearance = self.resolution * 0.5
+
+    def visibility_graph(self):
+        """
+        The visibility graph of the map, from the cache when possible. Its
+        construction stops at the planner's deadline.
+        """
+        key = f"{map_hash(self.obstacles, self.boundary)}:{self.clearance!r}"
+        graph = visibility_graph_cache.get(key)
+        count('visibility_graph_cache_misses' if graph is None else 'visibility_graph_cache_hits')
+        if graph is None:
+            with stage('visibility_graph'):
+                graph = VisibilityGraph(self.obstacles, self.boundary, self.clearance, self.deadline)
+            visibility_graph_cache.put(key, graph)
+        return graph
+
+    def planning(self):
+        self.graph = self.visibility_graph()
+        with stage('search'):
+            path, self.expansions = self.graph.shortest_path(self.start, self.goal, self.deadline)
+        count('nodes_expanded', self.expansions)
+        self.cost_bound = 1.0 if path else None
+        return [path, path]
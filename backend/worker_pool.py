@@ -0,0 +1,129 @@
+# worker_pool.py
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from astar_modified import PlanningTimeout
+
+
+class PoolOverloaded(Exception):
+    """Raised when the admission queue of the planning pool is full."""
+
+
+def _warm_worker():
+    """
+    Runs once in every worker process: imports the heavy modules up front so
+    the first request does not pay for them, and leaves Ctrl+C to the parent.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import numpy  # noqa: F401
+    import cv2  # noqa: F401
+    import astar_modified  # noqa: F401
+    import dp_planner  # noqa: F401
+    import batch_planner  # noqa: F401
+    import visibility_graph  # noqa: F401
+
+
+class PlanningPool:
+    """
+    Bounded pool of worker processes for the CPU-bound planning work.
+
+    - `workers` processes (one per core by default) run the searches, so a
+      slow plan never blocks the request threads of other clients.
+    - At most `capacity` (`workers + queue_size`) tasks are admitted at once;
+      beyond that run() and map() raise PoolOverloaded and the server
+      answers 503. A task holds its admission slot until it is done.
+    - Every task gets a deadline of `time_budget` seconds from admission. The
+      planners stop at the deadline by themselves, and run() stops waiting
+      shortly after it in any case.
+    - shutdown() stops admitting new tasks and lets the running ones finish.
+    """
+    def __init__(self, workers=None, queue_size=None, time_budget=30.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 2 if queue_size is None else queue_size
+        self.time_budget = time_budget
+        self.capacity = self.workers + self.queue_size
+        self.admission = threading.BoundedSemaphore(self.capacity)
+        self.closed = False
+
+        methods = multiprocessing.get_all_start_methods()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('forkserver' if 'forkserver' in methods else None),
+            initializer=_warm_worker,
+        )
+        # Start (and warm) the workers now rather than on the first request
+        for future in [self.executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def run(self, fn, *args, time_budget=None):
+        """
+        Runs fn(*args, deadline=...) in a worker and returns its result.
+        `time_budget` (seconds) may lower the pool's default budget.
+        """
+        if self.closed or not self.admission.acquire(blocking=False):
+            raise PoolOverloaded("The planning server is overloaded, try again later")
+
+        budget = min(time_budget, self.time_budget) if time_budget else self.time_budget
+        deadline = time.monotonic() + budget
+        try:
+            future = self.executor.submit(fn, *args, deadline=deadline)
+        except Exception:
+            self.admission.release()
+            raise
+        future.add_done_callback(lambda _: self.admission.release())
+
+        try:
+            # A little grace so the worker can report its own timeout first
+            return future.result(timeout=budget + 1.0)
+        except TimeoutError:
+            future.cancel()
+            raise PlanningTimeout("Path planning exceeded its time budget")
+
+    def map(self, fn, args_list, time_budget=None):
+        """
+        Runs fn(*args, deadline=...) for every tuple of args_list and returns
+        the results in order. Every call is a task of its own: the batch is
+        admitted as a whole or not at all, so it cannot hold more than
+        `capacity` slots. Tasks that are still running shortly after the
+        deadline are reported as None.
+        """
+        admitted = 0
+        while not self.closed and admitted < len(args_list) and self.admission.acquire(blocking=False):
+            admitted += 1
+        if admitted < len(args_list):
+            for _ in range(admitted):
+                self.admission.release()
+            raise PoolOverloaded("The planning server is overloaded, try again later")
+
+        budget = min(time_budget, self.time_budget) if time_budget else self.time_budget
+        deadline = time.monotonic() + budget
+        futures = []
+        try:
+            for args in args_list:
+                future = self.executor.submit(fn, *args, deadline=deadline)
+                future.add_done_callback(lambda _: self.admission.release())
+                futures.append(future)
+        except Exception:
+            for _ in range(len(args_list) - len(futures)):
+                self.admission.release()
+            for future in futures:
+                future.cancel()
+            raise
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(0.0, deadline + 1.0 - time.monotonic())))
+            except TimeoutError:
+                future.cancel()
+                results.append(None)
+        return results
+
+    def shutdown(self, wait=True):
+        self.closed = True
+        self.executor.shutdown(wait=wait, cancel_futures=True)
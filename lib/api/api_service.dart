@@ -4,29 +4,61 @@ import 'dart:convert';
 import 'package:http/http.dart' as http;
 import 'package:latlong2/latlong.dart';
 import 'package:path_planning/models/map_data.dart';
+import 'package:path_planning/utils/geo_utils.dart';
 
 
 class ApiService {
   final String _baseUrl = 'http://127.0.0.1:5000';
 
-  Future<Map<String, dynamic>> _getPathFromEndpoint(String endpoint, MapData mapData) async {
+  // Paths are requested as encoded polylines, which are much smaller than
+  // lists of LatLng objects. 6 digits keep them accurate to about 10 cm.
+  static const int _polylinePrecision = 6;
+  static const Map<String, dynamic> _encodingOptions = {
+    'encoding': 'polyline',
+    'precision': _polylinePrecision,
+  };
+
+  // Decodes a path in any of the server's encodings ('json', 'flat' or
+  // 'polyline').
+  List<LatLng> _decodePath(dynamic path, String? encoding) {
+    switch (encoding) {
+      case 'polyline':
+        return GeoUtils.decodePolyline(path as String,
+            precision: _polylinePrecision);
+      case 'flat':
+        final values = (path as List).cast<num>();
+        return [
+          for (int i = 0; i + 1 < values.length; i += 2)
+            LatLng(values[i].toDouble(), values[i + 1].toDouble())
+        ];
+      default:
+        return (path as List)
+            .map((p) => LatLng(p['latitude'], p['longitude']))
+            .toList();
+    }
+  }
+
+  Future<Map<String, dynamic>> _getPathFromEndpoint(String endpoint, MapData mapData,
+      {bool includePath = true}) async {
     final url = Uri.parse('$_baseUrl/$endpoint');
     final headers = {"Content-Type": "application/json"};
-    final body = json.encode(mapData.toJson());
+    final body = json.encode({
+      ...mapData.toJson(),
+      ..._encodingOptions,
+      'include_path': includePath,
+    });
 
     try {
       final response = await http.post(url, headers: headers, body: body);
 
       if (response.statusCode == 200) {
         final Map<String, dynamic> data = json.decode(response.body);
+        final String? encoding = data['encoding'];
         
-        List<LatLng> path = (data['path'] as List)
-            .map((p) => LatLng(p['latitude'], p['longitude']))
-            .toList();
-        
-        List<LatLng> prunedPath = (data['pruned_path'] as List)
-            .map((p) => LatLng(p['latitude'], p['longitude']))
-            .toList();
+        List<LatLng> prunedPath = _decodePath(data['pruned_path'], encoding);
+        List<LatLng> path = data.containsKey('path')
+            ? _decodePath(data['path'], encoding)
+            : prunedPath;
 
         return {'path': path, 'pruned_path': prunedPath};
       } else {
@@ -46,4 +78,109 @@ class ApiService {
   Future<Map<String, dynamic>> getPathWithDP(MapData mapData) {
     return _getPathFromEndpoint('plan-path-dp', mapData);
   }
+
+  // Exact shortest path on the map's visibility graph, best suited to open
+  // maps with few obstacles. Path and pruned path are the same.
+  Future<Map<String, dynamic>> getPathWithVisibilityGraph(MapData mapData) {
+    return _getPathFromEndpoint('plan-path-visibility', mapData);
+  }
+
+  // Incremental replanning. Without a sessionId the whole map is sent and a
+  // new server session is started; with one, only the obstacles added and
+  // removed since the last call are sent. The result also holds the
+  // 'session_id' to use next time. Returns null when the session expired on
+  // the server, in which case a new one has to be started.
+  Future<Map<String, dynamic>?> replanPath(MapData mapData,
+      {String? sessionId,
+      List<Map<String, dynamic>> added = const [],
+      List<Map<String, dynamic>> removed = const []}) async {
+    final url = Uri.parse('$_baseUrl/replan-path');
+    final headers = {"Content-Type": "application/json"};
+    final body = json.encode({
+      if (sessionId == null) ...mapData.toJson(),
+      if (sessionId != null) ...{
+        'session_id': sessionId,
+        'added': added,
+        'removed': removed,
+      },
+      ..._encodingOptions,
+    });
+
+    try {
+      final response = await http.post(url, headers: headers, body: body);
+
+      if (response.statusCode == 410) {
+        return null;
+      }
+      final Map<String, dynamic> data = json.decode(response.body);
+      if (response.statusCode == 200) {
+        final String? encoding = data['encoding'];
+        return {
+          'session_id': data['session_id'],
+          'path': _decodePath(data['path'], encoding),
+          'pruned_path': _decodePath(data['pruned_path'], encoding),
+        };
+      } else {
+        throw Exception(
+            'Failed to get path: ${data['error'] ?? 'Unknown error'}. Status code: ${response.statusCode}');
+      }
+    } catch (e) {
+      throw Exception('Error connecting to the server: $e');
+    }
+  }
+
+  // Plans several start/goal pairs on the same map in a single request, with
+  // the 'astar', 'dp' or 'visibility' planner. Each result has a 'status'
+  // ('ok', 'no_path', 'timeout' or 'error'); successful results also hold
+  // 'path' and 'pruned_path', failed ones an 'error'.
+  Future<List<Map<String, dynamic>>> getPathsBatch(
+      MapData mapData, List<(LatLng, LatLng)> pairs,
+      {String planner = 'astar'}) async {
+    final url = Uri.parse('$_baseUrl/plan-paths-batch');
+    final headers = {"Content-Type": "application/json"};
+    final body = json.encode({
+      ...mapData.toJson(),
+      ..._encodingOptions,
+      'planner': planner,
+      'pairs': pairs
+          .map((pair) => {
+                'start': {
+                  'latitude': pair.$1.latitude,
+                  'longitude': pair.$1.longitude
+                },
+                'goal': {
+                  'latitude': pair.$2.latitude,
+                  'longitude': pair.$2.longitude
+                },
+              })
+          .toList(),
+    });
+
+    try {
+      final response = await http.post(url, headers: headers, body: body);
+
+      if (response.statusCode == 200) {
+        final Map<String, dynamic> data = json.decode(response.body);
+        final String? encoding = data['encoding'];
+
+        return (data['results'] as List).map((r) {
+          final Map<String, dynamic> result = {
+            'status': r['status'],
+            'error': r['error'],
+          };
+          if (r['status'] == 'ok') {
+            result['path'] = _decodePath(r['path'], encoding);
+            result['pruned_path'] = _decodePath(r['pruned_path'], encoding);
+          }
+          return result;
+        }).toList();
+      } else {
+        final error = json.decode(response.body);
+        throw Exception(
+            'Failed to get paths: ${error['error'] ?? 'Unknown error'}. Status code: ${response.statusCode}');
+      }
+    } catch (e) {
+      throw Exception('Error connecting to the server: $e');
+    }
+  }
 }
@@ -10,7 +10,7 @@ import 'package:path_planning/utils/geo_utils.dart';
 import 'package:shared_preferences/shared_preferences.dart';
 
 enum DrawingMode { none, boundary, obstacleRect, obstacleCircle, setStart, setEnd }
-enum PlanningAlgorithm { aStar, dynamicProgramming }
+enum PlanningAlgorithm { aStar, dynamicProgramming, visibilityGraph, incremental }
 
 class MapProvider extends ChangeNotifier {
   DrawingMode _drawingMode = DrawingMode.none;
@@ -52,6 +52,12 @@ class MapProvider extends ChangeNotifier {
   // Temporary points for drawing
   LatLng? _tempStartPoint;
 
+  // Server session of the incremental planner: the map it was started for
+  // (boundary, start and end) and the obstacles it knows, as JSON by id
+  String? _replanSessionId;
+  String? _replanSessionMap;
+  Map<String, String> _replanSessionObstacles = {};
+
   final ApiService _apiService = ApiService();
 
   MapProvider() {
@@ -240,9 +246,14 @@ class MapProvider extends ChangeNotifier {
     );
     
     try {
-      final result = algorithm == PlanningAlgorithm.aStar
-          ? await _apiService.getPath(mapData)
-          : await _apiService.getPathWithDP(mapData);
+      final result = switch (algorithm) {
+        PlanningAlgorithm.aStar => await _apiService.getPath(mapData),
+        PlanningAlgorithm.dynamicProgramming =>
+          await _apiService.getPathWithDP(mapData),
+        PlanningAlgorithm.visibilityGraph =>
+          await _apiService.getPathWithVisibilityGraph(mapData),
+        PlanningAlgorithm.incremental => await _replan(mapData),
+      };
           
       _unprunedPath = result['path']!;
       _prunedPath = result['pruned_path']!;
@@ -255,6 +266,45 @@ class MapProvider extends ChangeNotifier {
     }
   }
   
+  // Replans through the server's incremental planner: while the boundary,
+  // start and end stay the same, only the obstacle changes since the last
+  // replan are sent, and the server repairs its previous search.
+  Future<Map<String, dynamic>> _replan(MapData mapData) async {
+    final sessionMap = json.encode({
+      'boundary': mapData.boundary.toJson(),
+      'start': mapData.toJson()['start'],
+      'goal': mapData.toJson()['goal'],
+    });
+    final obstacles = {
+      for (final obstacle in mapData.obstacles)
+        obstacle.id: json.encode(obstacle.toJson())
+    };
+
+    Map<String, dynamic>? result;
+    if (_replanSessionId != null && _replanSessionMap == sessionMap) {
+      // Moved or resized obstacles are sent as removed and added again
+      final removed = [
+        for (final entry in _replanSessionObstacles.entries)
+          if (obstacles[entry.key] != entry.value)
+            json.decode(entry.value) as Map<String, dynamic>
+      ];
+      final added = [
+        for (final entry in obstacles.entries)
+          if (_replanSessionObstacles[entry.key] != entry.value)
+            json.decode(entry.value) as Map<String, dynamic>
+      ];
+      result = await _apiService.replanPath(mapData,
+          sessionId: _replanSessionId, added: added, removed: removed);
+    }
+    // No session yet, a different map, or the session expired on the server
+    result ??= await _apiService.replanPath(mapData);
+
+    _replanSessionId = result!['session_id'];
+    _replanSessionMap = sessionMap;
+    _replanSessionObstacles = obstacles;
+    return result;
+  }
+
   void clearPathAndPoints() {
     _startPoint = null;
     _endPoint = null;
@@ -273,6 +323,9 @@ class MapProvider extends ChangeNotifier {
     _unprunedPath = [];
     _prunedPath = [];
     _tempStartPoint = null;
+    _replanSessionId = null;
+    _replanSessionMap = null;
+    _replanSessionObstacles = {};
     _isLoading = false;
     _loadingAlgorithm = null;
     _errorMessage = '';
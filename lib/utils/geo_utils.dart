@@ -1,5 +1,7 @@
 // lib/utils/geo_utils.dart
 
+import 'dart:math' as math;
+
 import 'package:latlong2/latlong.dart';
 
 class GeoUtils {
@@ -7,4 +9,28 @@ class GeoUtils {
     const distance = Distance();
     return distance.as(LengthUnit.Meter, pos1, pos2);
   }
-}
\ No newline at end of file
+
+  // Decodes a Google encoded polyline with `precision` decimal digits.
+  static List<LatLng> decodePolyline(String encoded, {int precision = 5}) {
+    final factor = math.pow(10, precision).toDouble();
+    final points = <LatLng>[];
+    int index = 0, lat = 0, lng = 0;
+
+    int nextValue() {
+      int result = 0, shift = 0, byte;
+      do {
+        byte = encoded.codeUnitAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      return (result & 1) != 0 ? ~(result >> 1) : result >> 1;
+    }
+
+    while (index < encoded.length) {
+      lat += nextValue();
+      lng += nextValue();
+      points.add(LatLng(lat / factor, lng / factor));
+    }
+    return points;
+  }
+}
@@ -76,6 +76,30 @@ class PathPlanningWidget extends StatelessWidget {
                 ? buildLoadingIndicator()
                 : const Text('Dynamic Programming'),
           ),
+          const SizedBox(height: 8),
+          ElevatedButton.icon(
+            icon: const Icon(Icons.timeline),
+            onPressed: mapProvider.isLoading ? null : () => mapProvider.calculatePath(PlanningAlgorithm.visibilityGraph),
+            style: ElevatedButton.styleFrom(
+                backgroundColor: Colors.indigo,
+                foregroundColor: Colors.white,
+                minimumSize: const Size(double.infinity, 40)),
+            label: (mapProvider.isLoading && mapProvider.loadingAlgorithm == PlanningAlgorithm.visibilityGraph)
+                ? buildLoadingIndicator()
+                : const Text('Visibility Graph'),
+          ),
+          const SizedBox(height: 8),
+          ElevatedButton.icon(
+            icon: const Icon(Icons.update),
+            onPressed: mapProvider.isLoading ? null : () => mapProvider.calculatePath(PlanningAlgorithm.incremental),
+            style: ElevatedButton.styleFrom(
+                backgroundColor: Colors.teal,
+                foregroundColor: Colors.white,
+                minimumSize: const Size(double.infinity, 40)),
+            label: (mapProvider.isLoading && mapProvider.loadingAlgorithm == PlanningAlgorithm.incremental)
+                ? buildLoadingIndicator()
+                : const Text('Incremental A*'),
+          ),
 
           if (mapProvider.errorMessage.isNotEmpty)
             Padding(